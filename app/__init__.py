@@ -40,6 +40,23 @@ def create_app(config_class=Config):
     app.register_blueprint(permisos_bp)
     from app.routes.asignacion_masiva import asignacion_masiva_bp
     app.register_blueprint(asignacion_masiva_bp)
+    from app.routes.importaciones import importaciones_bp
+    app.register_blueprint(importaciones_bp)
 
+    # Filtros de plantilla para formatear los registros del reporte
+    from app.services.registro_dia import FILTROS
+    app.jinja_env.filters.update(FILTROS)
+
+    # Instrumentación por petición (Server-Timing) y endpoint /metrics
+    from app.services.instrumentacion import registrar_instrumentacion
+    registrar_instrumentacion(app)
+
+    # Límite de tamaño de las subidas (MAX_CONTENT_LENGTH): mensaje y vuelta a la página de origen
+    from app.services.ingesta import registrar_limite_carga
+    registrar_limite_carga(app)
+
+    # Comandos de consola (flask asistencia refrescar)
+    from app.commands import asistencia_cli
+    app.cli.add_command(asistencia_cli)
 
     return app
\ No newline at end of file
@@ -0,0 +1,39 @@
+# app/commands.py
+from datetime import datetime
+
+import click
+from flask.cli import AppGroup
+
+from app.services.asistencia_diaria import refrescar_asistencia
+from app.services.planes_consultas import verificar_planes
+
+asistencia_cli = AppGroup('asistencia', help='Mantenimiento de asistencia: tabla de hechos e índices.')
+
+
+@asistencia_cli.command('refrescar')
+@click.option('--hasta', help='Última fecha a cubrir (YYYY-MM-DD). Por defecto, hoy.')
+@click.option('--lote', type=int, help='Cantidad de empleados que se calculan por lote.')
+def refrescar(hasta, lote):
+    """Procesa las marcaciones nuevas y los días pendientes de `asistencia_diaria`."""
+    hasta_obj = datetime.strptime(hasta, '%Y-%m-%d').date() if hasta else None
+    stats = refrescar_asistencia(hasta=hasta_obj, lote=lote, log=click.echo)
+    click.echo(f"Refresco completado: {stats['empleados']} empleados, {stats['filas']} filas actualizadas.")
+
+
+@asistencia_cli.command('verificar-indices')
+@click.option('--dias', type=int, default=31, show_default=True, help='Rango de fechas usado en las consultas.')
+def verificar_indices(dias):
+    """Revisa con EXPLAIN que las consultas críticas usen su índice (sale con código 1 si alguna no)."""
+    fallas = 0
+    for resultado in verificar_planes(dias):
+        problemas = []
+        if resultado['falta_indice']:
+            problemas.append(f"no usa {resultado['indice']}")
+        if resultado['secuenciales']:
+            problemas.append(f"SEQ SCAN en {', '.join(resultado['secuenciales'])}")
+        click.echo(f"{resultado['nombre']}: {'; '.join(problemas) or 'OK'}")
+        for nodo in resultado['nodos']:
+            click.echo(f'    {nodo}')
+        fallas += bool(problemas)
+    if fallas:
+        raise SystemExit(1)
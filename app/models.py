@@ -31,6 +31,8 @@ class PersonnelDepartment(db.Model):
 
 class IClockTransaction(db.Model):
     __tablename__ = 'iclock_transaction'
+    # Índice creado por la migración 129cdd8e316c (consulta de marcaciones del reporte).
+    __table_args__ = (db.Index('ix_iclock_transaction_emp_id_punch_time', 'emp_id', 'punch_time'),)
     id = db.Column(db.Integer, primary_key=True)
     emp_id = db.Column(db.Integer, db.ForeignKey('personnel_employee.id'), index=True)
     punch_time = db.Column(db.DateTime, nullable=False, index=True)
@@ -65,6 +67,8 @@ class Grupos(db.Model):
 
 class GrupoEmpleados(db.Model):
     __tablename__ = 'grupo_empleados'
+    # Restricción de la migración 42144fa0bcb5 (la carga masiva hace ON CONFLICT sobre ella).
+    __table_args__ = (db.UniqueConstraint('grupo_id', 'employee_passport', name='uq_grupo_empleados_grupo_pasaporte'),)
     id = db.Column(db.Integer, primary_key=True)
     grupo_id = db.Column(db.Integer, db.ForeignKey('grupos.id'), nullable=False, index=True)
     employee_passport = db.Column(db.String(50), nullable=False, index=True)
@@ -72,6 +76,8 @@ class GrupoEmpleados(db.Model):
 
 class Justificaciones(db.Model):
     __tablename__ = 'justificaciones'
+    __table_args__ = (db.Index('ix_justificaciones_vigentes', 'employee_passport', 'date_start', 'date_end',
+                               postgresql_where=db.text('NOT anulada')),)
     id = db.Column(db.Integer, primary_key=True)
     employee_passport = db.Column(db.String(50), nullable=False, index=True)
     justification_type = db.Column(db.String(50), nullable=False)
@@ -107,6 +113,7 @@ class Permisos(db.Model):
 
 class GrupoHorariosEspeciales(db.Model):
     __tablename__ = 'grupo_horarios_especiales'
+    __table_args__ = (db.UniqueConstraint('grupo_id', 'fecha', name='uq_grupo_horarios_especiales_grupo_fecha'),)
     id = db.Column(db.Integer, primary_key=True)
     grupo_id = db.Column(db.Integer, db.ForeignKey('grupos.id'), nullable=False, index=True)
     fecha = db.Column(db.Date, nullable=False, index=True)
@@ -130,6 +137,46 @@ class DepartmentHorariosEspeciales(db.Model):
     feriado = db.Column(db.Boolean, default=False)
 
 
+class AsistenciaDiaria(db.Model):
+    """
+    Hechos precalculados de asistencia: una fila por empleado y día (sin domingos).
+    Se llena con `flask asistencia refrescar` y se lee desde build_report.
+    Las duraciones se guardan en segundos para que los totales del resumen sean exactos.
+    """
+    __tablename__ = 'asistencia_diaria'
+    __table_args__ = (db.UniqueConstraint('employee_id', 'fecha', name='uq_asistencia_diaria_empleado_fecha'),)
+    id = db.Column(db.Integer, primary_key=True)
+    employee_id = db.Column(db.Integer, db.ForeignKey('personnel_employee.id'), nullable=False)
+    employee_passport = db.Column(db.String(50), nullable=False, index=True)
+    fecha = db.Column(db.Date, nullable=False, index=True)
+    estado = db.Column(db.String(20), nullable=False)
+    tipo_dia_laborable = db.Column(db.String(20), nullable=False)
+    es_feriado_laborable = db.Column(db.Boolean, default=False, nullable=False)
+    horario_entrada = db.Column(db.Time, nullable=False)
+    horario_salida = db.Column(db.Time, nullable=False)
+    hora_ingreso = db.Column(db.Time)
+    hora_salida_almuerzo = db.Column(db.Time)
+    hora_regreso_almuerzo = db.Column(db.Time)
+    hora_salida_final = db.Column(db.Time)
+    minutos_atraso = db.Column(db.Integer, default=0, nullable=False)
+    segundos_almuerzo = db.Column(db.Integer, default=0, nullable=False)
+    segundos_trabajados = db.Column(db.Integer, default=0, nullable=False)
+    segundos_extras = db.Column(db.Integer, default=0, nullable=False)
+    es_falta = db.Column(db.Boolean, default=False, nullable=False)
+    es_atraso = db.Column(db.Boolean, default=False, nullable=False)
+    actualizado_en = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class AsistenciaRefresco(db.Model):
+    """Estado del refresco incremental de `asistencia_diaria` (una única fila)."""
+    __tablename__ = 'asistencia_refresco'
+    id = db.Column(db.Integer, primary_key=True)
+    ultimo_transaction_id = db.Column(db.BigInteger, default=0, nullable=False)
+    cubierto_desde = db.Column(db.Date)
+    cubierto_hasta = db.Column(db.Date)
+    actualizado_en = db.Column(db.DateTime, default=datetime.utcnow)
+
+
 class AllowedIP(db.Model):
     __tablename__ = 'allowed_ips'
     id = db.Column(db.Integer, primary_key=True)
@@ -1,5 +1,5 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, contains_eager
 from sqlalchemy import func
 from app import db
 from app.models import Grupos, Carteras, GrupoEmpleados, PersonnelEmployee, PersonnelDepartment
@@ -91,12 +91,14 @@ def detalle(grupo_id):
     pasaportes_en_grupo = db.session.query(GrupoEmpleados.employee_passport) \
         .filter_by(grupo_id=grupo_id).scalar_subquery()
     empleados_en_grupo = PersonnelEmployee.query \
-        .join(PersonnelDepartment) \
+        .join(PersonnelEmployee.department) \
+        .options(contains_eager(PersonnelEmployee.department)) \
         .filter(PersonnelEmployee.passport.in_(pasaportes_en_grupo)).all()
     todos_los_pasaportes_asignados = db.session.query(GrupoEmpleados.employee_passport).distinct()
     departamentos_permitidos = ['Callcenter', 'Administracion', 'Guayaquil']
     empleados_disponibles = PersonnelEmployee.query \
-        .join(PersonnelDepartment) \
+        .join(PersonnelEmployee.department) \
+        .options(contains_eager(PersonnelEmployee.department)) \
         .filter(
         PersonnelDepartment.dept_name.in_(departamentos_permitidos),
         PersonnelEmployee.passport.notin_(todos_los_pasaportes_asignados)
@@ -0,0 +1,32 @@
+from flask import Blueprint, jsonify, url_for, send_file, abort
+from app.services.exportaciones import estado_trabajo, archivo_exportacion, LISTO
+
+importaciones_bp = Blueprint('importaciones', __name__, url_prefix='/importaciones')
+
+
+def respuesta_importacion(id_trabajo):
+    """Respuesta 202 de las rutas de carga masiva: id del trabajo y URL para consultar su estado."""
+    return jsonify({'id': id_trabajo,
+                    'estado_url': url_for('importaciones.ver_importacion', id_trabajo=id_trabajo)}), 202
+
+
+@importaciones_bp.route('/<id_trabajo>')
+def ver_importacion(id_trabajo):
+    estado = estado_trabajo(id_trabajo, 'La carga se interrumpió; las filas de lotes ya confirmados quedaron '
+                                        'guardadas. Revise el listado antes de volver a subir el archivo.')
+    if estado is None or 'tipo' not in estado:
+        abort(404)
+    respuesta = {clave: estado.get(clave) for clave in
+                 ('id', 'estado', 'procesados', 'total', 'mensaje', 'resumen', 'errores', 'total_errores')}
+    if estado['estado'] == LISTO and estado.get('total_errores'):
+        respuesta['informe_url'] = url_for('importaciones.descargar_errores', id_trabajo=id_trabajo)
+    return jsonify(respuesta)
+
+
+@importaciones_bp.route('/<id_trabajo>/errores')
+def descargar_errores(id_trabajo):
+    ruta = archivo_exportacion(id_trabajo)
+    if ruta is None:
+        abort(404)
+    return send_file(ruta, as_attachment=True, download_name=estado_trabajo(id_trabajo)['nombre_archivo'],
+                     mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
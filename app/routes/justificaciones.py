@@ -1,28 +1,28 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, send_file
-from sqlalchemy.orm import joinedload
-from sqlalchemy import or_
+from sqlalchemy.orm import contains_eager
+from sqlalchemy import or_, select
 from collections import defaultdict
 from app import db
 from app.models import Justificaciones, PersonnelEmployee, PersonnelDepartment
+from app.services.intervalos import indice_justificaciones
+from app.services.exportador_tabular import respuesta_descarga
+from app.services.importaciones import solicitar_importacion
+from app.services.ingesta import ArchivoNoValido
+from app.routes.importaciones import respuesta_importacion
 from datetime import datetime
 import openpyxl
 from io import BytesIO
-from openpyxl.styles import Font, PatternFill
 
 justificaciones_bp = Blueprint('justificaciones', __name__, url_prefix='/justificaciones')
 
 
-def get_filtered_justificaciones(q, depto_ids, fecha_desde_str, fecha_hasta_str):
-    """Función auxiliar para obtener justificaciones filtradas, usada por index y descarga."""
-    query = Justificaciones.query.join(
-        PersonnelEmployee, Justificaciones.employee_passport == PersonnelEmployee.passport
-    ).join(
-        PersonnelDepartment, PersonnelEmployee.department_id == PersonnelDepartment.id
-    ).filter(Justificaciones.anulada == False)
+def _filtros_justificaciones(q, depto_ids, fecha_desde_str, fecha_hasta_str):
+    """Condiciones de los filtros del listado (sobre el join con empleado y departamento)."""
+    condiciones = [Justificaciones.anulada == False]
 
     if q:
         search_term = f'%{q}%'
-        query = query.filter(or_(
+        condiciones.append(or_(
             PersonnelEmployee.first_name.ilike(search_term),
             PersonnelEmployee.last_name.ilike(search_term),
             PersonnelEmployee.passport.ilike(search_term)
@@ -30,12 +30,24 @@ def get_filtered_justificaciones(q, depto_ids, fecha_desde_str, fecha_hasta_str)
 
     # Nuevo filtro para múltiples departamentos
     if depto_ids:
-        query = query.filter(PersonnelDepartment.id.in_(depto_ids))
+        condiciones.append(PersonnelDepartment.id.in_(depto_ids))
 
     if fecha_desde_str:
-        query = query.filter(Justificaciones.date_end >= fecha_desde_str)
+        condiciones.append(Justificaciones.date_end >= fecha_desde_str)
     if fecha_hasta_str:
-        query = query.filter(Justificaciones.date_start <= fecha_hasta_str)
+        condiciones.append(Justificaciones.date_start <= fecha_hasta_str)
+    return condiciones
+
+
+def get_filtered_justificaciones(q, depto_ids, fecha_desde_str, fecha_hasta_str):
+    """
+    Función auxiliar para obtener justificaciones filtradas, usada por index.
+    Empleado y departamento se cargan en la misma consulta (contains_eager sobre los joins),
+    así que la página cuesta lo mismo sin importar cuántas filas tenga.
+    """
+    query = Justificaciones.query.join(Justificaciones.empleado).join(PersonnelEmployee.department).options(
+        contains_eager(Justificaciones.empleado).contains_eager(PersonnelEmployee.department)
+    ).filter(*_filtros_justificaciones(q, depto_ids, fecha_desde_str, fecha_hasta_str))
 
     return query.order_by(Justificaciones.date_start.desc()).all()
 
@@ -77,54 +89,28 @@ def index():
 
 @justificaciones_bp.route('/descargar-reporte')
 def descargar_reporte():
-    """Genera y descarga un reporte en Excel de las justificaciones filtradas."""
+    """Descarga en Excel (o CSV con format=csv) las justificaciones filtradas."""
     q = request.args.get('q', '', type=str)
     depto_ids = request.args.getlist('depto_id', type=int)
     fecha_desde_str = request.args.get('desde', '', type=str)
     fecha_hasta_str = request.args.get('hasta', '', type=str)
 
-    justificaciones = get_filtered_justificaciones(q, depto_ids, fecha_desde_str, fecha_hasta_str)
-
-    output = BytesIO()
-    workbook = openpyxl.Workbook()
-    sheet = workbook.active
-    sheet.title = "Reporte de Justificaciones"
+    consulta = select(
+        Justificaciones.employee_passport,
+        PersonnelEmployee.first_name + ' ' + PersonnelEmployee.last_name,
+        PersonnelDepartment.dept_name,
+        Justificaciones.justification_type,
+        Justificaciones.date_start,
+        Justificaciones.date_end,
+        Justificaciones.reason
+    ).join(Justificaciones.empleado).join(PersonnelEmployee.department).where(
+        *_filtros_justificaciones(q, depto_ids, fecha_desde_str, fecha_hasta_str)
+    ).order_by(Justificaciones.date_start.desc())
 
     headers = ["Cédula", "Empleado", "Departamento", "Tipo", "Fecha Inicio", "Fecha Fin", "Razón"]
-    sheet.append(headers)
-    for cell in sheet[1]:
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill("solid", fgColor="DDEBF7")
-
-    for j in justificaciones:
-        sheet.append([
-            j.employee_passport,
-            f"{j.empleado.first_name} {j.empleado.last_name}",
-            j.empleado.department.dept_name,
-            j.justification_type.replace('_', ' ').title(),
-            j.date_start,
-            j.date_end,
-            j.reason
-        ])
-
-    for col in sheet.columns:
-        max_length = 0
-        column = col[0].column_letter
-        for cell in col:
-            try:
-                if len(str(cell.value)) > max_length: max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = (max_length + 2) if max_length < 50 else 50
-        sheet.column_dimensions[column].width = adjusted_width
-
-    workbook.save(output)
-    output.seek(0)
-
-    return send_file(
-        output, as_attachment=True, download_name='reporte_justificaciones.xlsx',
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
+    return respuesta_descarga(consulta, headers, 'reporte_justificaciones', "Reporte de Justificaciones",
+                              request.args.get('format', 'xlsx'),
+                              convertir={3: lambda tipo: tipo.replace('_', ' ').title()})
 
 
 # --- El resto de las rutas (crear, editar, anular, etc.) no cambian ---
@@ -147,12 +133,13 @@ def crear():
     dstart_obj = datetime.strptime(dstart_str, '%Y-%m-%d').date()
     dend_obj = datetime.strptime(dend_str, '%Y-%m-%d').date()
 
-    conflicto = Justificaciones.query.filter(
+    existentes = indice_justificaciones(Justificaciones.query.filter(
         Justificaciones.employee_passport == passport,
         Justificaciones.anulada == False,
         Justificaciones.date_start <= dend_obj,
         Justificaciones.date_end >= dstart_obj
-    ).first()
+    ).all())
+    conflicto = existentes.cruce(passport, dstart_obj, dend_obj)
 
     if conflicto:
         flash(
@@ -172,59 +159,12 @@ def crear():
 
 @justificaciones_bp.route('/cargar-excel', methods=['POST'])
 def cargar_excel():
-    if 'archivo_excel' not in request.files:
-        flash('No se seleccionó ningún archivo.', 'danger')
-        return redirect(url_for('justificaciones.index'))
-
-    file = request.files['archivo_excel']
-    if file.filename == '':
-        flash('No se seleccionó ningún archivo.', 'danger')
-        return redirect(url_for('justificaciones.index'))
-
-    if file and file.filename.endswith('.xlsx'):
-        try:
-            workbook = openpyxl.load_workbook(file)
-            sheet = workbook.active
-
-            creadas = 0;
-            errores = 0
-            for row in sheet.iter_rows(min_row=2, values_only=True):
-                passport, jtype, dstart, dend, reason = row
-                if not all([passport, jtype, dstart, dend]):
-                    errores += 1;
-                    continue
-                if not PersonnelEmployee.query.filter_by(passport=str(passport)).first():
-                    errores += 1;
-                    continue
-
-                dstart_obj = dstart.date() if isinstance(dstart, datetime) else datetime.strptime(
-                    str(dstart).split(" ")[0], '%Y-%m-%d').date()
-                dend_obj = dend.date() if isinstance(dend, datetime) else datetime.strptime(str(dend).split(" ")[0],
-                                                                                            '%Y-%m-%d').date()
-
-                conflicto = Justificaciones.query.filter(Justificaciones.employee_passport == str(passport),
-                                                         Justificaciones.anulada == False,
-                                                         Justificaciones.date_start <= dend_obj,
-                                                         Justificaciones.date_end >= dstart_obj).first()
-                if conflicto:
-                    errores += 1;
-                    continue
-
-                nueva_justificacion = Justificaciones(employee_passport=str(passport), justification_type=str(jtype),
-                                                      date_start=dstart_obj, date_end=dend_obj,
-                                                      reason=str(reason or ''))
-                db.session.add(nueva_justificacion)
-                creadas += 1
-
-            db.session.commit()
-            flash(f'Carga masiva completada: {creadas} justificaciones creadas, {errores} filas con errores.',
-                  'success' if errores == 0 else 'warning')
-        except Exception as e:
-            db.session.rollback()
-            flash(f'Ocurrió un error al procesar el archivo: {e}', 'danger')
-        return redirect(url_for('justificaciones.index'))
-    flash('Formato de archivo no válido. Por favor, sube un archivo .xlsx', 'danger')
-    return redirect(url_for('justificaciones.index'))
+    """Encola la carga masiva del archivo subido; la página consulta el estado en /importaciones."""
+    try:
+        id_trabajo = solicitar_importacion('justificaciones', request.files.get('archivo_excel'))
+    except ArchivoNoValido as e:
+        return jsonify({'error': str(e)}), 400
+    return respuesta_importacion(id_trabajo)
 
 
 @justificaciones_bp.route('/descargar-plantilla')
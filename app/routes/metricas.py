@@ -0,0 +1,10 @@
+from flask import Blueprint, Response, current_app
+
+metricas_bp = Blueprint('metricas', __name__)
+
+
+@metricas_bp.route('/metrics')
+def metrics():
+    """Métricas por endpoint en formato de texto de Prometheus."""
+    return Response(current_app.extensions['metricas'].texto_prometheus(),
+                    content_type='text/plain; version=0.0.4; charset=utf-8')
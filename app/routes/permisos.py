@@ -1,39 +1,47 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, send_file
-from sqlalchemy import or_
+from sqlalchemy import or_, select
+from sqlalchemy.orm import contains_eager
 from collections import defaultdict
 from app import db
 from app.models import Permisos, PersonnelEmployee, PersonnelDepartment
+from app.services.exportador_tabular import respuesta_descarga
+from app.services.importaciones import solicitar_importacion
+from app.services.ingesta import ArchivoNoValido
+from app.routes.importaciones import respuesta_importacion
 from datetime import datetime
 import openpyxl
 from io import BytesIO
-from openpyxl.styles import Font, PatternFill
 
 permisos_bp = Blueprint('permisos', __name__, url_prefix='/permisos')
 
 
-def get_filtered_permisos(q, depto_ids, fecha_desde_str, fecha_hasta_str):
-    """Función auxiliar para obtener permisos filtrados."""
-    query = Permisos.query.join(
-        PersonnelEmployee, Permisos.employee_passport == PersonnelEmployee.passport
-    ).join(
-        PersonnelDepartment, PersonnelEmployee.department_id == PersonnelDepartment.id
-    )
+def _filtros_permisos(q, depto_ids, fecha_desde_str, fecha_hasta_str):
+    """Condiciones de los filtros del listado (sobre el join con empleado y departamento)."""
+    condiciones = []
 
     if q:
         search_term = f'%{q}%'
-        query = query.filter(or_(
+        condiciones.append(or_(
             PersonnelEmployee.first_name.ilike(search_term),
             PersonnelEmployee.last_name.ilike(search_term),
             PersonnelEmployee.passport.ilike(search_term)
         ))
 
     if depto_ids:
-        query = query.filter(PersonnelDepartment.id.in_(depto_ids))
+        condiciones.append(PersonnelDepartment.id.in_(depto_ids))
 
     if fecha_desde_str:
-        query = query.filter(Permisos.fecha >= fecha_desde_str)
+        condiciones.append(Permisos.fecha >= fecha_desde_str)
     if fecha_hasta_str:
-        query = query.filter(Permisos.fecha <= fecha_hasta_str)
+        condiciones.append(Permisos.fecha <= fecha_hasta_str)
+    return condiciones
+
+
+def get_filtered_permisos(q, depto_ids, fecha_desde_str, fecha_hasta_str):
+    """Función auxiliar para obtener permisos filtrados (empleado y departamento en la misma consulta)."""
+    query = Permisos.query.join(Permisos.empleado).join(PersonnelEmployee.department).options(
+        contains_eager(Permisos.empleado).contains_eager(PersonnelEmployee.department)
+    ).filter(*_filtros_permisos(q, depto_ids, fecha_desde_str, fecha_hasta_str))
 
     return query.order_by(Permisos.fecha.desc()).all()
 
@@ -79,41 +87,19 @@ def descargar_reporte():
     fecha_desde_str = request.args.get('desde', '', type=str)
     fecha_hasta_str = request.args.get('hasta', '', type=str)
 
-    permisos = get_filtered_permisos(q, depto_ids, fecha_desde_str, fecha_hasta_str)
-
-    output = BytesIO()
-    workbook = openpyxl.Workbook()
-    sheet = workbook.active
-    sheet.title = "Reporte de Permisos"
+    consulta = select(
+        Permisos.employee_passport,
+        PersonnelEmployee.first_name + ' ' + PersonnelEmployee.last_name,
+        PersonnelDepartment.dept_name,
+        Permisos.fecha, Permisos.hora_desde, Permisos.hora_hasta,
+        Permisos.motivo, Permisos.observacion
+    ).join(Permisos.empleado).join(PersonnelEmployee.department).where(
+        *_filtros_permisos(q, depto_ids, fecha_desde_str, fecha_hasta_str)
+    ).order_by(Permisos.fecha.desc())
 
     headers = ["Cédula", "Empleado", "Departamento", "Fecha", "Desde Hora", "Hasta Hora", "Motivo", "Observación"]
-    sheet.append(headers)
-    for cell in sheet[1]:
-        cell.font = Font(bold=True);
-        cell.fill = PatternFill("solid", fgColor="DDEBF7")
-
-    for p in permisos:
-        sheet.append([
-            p.employee_passport, f"{p.empleado.first_name} {p.empleado.last_name}",
-            p.empleado.department.dept_name, p.fecha, p.hora_desde, p.hora_hasta,
-            p.motivo, p.observacion
-        ])
-
-    for col in sheet.columns:
-        max_length = 0;
-        column = col[0].column_letter
-        for cell in col:
-            try:
-                if len(str(cell.value)) > max_length: max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = (max_length + 2) if max_length < 50 else 50
-        sheet.column_dimensions[column].width = adjusted_width
-
-    workbook.save(output)
-    output.seek(0)
-    return send_file(output, as_attachment=True, download_name='reporte_permisos.xlsx',
-                     mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    return respuesta_descarga(consulta, headers, 'reporte_permisos', "Reporte de Permisos",
+                              request.args.get('format', 'xlsx'))
 
 
 @permisos_bp.route('/crear', methods=['POST'])
@@ -148,52 +134,12 @@ def crear():
 
 @permisos_bp.route('/cargar-excel', methods=['POST'])
 def cargar_excel():
-    if 'archivo_excel' not in request.files:
-        flash('No se seleccionó ningún archivo.', 'danger')
-        return redirect(url_for('permisos.index'))
-    file = request.files['archivo_excel']
-    if file.filename == '':
-        flash('No se seleccionó ningún archivo.', 'danger')
-        return redirect(url_for('permisos.index'))
-
-    if file and file.filename.endswith('.xlsx'):
-        try:
-            workbook = openpyxl.load_workbook(file)
-            sheet = workbook.active
-            creadas = 0;
-            errores = 0
-            for row in sheet.iter_rows(min_row=2, values_only=True):
-                passport, fecha, hora_desde, hora_hasta, motivo, observacion = row
-                if not all([passport, fecha, hora_desde, hora_hasta, motivo]):
-                    errores += 1;
-                    continue
-                if not PersonnelEmployee.query.filter_by(passport=str(passport)).first():
-                    errores += 1;
-                    continue
-
-                fecha_obj = fecha.date() if isinstance(fecha, datetime) else datetime.strptime(str(fecha).split(" ")[0],
-                                                                                               '%Y-%m-%d').date()
-                hora_desde_obj = hora_desde if isinstance(hora_desde, datetime.time) else datetime.strptime(
-                    str(hora_desde), '%H:%M:%S').time()
-                hora_hasta_obj = hora_hasta if isinstance(hora_hasta, datetime.time) else datetime.strptime(
-                    str(hora_hasta), '%H:%M:%S').time()
-
-                nuevo_permiso = Permisos(
-                    employee_passport=str(passport), fecha=fecha_obj, hora_desde=hora_desde_obj,
-                    hora_hasta=hora_hasta_obj, motivo=str(motivo), observacion=str(observacion or '')
-                )
-                db.session.add(nuevo_permiso)
-                creadas += 1
-
-            db.session.commit()
-            flash(f'Carga masiva completada: {creadas} permisos creados, {errores} filas con errores.',
-                  'success' if errores == 0 else 'warning')
-        except Exception as e:
-            db.session.rollback()
-            flash(f'Ocurrió un error al procesar el archivo: {e}', 'danger')
-        return redirect(url_for('permisos.index'))
-    flash('Formato de archivo no válido. Por favor, sube un archivo .xlsx', 'danger')
-    return redirect(url_for('permisos.index'))
+    """Encola la carga masiva del archivo subido; la página consulta el estado en /importaciones."""
+    try:
+        id_trabajo = solicitar_importacion('permisos', request.files.get('archivo_excel'))
+    except ArchivoNoValido as e:
+        return jsonify({'error': str(e)}), 400
+    return respuesta_importacion(id_trabajo)
 
 
 @permisos_bp.route('/descargar-plantilla')
@@ -1,11 +1,23 @@
-from flask import Blueprint, render_template, request, send_file, flash, url_for
+from flask import (Blueprint, render_template, request, send_file, flash, url_for, redirect, jsonify, abort,
+                   Response, stream_with_context)
 from app.models import PersonnelDepartment
-from app.services.report_builder import build_report
+from app.services.report_builder import build_report, iter_report, LimiteMarcacionesExcedido
 from app.services.excel_builder import crear_excel_reporte
+from app.services.formatos_planos import iter_csv, crear_parquet_reporte, parquet_disponible, FormatoNoDisponible
+from app.services.exportaciones import solicitar_exportacion, estado_exportacion, archivo_exportacion, LISTO
+from app.services.instrumentacion import medir_flujo
+import os
 from datetime import datetime
 
 reportes_bp = Blueprint('reportes', __name__, url_prefix='/reportes')
 
+# Extensión del archivo descargado -> mimetype.
+MIMETYPES = {
+    '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    '.parquet': 'application/vnd.apache.parquet',
+    '.csv': 'text/csv',
+}
+
 
 @reportes_bp.route('/')
 def index():
@@ -22,48 +34,132 @@ def index():
     if fecha_desde_str and fecha_hasta_str:
         fecha_desde = datetime.strptime(fecha_desde_str, '%Y-%m-%d').date()
         fecha_hasta = datetime.strptime(fecha_hasta_str, '%Y-%m-%d').date()
-        resultados_reporte = build_report(fecha_desde, fecha_hasta, departamento_id)
+        try:
+            resultados_reporte = build_report(fecha_desde, fecha_hasta, departamento_id)
+        except LimiteMarcacionesExcedido as e:
+            flash(str(e), 'danger')
 
     return render_template(
         'reportes/index.html',
         departamentos=departamentos,
         departamento_seleccionado=departamento_id,
-        resultados=resultados_reporte
+        resultados=resultados_reporte,
+        parquet_disponible=parquet_disponible()
     )
 
 
-@reportes_bp.route('/descargar-excel')
-def descargar_excel():
-    fecha_desde_str = request.args.get('fecha_desde')
-    fecha_hasta_str = request.args.get('fecha_hasta')
-
+def _parametros_excel(args):
+    """Parámetros del Excel (fechas, departamento y costos/multas como float), o None sin rango de fechas."""
+    fecha_desde_str = args.get('fecha_desde')
+    fecha_hasta_str = args.get('fecha_hasta')
     if not fecha_desde_str or not fecha_hasta_str:
-        flash('El rango de fechas es obligatorio para descargar el reporte.', 'danger')
-        return redirect(url_for('reportes.index'))
+        return None
 
     # Recoger todos los parámetros del formulario, convirtiéndolos a float
-    params = {
+    return {
         'fecha_desde': datetime.strptime(fecha_desde_str, '%Y-%m-%d').date(),
         'fecha_hasta': datetime.strptime(fecha_hasta_str, '%Y-%m-%d').date(),
-        'departamento_id': request.args.get('departamento_id'),
-        'costo_hora_normal': float(request.args.get('costo_hora_normal', 0)),
-        'costo_hora_sabfer': float(request.args.get('costo_hora_sabfer', 0)),
-        'multa_atraso_normal': float(request.args.get('multa_atraso_normal', 0)),
-        'multa_atraso_sabfer': float(request.args.get('multa_atraso_sabfer', 0)),
-        'multa_falta_normal': float(request.args.get('multa_falta_normal', 0)),
-        'multa_falta_sabfer': float(request.args.get('multa_falta_sabfer', 0))
+        'departamento_id': args.get('departamento_id') or None,
+        'costo_hora_normal': float(args.get('costo_hora_normal') or 0),
+        'costo_hora_sabfer': float(args.get('costo_hora_sabfer') or 0),
+        'multa_atraso_normal': float(args.get('multa_atraso_normal') or 0),
+        'multa_atraso_sabfer': float(args.get('multa_atraso_sabfer') or 0),
+        'multa_falta_normal': float(args.get('multa_falta_normal') or 0),
+        'multa_falta_sabfer': float(args.get('multa_falta_sabfer') or 0)
     }
 
-    # Generar los datos del reporte
-    resultados_reporte = build_report(params['fecha_desde'], params['fecha_hasta'], params['departamento_id'])
 
-    # Crear el archivo Excel, pasando tanto los datos como los parámetros de costos/multas
-    archivo_excel_en_memoria = crear_excel_reporte(resultados_reporte, params)
+@reportes_bp.route('/descargar-excel')
+def descargar_excel():
+    """
+    Descarga síncrona (se conserva para enlaces existentes; la página usa /exportaciones).
+    Con `format=csv` o `format=parquet` entrega solo las filas de la Matriz de Trabajo, sin estilos.
+    """
+    params = _parametros_excel(request.args)
+    if params is None:
+        flash('El rango de fechas es obligatorio para descargar el reporte.', 'danger')
+        return redirect(url_for('reportes.index'))
+
+    # Generar los datos del reporte (empleado por empleado, sin armar la lista completa)
+    resultados_reporte = iter_report(params['fecha_desde'], params['fecha_hasta'], params['departamento_id'])
+    nombre_base = f"Reporte_Financiero_{params['fecha_desde']}_a_{params['fecha_hasta']}"
+    formato = request.args.get('format', 'xlsx')
+
+    if formato == 'csv':
+        return _respuesta_csv(resultados_reporte, f'{nombre_base}.csv')
+
+    # Crear el archivo, pasando tanto los datos como los parámetros de costos/multas
+    try:
+        if formato == 'parquet':
+            archivo, nombre_archivo = crear_parquet_reporte(resultados_reporte), f'{nombre_base}.parquet'
+        else:
+            archivo, nombre_archivo = crear_excel_reporte(resultados_reporte, params), f'{nombre_base}.xlsx'
+    except (LimiteMarcacionesExcedido, FormatoNoDisponible) as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('reportes.index'))
 
-    nombre_archivo = f"Reporte_Financiero_{fecha_desde_str}_a_{fecha_hasta_str}.xlsx"
+    return send_file(archivo, as_attachment=True, download_name=nombre_archivo, mimetype=_mimetype(nombre_archivo))
+
+
+def _mimetype(nombre_archivo):
+    return MIMETYPES.get(os.path.splitext(nombre_archivo)[1].lower(), 'application/octet-stream')
+
+
+def _respuesta_csv(resultados_reporte, nombre_archivo):
+    """
+    CSV enviado a medida que se calcula. El primer empleado se calcula antes de
+    responder, así un error temprano (p. ej. el límite de marcaciones) todavía
+    puede volver a la página con el mensaje; uno posterior corta la descarga.
+    El resto se calcula ya terminada la petición instrumentada: su SQL se mide
+    con medir_flujo y aparece en /metrics como 'reportes.descargar_excel:flujo'.
+    """
+    bloques = iter_csv(resultados_reporte)
+    try:
+        inicio = [next(bloques), next(bloques, '')]
+    except LimiteMarcacionesExcedido as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('reportes.index'))
+
+    def generar():
+        yield from inicio
+        yield from bloques
+
+    return Response(stream_with_context(medir_flujo(generar())), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename={nombre_archivo}'})
+
+
+# --- EXPORTACIÓN EN SEGUNDO PLANO ---
+
+@reportes_bp.route('/exportaciones', methods=['POST'])
+def crear_exportacion():
+    params = _parametros_excel(request.form)
+    if params is None:
+        return jsonify({'error': 'El rango de fechas es obligatorio para descargar el reporte.'}), 400
+    id_trabajo = solicitar_exportacion(params)
+    return jsonify({'id': id_trabajo,
+                    'estado_url': url_for('reportes.ver_exportacion', id_trabajo=id_trabajo)}), 202
+
+
+@reportes_bp.route('/exportaciones/<id_trabajo>')
+def ver_exportacion(id_trabajo):
+    estado = estado_exportacion(id_trabajo)
+    if estado is None:
+        abort(404)
+    respuesta = {clave: estado.get(clave) for clave in ('id', 'estado', 'procesados', 'total', 'mensaje')}
+    if estado['estado'] == LISTO:
+        respuesta['descarga_url'] = url_for('reportes.descargar_exportacion', id_trabajo=id_trabajo)
+    return jsonify(respuesta)
+
+
+@reportes_bp.route('/exportaciones/<id_trabajo>/archivo')
+def descargar_exportacion(id_trabajo):
+    ruta = archivo_exportacion(id_trabajo)
+    if ruta is None:
+        abort(404)
+    nombre_archivo = estado_exportacion(id_trabajo)['nombre_archivo']
     return send_file(
-        archivo_excel_en_memoria,
+        ruta,
         as_attachment=True,
         download_name=nombre_archivo,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
\ No newline at end of file
+        mimetype=_mimetype(nombre_archivo)
+    )
@@ -0,0 +1,250 @@
+"""
+Tabla de hechos `asistencia_diaria`: una fila por empleado y día con los
+resultados ya calculados del reporte.
+
+- `refrescar_asistencia()` la mantiene al día de forma incremental: solo
+  recalcula los días con marcaciones nuevas (id > último procesado) y los
+  días que faltan en la tabla (período nuevo, empleados nuevos o filas
+  invalidadas).
+- Editar Justificaciones, Permisos, asignaciones a grupos u horarios
+  especiales borra, en la misma transacción, las filas de los días
+  afectados; hasta el siguiente refresco esos empleados se calculan en vivo.
+- `leer_hechos()` reconstruye los items de `build_report` desde la tabla.
+"""
+from datetime import date, datetime, timedelta, time
+from itertools import groupby
+
+from flask import current_app
+from sqlalchemy import text, delete, select, func, and_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app import db
+from app.models import (AsistenciaDiaria, AsistenciaRefresco, PersonnelEmployee, PersonnelDepartment,
+                        GrupoEmpleados, IClockTransaction)
+from app.services.cambios import al_detectar_cambios
+from app.services.registro_dia import RegistroDia
+from app.services.report_builder import (consultar_empleados, cargar_datos_reporte, calcular_reporte,
+                                         dias_del_periodo)
+
+ESTADOS_ASISTENCIA = ('Presente', 'Atraso', 'Permiso')
+
+
+def _resumen_vacio():
+    return {
+        'total_asistencias': 0,
+        'total_atrasos_normal': 0, 'total_atrasos_sabfer': 0,
+        'total_minutos_atraso_normal': 0, 'total_minutos_atraso_sabfer': 0,
+        'total_faltas_normal': 0, 'total_faltas_sabfer': 0,
+        'total_faltas_injustificadas_normal': 0, 'total_faltas_injustificadas_sabfer': 0,
+        'total_faltas_justificadas': 0,
+        'total_horas_extras_normal': timedelta(), 'total_horas_extras_sabfer': timedelta()
+    }
+
+
+# ==============================================================================
+# --- LECTURA: DE HECHOS A LA ESTRUCTURA DE build_report ---
+# ==============================================================================
+
+def _registro_desde_hecho(h):
+    return RegistroDia(h.fecha, h.estado, h.horario_entrada.hour * 60 + h.horario_entrada.minute,
+                       h.horario_salida.hour * 60 + h.horario_salida.minute, h.tipo_dia_laborable,
+                       h.es_feriado_laborable, h.minutos_atraso, h.segundos_trabajados, h.segundos_extras,
+                       h.segundos_almuerzo, int(h.es_falta), int(h.es_atraso), h.hora_ingreso,
+                       h.hora_salida_almuerzo, h.hora_regreso_almuerzo, h.hora_salida_final)
+
+
+def _resumen_desde_hechos(hechos):
+    resumen = _resumen_vacio()
+    for h in hechos:
+        sufijo = 'normal' if h.tipo_dia_laborable == 'Normal' else 'sabfer'
+        if h.estado in ESTADOS_ASISTENCIA:
+            resumen['total_asistencias'] += 1
+        elif h.estado == 'Justificado':
+            resumen['total_faltas_justificadas'] += 1
+        if h.es_atraso:
+            resumen[f'total_atrasos_{sufijo}'] += 1
+            resumen[f'total_minutos_atraso_{sufijo}'] += h.minutos_atraso
+        if h.es_falta:
+            resumen[f'total_faltas_{sufijo}'] += 1
+            resumen[f'total_faltas_injustificadas_{sufijo}'] += 1
+        if h.segundos_extras:
+            resumen[f'total_horas_extras_{sufijo}'] += timedelta(seconds=h.segundos_extras)
+    return resumen
+
+
+def _empleados_con_marcaciones_pendientes(ids_empleados, start_date, end_date, ultimo_id):
+    """Empleados con marcaciones aún no procesadas por el refresco dentro del rango."""
+    sql = text("""
+        SELECT DISTINCT t.emp_id FROM iclock_transaction t
+        WHERE t.id > :ultimo_id AND t.emp_id = ANY(:ids_empleados)
+          AND t.punch_time >= :start_date AND t.punch_time < :end_date_plus_one
+    """)
+    return {fila.emp_id for fila in db.session.execute(sql, {
+        'ultimo_id': ultimo_id, 'ids_empleados': ids_empleados, 'start_date': start_date,
+        'end_date_plus_one': end_date + timedelta(days=1)})}
+
+
+def leer_hechos(empleados, start_date, end_date):
+    """
+    Devuelve {employee_id: item} para los empleados cuyo período completo está
+    en `asistencia_diaria` y no tienen marcaciones pendientes de refrescar.
+    Los demás quedan fuera y deben calcularse en vivo.
+    """
+    dias_esperados = len(dias_del_periodo(start_date, end_date))
+    estado = db.session.get(AsistenciaRefresco, 1)
+    if estado is None or not dias_esperados:
+        return {}
+
+    ids_empleados = [e.id for e in empleados]
+    excluidos = _empleados_con_marcaciones_pendientes(ids_empleados, start_date, end_date,
+                                                      estado.ultimo_transaction_id)
+    filas = AsistenciaDiaria.query.filter(
+        AsistenciaDiaria.employee_id.in_(ids_empleados),
+        AsistenciaDiaria.fecha.between(start_date, end_date)
+    ).order_by(AsistenciaDiaria.employee_id, AsistenciaDiaria.fecha).all()
+
+    por_empleado = {emp_id: list(hechos) for emp_id, hechos in groupby(filas, key=lambda h: h.employee_id)}
+    resultado = {}
+    for empleado in empleados:
+        hechos = por_empleado.get(empleado.id)
+        if empleado.id in excluidos or not hechos or len(hechos) != dias_esperados:
+            continue
+        resultado[empleado.id] = {
+            'empleado': empleado,
+            'registros': [_registro_desde_hecho(h) for h in hechos],
+            'resumen': _resumen_desde_hechos(hechos)
+        }
+    return resultado
+
+
+# ==============================================================================
+# --- ESCRITURA: REFRESCO INCREMENTAL ---
+# ==============================================================================
+
+def _hecho_desde_registro(empleado, reg, ahora):
+    return {
+        'employee_id': empleado.id, 'employee_passport': empleado.passport, 'fecha': reg.fecha,
+        'estado': reg.estado, 'tipo_dia_laborable': reg.tipo_dia_laborable,
+        'es_feriado_laborable': bool(reg.es_feriado_laborable),
+        'horario_entrada': time(*divmod(reg.entrada_prog, 60)),
+        'horario_salida': time(*divmod(reg.salida_prog, 60)),
+        'hora_ingreso': reg.hora_ingreso, 'hora_salida_almuerzo': reg.hora_salida_almuerzo,
+        'hora_regreso_almuerzo': reg.hora_regreso_almuerzo, 'hora_salida_final': reg.hora_salida_final,
+        'minutos_atraso': reg.minutos_atraso, 'segundos_almuerzo': reg.segundos_almuerzo,
+        'segundos_trabajados': reg.segundos_trabajados, 'segundos_extras': reg.segundos_extras,
+        'es_falta': bool(reg.es_falta), 'es_atraso': bool(reg.es_atraso), 'actualizado_en': ahora
+    }
+
+
+def _guardar_hechos(filas, tamano_bloque=1000):
+    """Upsert por bloques (un INSERT ... ON CONFLICT por bloque, sin pasar el límite de parámetros)."""
+    for i in range(0, len(filas), tamano_bloque):
+        bloque = filas[i:i + tamano_bloque]
+        stmt = pg_insert(AsistenciaDiaria.__table__).values(bloque)
+        columnas = {c: stmt.excluded[c] for c in bloque[0] if c not in ('employee_id', 'fecha')}
+        db.session.execute(stmt.on_conflict_do_update(index_elements=['employee_id', 'fecha'], set_=columnas))
+
+
+def _rangos_dias_faltantes(desde, hasta):
+    """Por empleado, el primer y último día del rango cubierto que no tiene fila de hechos."""
+    sql = text("""
+        SELECT e.id AS emp_id, min(d)::date AS desde, max(d)::date AS hasta
+        FROM personnel_employee e
+        JOIN personnel_department pd ON pd.id = e.department_id
+        CROSS JOIN generate_series(CAST(:desde AS date), CAST(:hasta AS date), interval '1 day') AS d
+        WHERE pd.dept_name = ANY(:departamentos) AND extract(isodow FROM d) <> 7
+          AND NOT EXISTS (SELECT 1 FROM asistencia_diaria a WHERE a.employee_id = e.id AND a.fecha = d::date)
+        GROUP BY e.id
+    """)
+    return {f.emp_id: (f.desde, f.hasta) for f in db.session.execute(sql, {
+        'desde': desde, 'hasta': hasta, 'departamentos': ['Callcenter', 'Guayaquil', 'Administracion']})}
+
+
+def _rangos_marcaciones_nuevas(desde_id, hasta_id):
+    """Por empleado, el rango de días locales con marcaciones en (desde_id, hasta_id]."""
+    sql = text("""
+        SELECT t.emp_id, min((t.punch_time AT TIME ZONE 'America/Guayaquil')::date) AS desde,
+               max((t.punch_time AT TIME ZONE 'America/Guayaquil')::date) AS hasta
+        FROM iclock_transaction t
+        WHERE t.id > :desde_id AND t.id <= :hasta_id AND t.emp_id IS NOT NULL
+        GROUP BY t.emp_id
+    """)
+    return {f.emp_id: (f.desde, f.hasta) for f in db.session.execute(sql, {'desde_id': desde_id,
+                                                                           'hasta_id': hasta_id})}
+
+
+def refrescar_asistencia(hasta=None, lote=None, log=None):
+    """
+    Actualiza `asistencia_diaria` hasta la fecha indicada (hoy por defecto).
+    Devuelve un diccionario con estadísticas del proceso.
+    """
+    log = log or (lambda mensaje: None)
+    lote = lote or current_app.config.get('ASISTENCIA_LOTE_EMPLEADOS', 200)
+    hasta = hasta or date.today()
+
+    estado = db.session.get(AsistenciaRefresco, 1)
+    if estado is None:
+        desde = datetime.strptime(current_app.config['ASISTENCIA_HECHOS_DESDE'], '%Y-%m-%d').date()
+        estado = AsistenciaRefresco(id=1, ultimo_transaction_id=0, cubierto_desde=desde)
+        db.session.add(estado)
+    desde = estado.cubierto_desde
+
+    ultimo_id = db.session.execute(select(func.coalesce(func.max(IClockTransaction.id), 0))).scalar()
+
+    # Rango a recalcular por empleado: días faltantes + días con marcaciones nuevas.
+    rangos = _rangos_dias_faltantes(desde, hasta)
+    for emp_id, (r_desde, r_hasta) in _rangos_marcaciones_nuevas(estado.ultimo_transaction_id, ultimo_id).items():
+        r_desde, r_hasta = max(r_desde, desde), min(r_hasta, hasta)
+        if r_desde > r_hasta:
+            continue
+        if emp_id in rangos:
+            r_desde, r_hasta = min(r_desde, rangos[emp_id][0]), max(r_hasta, rangos[emp_id][1])
+        rangos[emp_id] = (r_desde, r_hasta)
+
+    empleados = {e.id: e for e in consultar_empleados() if e.id in rangos}
+    stats = {'empleados': len(empleados), 'filas': 0}
+    ahora = datetime.utcnow()
+
+    # Se agrupan los empleados con el mismo rango para calcularlos juntos.
+    ordenados = sorted(empleados, key=lambda emp_id: rangos[emp_id])
+    for (r_desde, r_hasta), ids in groupby(ordenados, key=lambda emp_id: rangos[emp_id]):
+        ids = list(ids)
+        for i in range(0, len(ids), lote):
+            grupo = [empleados[emp_id] for emp_id in ids[i:i + lote]]
+            datos = cargar_datos_reporte(r_desde, r_hasta, grupo)
+            filas = [_hecho_desde_registro(item['empleado'], reg, ahora)
+                     for item in calcular_reporte(datos) for reg in item['registros']]
+            _guardar_hechos(filas)
+            db.session.commit()
+            stats['filas'] += len(filas)
+            log(f'{r_desde} a {r_hasta}: {len(grupo)} empleados, {len(filas)} filas.')
+
+    estado = db.session.get(AsistenciaRefresco, 1)
+    estado.ultimo_transaction_id = ultimo_id
+    estado.cubierto_hasta = max(estado.cubierto_hasta or hasta, hasta)
+    estado.actualizado_en = datetime.utcnow()
+    db.session.commit()
+    return stats
+
+
+# ==============================================================================
+# --- INVALIDACIÓN POR CAMBIOS EN LOS DATOS DE ORIGEN ---
+# ==============================================================================
+
+@al_detectar_cambios
+def invalidar_hechos(session, cambios):
+    """Borra las filas de hechos afectadas por los cambios; el siguiente refresco las recalcula."""
+    tabla = AsistenciaDiaria.__table__
+    for cambio in cambios:
+        if cambio.ambito == 'empleado':
+            condicion = tabla.c.employee_passport == cambio.valor
+        elif cambio.ambito == 'grupo':
+            condicion = tabla.c.employee_passport.in_(
+                select(GrupoEmpleados.employee_passport).where(GrupoEmpleados.grupo_id == cambio.valor))
+        else:
+            condicion = tabla.c.employee_id.in_(
+                select(PersonnelEmployee.id).join(PersonnelDepartment).where(
+                    PersonnelDepartment.dept_name == cambio.valor))
+        if cambio.desde is not None:
+            condicion = and_(condicion, tabla.c.fecha >= cambio.desde, tabla.c.fecha <= cambio.hasta)
+        session.connection().execute(delete(tabla).where(condicion))
@@ -0,0 +1,84 @@
+"""
+Calendario de horarios efectivos por día para cada par (grupo_id, dept_name).
+
+Combina una sola vez por período los horarios especiales del departamento
+y del grupo (extras = máximo, feriado = cualquiera de los dos, entrada y
+salida del grupo antes que las del departamento, 08:00/18:00 por defecto)
+y guarda una lista densa con un HorarioEfectivo por día. Los empleados que
+comparten grupo y departamento comparten la misma lista.
+
+Los calendarios se memorizan por proceso con una firma del período y de
+las filas de horarios especiales: si alguien edita un horario o un feriado,
+la firma cambia y se compila uno nuevo, también en los demás workers.
+"""
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import time
+
+HorarioEfectivo = namedtuple('HorarioEfectivo', 'entrada salida extras feriado')
+# Copia de una fila de horario especial (el calendario sobrevive a la sesión que la cargó).
+_Regla = namedtuple('_Regla', 'hora_entrada_especial hora_salida_especial horas_extras feriado')
+
+ENTRADA_DEFECTO = time(8, 0, 0)
+SALIDA_DEFECTO = time(18, 0, 0)
+MAX_CALENDARIOS = 16
+
+_calendarios = OrderedDict()
+_lock = threading.Lock()
+
+
+def _reglas(filas, clave):
+    # Si hay dos reglas para la misma clave y día, gana la última (igual que el dict original).
+    return {(getattr(h, clave), h.fecha): _Regla(h.hora_entrada_especial, h.hora_salida_especial, h.horas_extras,
+                                                  h.feriado) for h in filas}
+
+
+class CalendarioHorarios:
+    def __init__(self, dias, grupo_horarios, depto_horarios):
+        self.dias = dias
+        self._grupo = _reglas(grupo_horarios, 'grupo_id')
+        self._depto = _reglas(depto_horarios, 'dept_name')
+        self._pares = {}
+
+    def para(self, grupo_id, dept_name):
+        """Un HorarioEfectivo por cada día del período (mismo orden que `dias`)."""
+        par = (grupo_id, dept_name)
+        calendario = self._pares.get(par)
+        if calendario is None:
+            calendario = self._pares[par] = [self._compilar(grupo_id, dept_name, dia) for dia in self.dias]
+        return calendario
+
+    def _compilar(self, grupo_id, dept_name, dia):
+        depto = self._depto.get((dept_name, dia))
+        grupo = self._grupo.get((grupo_id, dia))
+        if depto is None and grupo is None:
+            return _SIN_REGLAS
+        extras = max(depto.horas_extras if depto else 0, grupo.horas_extras if grupo else 0)
+        feriado = (depto.feriado if depto else False) or (grupo.feriado if grupo else False)
+        entrada = (grupo and grupo.hora_entrada_especial) or (depto and depto.hora_entrada_especial) or ENTRADA_DEFECTO
+        salida = (grupo and grupo.hora_salida_especial) or (depto and depto.hora_salida_especial) or SALIDA_DEFECTO
+        return HorarioEfectivo(entrada, salida, extras, feriado)
+
+
+_SIN_REGLAS = HorarioEfectivo(ENTRADA_DEFECTO, SALIDA_DEFECTO, 0, False)
+
+
+def _firma(filas, clave):
+    return tuple((getattr(h, clave), h.fecha, h.hora_entrada_especial, h.hora_salida_especial, h.horas_extras,
+                  h.feriado) for h in filas)
+
+
+def calendario_horarios(dias, grupo_horarios, depto_horarios):
+    """Calendario del período, reutilizado entre peticiones mientras los horarios especiales no cambien."""
+    clave = (tuple(dias), _firma(grupo_horarios, 'grupo_id'), _firma(depto_horarios, 'dept_name'))
+    with _lock:
+        calendario = _calendarios.get(clave)
+        if calendario is not None:
+            _calendarios.move_to_end(clave)
+            return calendario
+    calendario = CalendarioHorarios(dias, grupo_horarios, depto_horarios)
+    with _lock:
+        _calendarios[clave] = calendario
+        while len(_calendarios) > MAX_CALENDARIOS:
+            _calendarios.popitem(last=False)
+    return calendario
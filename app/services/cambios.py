@@ -0,0 +1,159 @@
+"""
+Detección de cambios que afectan el cálculo de asistencia.
+
+Escucha los flush de la sesión (y los UPDATE/DELETE masivos hechos con
+`Query.delete()` / `Query.update()`) sobre Justificaciones, Permisos,
+GrupoEmpleados y horarios especiales, y los traduce a objetos `Cambio`
+que indican a quién y a qué rango de fechas afectan. Los servicios que
+guardan resultados derivados se suscriben con `al_detectar_cambios`
+(dentro de la transacción) o `al_confirmar_cambios` (después del commit).
+
+Las escrituras con SQL Core (INSERT masivos, ON CONFLICT, COPY) no pasan
+por el flush: quien las hace las publica con `publicar_cambios`.
+"""
+from collections import namedtuple
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+
+from app.models import (Justificaciones, Permisos, GrupoEmpleados, GrupoHorariosEspeciales,
+                        DepartmentHorariosEspeciales)
+
+# ambito: 'empleado' (valor = pasaporte), 'grupo' (valor = grupo_id) o 'departamento' (valor = dept_name).
+# desde/hasta en None significan "todas las fechas".
+Cambio = namedtuple('Cambio', 'ambito valor desde hasta')
+
+# Atributos que se leen de cada modelo para construir el Cambio.
+_CAMPOS = {
+    Justificaciones: ('employee_passport', 'date_start', 'date_end'),
+    Permisos: ('employee_passport', 'fecha'),
+    GrupoEmpleados: ('employee_passport',),
+    GrupoHorariosEspeciales: ('grupo_id', 'fecha'),
+    DepartmentHorariosEspeciales: ('dept_name', 'fecha'),
+}
+
+_suscriptores = []
+_suscriptores_commit = []
+
+
+def al_detectar_cambios(funcion):
+    """
+    Registra `funcion(session, cambios)`. Se invoca dentro de la misma transacción
+    en la que se hicieron los cambios, así que puede ejecutar SQL con `session.connection()`.
+    """
+    _suscriptores.append(funcion)
+    return funcion
+
+
+def al_confirmar_cambios(funcion):
+    """
+    Registra `funcion(cambios)`. Se invoca una sola vez después de que la transacción
+    se confirma, con todos los cambios acumulados; si hay rollback no se invoca.
+    """
+    _suscriptores_commit.append(funcion)
+    return funcion
+
+
+def _cambio(modelo, valores):
+    if modelo is Justificaciones:
+        return Cambio('empleado', valores['employee_passport'], valores['date_start'], valores['date_end'])
+    if modelo is Permisos:
+        return Cambio('empleado', valores['employee_passport'], valores['fecha'], valores['fecha'])
+    if modelo is GrupoEmpleados:
+        return Cambio('empleado', valores['employee_passport'], None, None)
+    if modelo is GrupoHorariosEspeciales:
+        return Cambio('grupo', valores['grupo_id'], valores['fecha'], valores['fecha'])
+    return Cambio('departamento', valores['dept_name'], valores['fecha'], valores['fecha'])
+
+
+def _cambios_de_objeto(obj, modificado):
+    modelo = type(obj)
+    campos = _CAMPOS[modelo]
+    actuales = {campo: getattr(obj, campo) for campo in campos}
+    cambios = {_cambio(modelo, actuales)}
+    if modificado:
+        # También se invalida el estado anterior (p. ej. una justificación cuyas fechas se movieron).
+        anteriores = dict(actuales)
+        for campo in campos:
+            historial = get_history(obj, campo)
+            if historial.deleted:
+                anteriores[campo] = historial.deleted[0]
+        cambios.add(_cambio(modelo, anteriores))
+    return cambios
+
+
+def _notificar(session, cambios):
+    cambios = {c for c in cambios if c.valor is not None}
+    if not cambios:
+        return
+    for funcion in _suscriptores:
+        funcion(session, cambios)
+    session.info.setdefault('cambios_asistencia', set()).update(cambios)
+
+
+def _combinar(cambios):
+    """Un Cambio por (ámbito, valor), con el rango que cubre a todos (sin fechas si alguno no tiene)."""
+    rangos = {}
+    for c in cambios:
+        clave = c.ambito, c.valor
+        previo = rangos.get(clave)
+        if previo is None:
+            rangos[clave] = c
+        elif previo.desde is not None and c.desde is not None:
+            rangos[clave] = previo._replace(desde=min(previo.desde, c.desde), hasta=max(previo.hasta, c.hasta))
+        else:
+            rangos[clave] = previo._replace(desde=None, hasta=None)
+    return set(rangos.values())
+
+
+def publicar_cambios(session, modelo, filas):
+    """
+    Notifica las filas de `modelo` escritas sin pasar por el flush. `filas` son
+    dicts (o mappings) con los campos que usa el modelo: employee_passport y
+    date_start/date_end o fecha, grupo_id y fecha, etc. Se llama dentro de la
+    transacción de la escritura; los suscriptores de `al_confirmar_cambios`
+    reciben los cambios al hacer commit. Los cambios del mismo empleado (o
+    grupo) se combinan en un solo rango, para no invalidar fila por fila.
+    """
+    _notificar(session, _combinar(_cambio(modelo, fila) for fila in filas))
+
+
+@event.listens_for(Session, 'after_flush')
+def _after_flush(session, flush_context):
+    cambios = set()
+    for coleccion, modificado in ((session.new, False), (session.dirty, True), (session.deleted, False)):
+        for obj in coleccion:
+            if type(obj) in _CAMPOS:
+                cambios |= _cambios_de_objeto(obj, modificado)
+    _notificar(session, cambios)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _do_orm_execute(orm_execute_state):
+    """Los DELETE/UPDATE masivos no pasan por el flush: se consultan antes las filas afectadas."""
+    if not (orm_execute_state.is_delete or orm_execute_state.is_update):
+        return
+    mapper = orm_execute_state.bind_mapper
+    modelo = mapper.class_ if mapper is not None else None
+    if modelo not in _CAMPOS:
+        return
+    columnas = [getattr(modelo, campo) for campo in _CAMPOS[modelo]]
+    consulta = select(*columnas)
+    if orm_execute_state.statement.whereclause is not None:
+        consulta = consulta.where(orm_execute_state.statement.whereclause)
+    filas = orm_execute_state.session.execute(consulta).mappings().all()
+    _notificar(orm_execute_state.session, {_cambio(modelo, fila) for fila in filas})
+
+
+@event.listens_for(Session, 'after_commit')
+def _after_commit(session):
+    cambios = session.info.pop('cambios_asistencia', None)
+    if cambios:
+        for funcion in _suscriptores_commit:
+            funcion(cambios)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _after_soft_rollback(session, previous_transaction):
+    session.info.pop('cambios_asistencia', None)
@@ -0,0 +1,203 @@
+"""
+Carga masiva de asignaciones (empleado -> cartera/grupo) y horarios especiales de grupo.
+
+El archivo se procesa por lotes (un commit por lote, carga_comun.por_lotes)
+y cada lote por etapas, en lugar de consultar la base fila por fila:
+
+1. Validación de las filas del lote (sin tocar la base).
+2. Resolución con pocas consultas por conjunto: pasaportes existentes,
+   carteras vigentes y grupos por nombre.
+3. Escritura: carteras y grupos nuevos con un INSERT ... RETURNING cada uno,
+   y asignaciones y horarios especiales con INSERT ... ON CONFLICT por
+   bloques (restricciones únicas de la migración 42144fa0bcb5).
+
+Como la escritura no pasa por el flush, las asignaciones nuevas y los
+horarios escritos se publican con cambios.publicar_cambios (caché de
+reportes y hechos de asistencia).
+
+Los errores se informan por fila (ErrorFila).
+"""
+from collections import defaultdict, namedtuple
+from datetime import datetime, time
+
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app import db
+from app.models import Carteras, Grupos, GrupoEmpleados, GrupoHorariosEspeciales
+from app.services.cambios import publicar_cambios
+from app.services.carga_comun import ErrorFila, TAMANO_BLOQUE, pasaportes_existentes, por_lotes
+
+COLUMNAS = ["Pasaporte_Empleado", "Nombre_Cartera", "Nombre_Grupo", "Fecha_Horario_Especial",
+            "Entrada_Especial", "Salida_Especial", "Horas_Extras"]
+
+FilaAsignacion = namedtuple('FilaAsignacion', 'fila valores passport cartera grupo fecha horario')
+
+
+def parse_time_from_excel(value):
+    """Función robusta para convertir un valor de Excel a un objeto time."""
+    if isinstance(value, time):
+        return value
+    if isinstance(value, datetime):
+        return value.time()
+    if isinstance(value, str):
+        for fmt in ('%H:%M:%S', '%H:%M'):
+            try:
+                return datetime.strptime(value, fmt).time()
+            except ValueError:
+                continue
+    return None
+
+
+# --- ETAPA 1: VALIDACIÓN ---
+
+def _validar_filas(filas, stats, errores):
+    """Filas válidas de `filas` ((número, valores)); las inválidas se cuentan en `stats` y van a `errores`."""
+    validas = []
+    for row_idx, row in filas:
+        passport, cartera_nombre, grupo_nombre, fecha_he, entrada_he, salida_he, horas_extras = row
+
+        if not all([passport, cartera_nombre, grupo_nombre]):
+            stats['filas_con_errores'] += 1
+            errores.append(ErrorFila(row_idx, row, "Datos básicos incompletos."))
+            continue
+
+        fecha_obj, horario = None, {}
+        if fecha_he:
+            try:
+                fecha_obj = fecha_he.date() if isinstance(fecha_he, datetime) else datetime.strptime(
+                    str(fecha_he).split(" ")[0], '%Y-%m-%d').date()
+            except (ValueError, TypeError) as e:
+                stats['filas_con_errores'] += 1
+                errores.append(ErrorFila(row_idx, row, f"Formato de fecha/hora inválido - {e}"))
+                continue
+            # Solo las columnas con valor cambian el horario existente.
+            if entrada_he:
+                horario['hora_entrada_especial'] = parse_time_from_excel(entrada_he)
+            if salida_he:
+                horario['hora_salida_especial'] = parse_time_from_excel(salida_he)
+            if horas_extras is not None and str(horas_extras).isdigit():
+                horario['horas_extras'] = int(horas_extras)
+
+        validas.append(FilaAsignacion(row_idx, row, str(passport), str(cartera_nombre), str(grupo_nombre),
+                                      fecha_obj, horario))
+    return validas
+
+
+# --- ETAPA 2: RESOLUCIÓN POR CONJUNTOS ---
+
+def _ids_por_nombre(modelo, nombres, *condiciones):
+    """{nombre: id} de `modelo`; si hay varios con el mismo nombre gana el más reciente."""
+    consulta = select(modelo.name, func.max(modelo.id)).where(modelo.name.in_(nombres), *condiciones)
+    return dict(db.session.execute(consulta.group_by(modelo.name)).all())
+
+
+# --- ETAPA 3: ESCRITURA ---
+
+def _crear_con_codigo(modelo, prefijo, valores):
+    """
+    Inserta `valores` (lista de dicts con 'name') con códigos PREFIJO-NNNN
+    correlativos al último id, como hacía la carga fila por fila. Devuelve
+    {nombre: id}.
+    """
+    if not valores:
+        return {}
+    ultimo = db.session.scalar(select(func.max(modelo.id))) or 0
+    for i, fila in enumerate(valores, 1):
+        fila['code'] = f"{prefijo}-{ultimo + i:04d}"
+    filas = db.session.execute(modelo.__table__.insert().values(valores).returning(
+        modelo.__table__.c.id, modelo.__table__.c.name)).all()
+    return {nombre: id_ for id_, nombre in filas}
+
+
+def _insertar_asignaciones(pares):
+    """INSERT ... ON CONFLICT DO NOTHING por bloques; publica y cuenta las asignaciones nuevas."""
+    pares = list(pares)
+    tabla = GrupoEmpleados.__table__
+    creadas = 0
+    for i in range(0, len(pares), TAMANO_BLOQUE):
+        bloque = [{'grupo_id': g, 'employee_passport': p} for g, p in pares[i:i + TAMANO_BLOQUE]]
+        stmt = pg_insert(tabla).values(bloque).on_conflict_do_nothing(
+            index_elements=['grupo_id', 'employee_passport']).returning(tabla.c.grupo_id, tabla.c.employee_passport)
+        nuevas = db.session.execute(stmt).mappings().all()
+        publicar_cambios(db.session, GrupoEmpleados, nuevas)
+        creadas += len(nuevas)
+    return creadas
+
+
+def _upsert_horarios(horarios):
+    """
+    Upsert de {(grupo_id, fecha): {columna: valor}}. Solo se actualizan las
+    columnas que vinieron en el archivo, así que se agrupa por conjunto de
+    columnas (un INSERT ... ON CONFLICT DO UPDATE por grupo y bloque).
+    """
+    por_columnas = defaultdict(list)
+    for (grupo_id, fecha), cambios in horarios.items():
+        por_columnas[tuple(sorted(cambios))].append({'grupo_id': grupo_id, 'fecha': fecha, **cambios})
+    for columnas, valores in por_columnas.items():
+        for i in range(0, len(valores), TAMANO_BLOQUE):
+            stmt = pg_insert(GrupoHorariosEspeciales.__table__).values(valores[i:i + TAMANO_BLOQUE])
+            if columnas:
+                stmt = stmt.on_conflict_do_update(index_elements=['grupo_id', 'fecha'],
+                                                  set_={c: stmt.excluded[c] for c in columnas})
+            else:
+                stmt = stmt.on_conflict_do_nothing(index_elements=['grupo_id', 'fecha'])
+            db.session.execute(stmt)
+    publicar_cambios(db.session, GrupoHorariosEspeciales,
+                     [{'grupo_id': grupo_id, 'fecha': fecha} for grupo_id, fecha in horarios])
+
+
+def _procesar_lote(lote, stats, errores):
+    filas = _validar_filas(lote, stats, errores)
+
+    existentes = pasaportes_existentes({f.passport for f in filas})
+    validas = []
+    for f in filas:
+        if f.passport not in existentes:
+            stats['empleados_no_encontrados'] += 1
+            stats['filas_con_errores'] += 1
+            errores.append(ErrorFila(f.fila, f.valores, f"Pasaporte '{f.passport}' no encontrado."))
+        else:
+            validas.append(f)
+
+    # Carteras: si no existe una vigente con ese nombre (o solo hay anuladas), se crea una nueva.
+    # Las creadas en lotes anteriores ya están confirmadas, así que se encuentran por nombre.
+    nombres_carteras = list(dict.fromkeys(f.cartera for f in validas))
+    carteras = _ids_por_nombre(Carteras, nombres_carteras, Carteras.anulada == False)
+    nuevas = [{'name': n} for n in nombres_carteras if n not in carteras]
+    carteras.update(_crear_con_codigo(Carteras, 'CAR', nuevas))
+    stats['carteras_creadas'] += len(nuevas)
+
+    # Grupos: los nuevos quedan en la cartera de la primera fila que los menciona.
+    primera_cartera = {}
+    for f in validas:
+        primera_cartera.setdefault(f.grupo, carteras[f.cartera])
+    grupos = _ids_por_nombre(Grupos, list(primera_cartera))
+    nuevos = [{'name': n, 'cartera_id': c, 'hora_entrada': time(8, 0), 'hora_salida': time(18, 0)}
+              for n, c in primera_cartera.items() if n not in grupos]
+    grupos.update(_crear_con_codigo(Grupos, 'GRP', nuevos))
+    stats['grupos_creados'] += len(nuevos)
+
+    stats['asignaciones_creadas'] += _insertar_asignaciones(
+        dict.fromkeys((grupos[f.grupo], f.passport) for f in validas))
+
+    # Horarios: varias filas para el mismo grupo y fecha se combinan en orden (la última gana por columna);
+    # entre lotes, el upsert solo pisa las columnas que trae cada uno, con el mismo resultado.
+    horarios = defaultdict(dict)
+    for f in validas:
+        if f.fecha is not None:
+            horarios[grupos[f.grupo], f.fecha].update(f.horario)
+            stats['horarios_especiales_creados_o_actualizados'] += 1
+    _upsert_horarios(horarios)
+
+
+def procesar_asignaciones(filas, filas_por_lote, progreso=None):
+    """
+    Procesa las filas de la carga masiva ((número, valores) de ingesta.ArchivoCarga.filas)
+    con un commit por lote (carga_comun.por_lotes). Devuelve (stats, errores): contadores
+    y ErrorFila en el orden del archivo.
+    """
+    stats = defaultdict(int)
+    errores = []
+    por_lotes(filas, filas_por_lote, lambda lote: _procesar_lote(lote, stats, errores), progreso)
+    return stats, sorted(errores, key=lambda e: e.fila)
@@ -0,0 +1,90 @@
+"""
+Piezas compartidas por las cargas masivas (asignaciones, justificaciones, permisos).
+
+- `pasaportes_existentes`: verifica los pasaportes del archivo con una
+  consulta por conjunto, en bloques de TAMANO_BLOQUE.
+- `por_lotes`: procesa las filas en lotes de CARGA_FILAS_POR_LOTE con un
+  commit por lote, así un error en la fila 19.999 no deshace lo anterior y
+  ningún lock dura toda la carga.
+- `ErrorFila` y `crear_informe_errores`: cada fila rechazada conserva los
+  valores leídos y el motivo, y se entregan en un Excel descargable.
+"""
+import tempfile
+from collections import namedtuple
+from itertools import islice
+
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill
+from openpyxl.utils import get_column_letter
+from sqlalchemy import select
+
+from app import db
+from app.models import PersonnelEmployee
+from app.services.excel_builder import MAX_EN_MEMORIA
+
+TAMANO_BLOQUE = 1000
+
+ErrorFila = namedtuple('ErrorFila', 'fila valores motivo')
+
+
+class CargaInterrumpida(Exception):
+    """Falló un lote; las `procesadas` filas de los lotes anteriores ya se confirmaron."""
+
+    def __init__(self, procesadas, causa):
+        super().__init__(f'{causa} (las {procesadas} filas de lotes anteriores ya quedaron guardadas)')
+        self.procesadas = procesadas
+
+
+def por_lotes(filas, filas_por_lote, procesar_lote, progreso=None):
+    """
+    Llama a `procesar_lote(lote)` por cada lote de `filas` y confirma cada uno
+    con commit; después llama a `progreso(filas procesadas)`. Si un lote falla,
+    se deshace solo ese lote y se lanza CargaInterrumpida.
+    """
+    procesadas = 0
+    filas = iter(filas)
+    while lote := list(islice(filas, filas_por_lote)):
+        try:
+            procesar_lote(lote)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            raise CargaInterrumpida(procesadas, e) from e
+        procesadas += len(lote)
+        if progreso:
+            progreso(procesadas)
+    return procesadas
+
+
+def pasaportes_existentes(pasaportes):
+    """Subconjunto de `pasaportes` que corresponde a empleados registrados."""
+    existentes = set()
+    pasaportes = list(pasaportes)
+    for i in range(0, len(pasaportes), TAMANO_BLOQUE):
+        existentes.update(db.session.scalars(
+            select(PersonnelEmployee.passport).where(PersonnelEmployee.passport.in_(pasaportes[i:i + TAMANO_BLOQUE]))))
+    return existentes
+
+
+def crear_informe_errores(errores, columnas):
+    """Excel con una fila por error: número de fila, los valores leídos (en el orden de `columnas`) y el motivo."""
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet(title="Errores de Carga")
+    for col, ancho in enumerate([8, *[20] * len(columnas), 60], 1):
+        sheet.column_dimensions[get_column_letter(col)].width = ancho
+
+    encabezado = []
+    for h in ['Fila', *columnas, 'Error']:
+        celda = WriteOnlyCell(sheet, value=h)
+        celda.font = Font(bold=True)
+        celda.fill = PatternFill("solid", fgColor="DDEBF7")
+        encabezado.append(celda)
+    sheet.append(encabezado)
+    for error in errores:
+        sheet.append([error.fila, *error.valores, error.motivo])
+
+    archivo = tempfile.SpooledTemporaryFile(max_size=MAX_EN_MEMORIA)
+    workbook.save(archivo)
+    archivo.seek(0)
+    return archivo
@@ -0,0 +1,147 @@
+"""
+Carga masiva de justificaciones (Excel o CSV).
+
+El archivo se procesa por lotes, con un commit por lote
+(carga_comun.por_lotes). En lugar de consultar la base por cada fila:
+
+1. Se validan todas las filas del lote.
+2. Los pasaportes se verifican con una sola consulta, y las justificaciones
+   vigentes de esos empleados en el rango de fechas del lote se cargan
+   con otra (en un IndiceIntervalos, para los cruces con la base y con
+   los lotes anteriores, que ya están guardados).
+3. Los cruces entre filas del mismo lote se detectan recorriendo las filas
+   en el orden del archivo (como en la carga original, gana la que aparece
+   primero): cada una se busca con bisect entre las ya aceptadas de su
+   empleado, que no se cruzan entre sí.
+4. Las filas válidas se insertan en bloque y se publican con
+   cambios.publicar_cambios (el INSERT masivo no pasa por el flush).
+
+Cada fila rechazada queda con su motivo, para el informe de errores
+(carga_comun.crear_informe_errores).
+"""
+from bisect import bisect_right
+from collections import defaultdict, namedtuple
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from app import db
+from app.models import Justificaciones
+from app.services.cambios import publicar_cambios
+from app.services.carga_comun import ErrorFila, TAMANO_BLOQUE, pasaportes_existentes, por_lotes
+from app.services.intervalos import indice_justificaciones
+
+COLUMNAS = ["Pasaporte", "Tipo_Justificacion", "Fecha_Inicio", "Fecha_Fin", "Razon"]
+
+FilaJustificacion = namedtuple('FilaJustificacion', 'fila passport tipo inicio fin razon')
+
+
+def _fecha(valor):
+    return valor.date() if isinstance(valor, datetime) else datetime.strptime(
+        str(valor).split(" ")[0], '%Y-%m-%d').date()
+
+
+def _valores(f):
+    """Valores de la fila en el orden de COLUMNAS, para el informe de errores."""
+    return f.passport, f.tipo, f.inicio, f.fin, f.razon
+
+
+def _validar_filas(filas, errores):
+    """Filas completas y con fechas válidas; las demás van a `errores`."""
+    validas = []
+    for row_idx, valores in filas:
+        passport, jtype, dstart, dend, reason = valores
+        if not all([passport, jtype, dstart, dend]):
+            errores.append(ErrorFila(row_idx, valores, 'Datos incompletos: pasaporte, tipo y fechas son obligatorios.'))
+            continue
+        try:
+            inicio, fin = _fecha(dstart), _fecha(dend)
+        except (ValueError, TypeError) as e:
+            errores.append(ErrorFila(row_idx, valores, f'Formato de fecha inválido - {e}'))
+            continue
+        if fin < inicio:
+            errores.append(ErrorFila(row_idx, valores, 'La fecha de fin es anterior a la de inicio.'))
+            continue
+        validas.append(FilaJustificacion(row_idx, str(passport), str(jtype), inicio, fin, str(reason or '')))
+    return validas
+
+
+def _barrido(filas, errores):
+    """
+    Filas que no se cruzan con una anterior del archivo, en el mismo orden.
+    Las aceptadas de cada empleado se guardan ordenadas por inicio; como no
+    se cruzan entre sí, también quedan ordenadas por fin, y la única que
+    puede cruzarse con una fila nueva es la última que empieza antes de su fin.
+    """
+    inicios, previas = defaultdict(list), defaultdict(list)
+    aceptadas = []
+    for f in filas:
+        i = bisect_right(inicios[f.passport], f.fin)
+        if i and previas[f.passport][i - 1].fin >= f.inicio:
+            errores.append(ErrorFila(f.fila, _valores(f),
+                                     f'Se cruza con la fila {previas[f.passport][i - 1].fila} del archivo.'))
+            continue
+        inicios[f.passport].insert(i, f.inicio)
+        previas[f.passport].insert(i, f)
+        aceptadas.append(f)
+    return aceptadas
+
+
+def _procesar_lote(lote, errores):
+    """Valida el lote, inserta sus filas válidas y devuelve cuántas fueron."""
+    filas = _validar_filas(lote, errores)
+
+    existentes = pasaportes_existentes({f.passport for f in filas})
+    candidatas = []
+    for f in filas:
+        if f.passport not in existentes:
+            errores.append(ErrorFila(f.fila, _valores(f), f"Pasaporte '{f.passport}' no encontrado."))
+        else:
+            candidatas.append(f)
+
+    # Cruces con la base: una consulta para todos los empleados, acotada al rango del lote. Incluye
+    # las filas de lotes anteriores, que ya están confirmadas.
+    if candidatas:
+        vigentes = Justificaciones.query.filter(
+            Justificaciones.employee_passport.in_({f.passport for f in candidatas}),
+            Justificaciones.anulada == False,
+            Justificaciones.date_start <= max(f.fin for f in candidatas),
+            Justificaciones.date_end >= min(f.inicio for f in candidatas)
+        ).all()
+        indice = indice_justificaciones(vigentes)
+        sin_cruce = []
+        for f in candidatas:
+            conflicto = indice.cruce(f.passport, f.inicio, f.fin)
+            if conflicto:
+                errores.append(ErrorFila(
+                    f.fila, _valores(f),
+                    f'Se cruza con una justificación existente (del {conflicto.date_start.strftime("%d-%m-%Y")} '
+                    f'al {conflicto.date_end.strftime("%d-%m-%Y")}).'))
+            else:
+                sin_cruce.append(f)
+        candidatas = sin_cruce
+
+    validas = _barrido(candidatas, errores)
+    registros = [{'employee_passport': f.passport, 'justification_type': f.tipo, 'date_start': f.inicio,
+                  'date_end': f.fin, 'reason': f.razon} for f in validas]
+    for i in range(0, len(registros), TAMANO_BLOQUE):
+        db.session.execute(insert(Justificaciones), registros[i:i + TAMANO_BLOQUE])
+    publicar_cambios(db.session, Justificaciones, registros)
+    return len(validas)
+
+
+def cargar_justificaciones(filas, filas_por_lote, progreso=None):
+    """
+    Valida e inserta las justificaciones de `filas` ((número, valores) de
+    ingesta.ArchivoCarga.filas), con un commit por lote (carga_comun.por_lotes).
+    Devuelve (creadas, errores), con los errores ordenados por fila.
+    """
+    errores = []
+    creadas = 0
+
+    def procesar_lote(lote):
+        nonlocal creadas
+        creadas += _procesar_lote(lote, errores)
+
+    por_lotes(filas, filas_por_lote, procesar_lote, progreso)
+    return creadas, sorted(errores, key=lambda e: e.fila)
@@ -0,0 +1,126 @@
+"""
+Carga masiva de permisos (Excel o CSV), pensada para archivos grandes (un
+trimestre completo del call center).
+
+El archivo se procesa por lotes de CARGA_FILAS_POR_LOTE filas, y cada lote
+se confirma con su propio commit (carga_comun.por_lotes): la memoria no
+depende del tamaño del archivo y ningún lock se mantiene durante toda la
+carga. Por lote:
+
+1. Las columnas se convierten con pandas de una vez (fechas y horas con
+   `to_datetime`, sea texto del CSV o celdas del Excel); las celdas que no
+   convierten quedan como error de su fila.
+2. Los pasaportes del lote se verifican con una sola consulta.
+3. Las filas válidas se escriben con COPY FROM STDIN en PostgreSQL, o con
+   un INSERT en bloque (executemany) en otros motores, y se publican con
+   cambios.publicar_cambios (ninguna de las dos vías pasa por el flush).
+"""
+import csv
+import io
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import insert
+
+from app import db
+from app.models import Permisos
+from app.services.cambios import publicar_cambios
+from app.services.carga_comun import ErrorFila, pasaportes_existentes, por_lotes
+
+COLUMNAS = ["Pasaporte", "Fecha", "Hora_Desde", "Hora_Hasta", "Motivo", "Observacion"]
+OBLIGATORIAS = ["Pasaporte", "Fecha", "Hora_Desde", "Hora_Hasta", "Motivo"]
+LARGO_MOTIVO = Permisos.__table__.c.motivo.type.length
+COLUMNAS_COPY = ('employee_passport', 'fecha', 'hora_desde', 'hora_hasta', 'motivo', 'observacion', 'created_at')
+
+
+# --- CONVERSIÓN POR COLUMNAS ---
+
+def _convertir_lote(filas, errores):
+    """
+    DataFrame con las filas válidas del lote (passport, fecha, hora_desde,
+    hora_hasta, motivo, observacion, fila) ya convertidas; las demás van a `errores`.
+    """
+    df = pd.DataFrame([valores for _, valores in filas], columns=COLUMNAS, dtype=object)
+    df['fila'] = [fila for fila, _ in filas]
+
+    completas = df[OBLIGATORIAS].map(bool).all(axis=1)
+    # Mismas reglas que la carga fila por fila: la fecha admite fecha y hora (se toma la parte de fecha);
+    # las horas van como HH:MM:SS.
+    fecha = pd.to_datetime(df['Fecha'].astype(str).str.replace(r' .*', '', regex=True), format='%Y-%m-%d',
+                           errors='coerce')
+    hora_desde = pd.to_datetime(df['Hora_Desde'].astype(str), format='%H:%M:%S', errors='coerce')
+    hora_hasta = pd.to_datetime(df['Hora_Hasta'].astype(str), format='%H:%M:%S', errors='coerce')
+    motivo = df['Motivo'].astype(str)
+
+    motivos = pd.Series(None, index=df.index, dtype=object)
+    motivos[motivo.str.len() > LARGO_MOTIVO] = f'El motivo supera los {LARGO_MOTIVO} caracteres.'
+    motivos[hora_desde.isna() | hora_hasta.isna()] = 'Formato de hora inválido (se espera HH:MM:SS).'
+    motivos[fecha.isna()] = 'Formato de fecha inválido (se espera AAAA-MM-DD).'
+    motivos[~completas] = 'Datos incompletos: pasaporte, fecha, horas y motivo son obligatorios.'
+
+    for i in motivos[motivos.notna()].index:
+        errores.append(ErrorFila(int(df.at[i, 'fila']), tuple(df.loc[i, COLUMNAS]), motivos[i]))
+
+    validas = motivos.isna()
+    return pd.DataFrame({
+        'fila': df['fila'][validas],
+        'employee_passport': df['Pasaporte'][validas].astype(str),
+        'fecha': fecha[validas].dt.date,
+        'hora_desde': hora_desde[validas].dt.time,
+        'hora_hasta': hora_hasta[validas].dt.time,
+        'motivo': motivo[validas],
+        'observacion': df['Observacion'][validas].map(lambda v: str(v or '')),
+    })
+
+
+# --- ESCRITURA ---
+
+def _copiar(registros):
+    """COPY FROM STDIN (CSV) por la conexión de la sesión, dentro de su transacción."""
+    buffer = io.StringIO()
+    # Todo entre comillas: en CSV de COPY un campo vacío sin comillas es NULL, y la observación vacía es ''.
+    csv.writer(buffer, quoting=csv.QUOTE_ALL, lineterminator='\n').writerows(
+        [r[c] for c in COLUMNAS_COPY] for r in registros)
+    buffer.seek(0)
+    cursor = db.session.connection().connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY permisos ({', '.join(COLUMNAS_COPY)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+
+def _escribir(df):
+    if df.empty:
+        return
+    creado = datetime.utcnow()
+    registros = [dict(r, created_at=creado) for r in df.drop(columns='fila').to_dict('records')]
+    if db.session.get_bind().dialect.name == 'postgresql':
+        _copiar(registros)
+    else:
+        db.session.execute(insert(Permisos), registros)
+    publicar_cambios(db.session, Permisos, registros)
+
+
+def cargar_permisos(filas, filas_por_lote, progreso=None):
+    """
+    Valida e inserta los permisos de `filas` ((número, valores) de
+    ingesta.ArchivoCarga.filas), con un commit por lote (carga_comun.por_lotes).
+    Devuelve (creados, errores), con los errores ordenados por fila.
+    """
+    errores = []
+    creados = 0
+
+    def procesar_lote(lote):
+        nonlocal creados
+        df = _convertir_lote(lote, errores)
+        existentes = pasaportes_existentes(set(df['employee_passport']))
+        encontrado = df['employee_passport'].isin(existentes)
+        for r in df[~encontrado].itertuples():
+            errores.append(ErrorFila(r.fila, (r.employee_passport, r.fecha, r.hora_desde, r.hora_hasta,
+                                              r.motivo, r.observacion),
+                                     f"Pasaporte '{r.employee_passport}' no encontrado."))
+        _escribir(df[encontrado])
+        creados += int(encontrado.sum())
+
+    por_lotes(filas, filas_por_lote, procesar_lote, progreso)
+    return creados, sorted(errores, key=lambda e: e.fila)
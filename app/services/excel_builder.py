@@ -1,319 +1,478 @@
-# --- IMPORTS NECESARIOS PARA AMBAS FUNCIONES ---
-from collections import defaultdict
-from datetime import timedelta, datetime, time
-from io import BytesIO
+# --- IMPORTS ---
+# El cálculo del reporte vive solo en report_builder (build_report / iter_report);
+# este módulo únicamente da formato a lo que esos generan.
+import pickle
+import tempfile
+import warnings
+from copy import copy
+from datetime import time
 
 import openpyxl
+from flask import current_app, has_app_context
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.formatting.rule import CellIsRule
 from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+from openpyxl.styles.differential import DifferentialStyle
+from openpyxl.styles.numbers import FORMAT_DATE_TIME6
+from openpyxl.styles.table import TableStyle, TableStyleElement
 from openpyxl.utils import get_column_letter
-from sqlalchemy import text
+from openpyxl.worksheet.table import Table, TableColumn, TableStyleInfo
+
+from app.services.registro_dia import hhmm, minutos_hhmm
+
+# --- CONFIGURACIÓN DE ESTILOS Y COLORES ---
+COLORS = {
+    'primary_dark': '44546A', 'primary_light': 'DDEBF7', 'accent_green': 'C6E0B4',
+    'accent_yellow': 'FFF2CC', 'accent_red': 'F8CBAD', 'accent_blue': 'B4C6E7',
+    'font_light': 'FFFFFF', 'font_dark': '000000', 'border_grey': 'BFBFBF',
+    'alt_row_fill': 'F2F2F2'
+}
+STYLES = {
+    'title': Font(name='Calibri', size=16, bold=True, color=COLORS['primary_dark']),
+    'subtitle': Font(name='Calibri', size=11, bold=True, color=COLORS['primary_dark']),
+    'header': Font(name='Calibri', size=11, bold=True, color=COLORS['font_light']),
+    'header_fill_resumen': PatternFill(start_color=COLORS['primary_dark'], fill_type="solid"),
+    'header_fill_trabajo': PatternFill(start_color=COLORS['primary_light'], fill_type="solid"),
+    'header_font_dark': Font(name='Calibri', size=11, bold=True, color=COLORS['font_dark']),
+    'alt_row_fill': PatternFill(start_color=COLORS['alt_row_fill'], fill_type="solid"),
+    'center_align': Alignment(horizontal='center', vertical='center'),
+    'highlight_falta': PatternFill(start_color=COLORS['accent_red'], fill_type="solid"),
+    'highlight_atraso': PatternFill(start_color=COLORS['accent_yellow'], fill_type="solid"),
+    'highlight_justificado': PatternFill(start_color=COLORS['accent_blue'], fill_type="solid"),
+}
+THIN_BORDER = Border(left=Side(style='thin', color=COLORS['border_grey']),
+                     right=Side(style='thin', color=COLORS['border_grey']),
+                     top=Side(style='thin', color=COLORS['border_grey']),
+                     bottom=Side(style='thin', color=COLORS['border_grey']))
+
+DIAS_SEMANA = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"]
+HEADERS_EMPLEADO = ["Cédula", "Empleado", "Departamento"]
+HEADERS_TRABAJO = HEADERS_EMPLEADO + [
+    "Fecha", "Día", "Estado",
+    "Tiene Atraso", "Entrada Programada", "Entrada Real", "Minutos Atraso",
+    "H. Salida Alm.", "H. Reg. Alm.", "H. Salida Final", "T. Almuerzo", "T. Trabajado"
+]
+HEADERS_RESUMEN = HEADERS_EMPLEADO + [
+    "Asistencias", "Atrasos", "Min. Atraso", "Atrasos Sáb/Fer", "Min. Atraso Sáb/Fer",
+    "Faltas", "Faltas Sáb/Fer", "Faltas Justificadas", "H. Extras", "H. Extras Sáb/Fer",
+    "Valor H. Extras", "Multa Atrasos", "Multa Faltas", "Neto"
+]
+HEADERS_FALTAS = HEADERS_EMPLEADO + ["Fecha", "Día", "Tipo de Día"]
+HEADERS_ATRASOS = HEADERS_FALTAS + ["Entrada Programada", "Entrada Real", "Minutos Atraso"]
+HEADERS_EXTRAS = HEADERS_FALTAS + ["Salida Programada", "H. Salida Final", "T. Trabajado", "H. Extras"]
+COLUMNA_ESTADO = HEADERS_TRABAJO.index("Estado")
+ESTADOS_RESALTADOS = {'Falta': 'highlight_falta', 'Atraso': 'highlight_atraso',
+                      'Justificado': 'highlight_justificado'}
+SIN_HORARIO = ('Falta', 'Feriado', 'Justificado', 'Fin de Semana')
+FILA_HEADER = 4
+ESTILO_TABLA = 'EstiloMatrizTrabajo'
+
+# Matriz de Asistencia: un código por día (los estados sin código van como '-').
+CODIGOS_ASISTENCIA = {'Presente': 'P', 'Atraso': 'A', 'Falta': 'FI', 'Justificado': 'FJ',
+                      'Permiso': 'PE', 'Feriado': 'FE'}
+CODIGOS_RESALTADOS = {'FI': 'highlight_falta', 'A': 'highlight_atraso'}
+LEYENDA_ASISTENCIA = ('P: Presente · A: Atraso · FI: Falta injustificada · FJ: Falta justificada · '
+                      'PE: Permiso · FE: Feriado')
+
+# Hojas que se pueden generar, en el orden del libro ('detalles' son Faltas, Atrasos y Extras).
+HOJAS = ('resumen', 'trabajo', 'asistencia', 'detalles')
+FORMATO_MONEDA = '#,##0.00'
+
+# El archivo generado queda en memoria hasta este tamaño; por encima pasa a un temporal en disco.
+MAX_EN_MEMORIA = 16 * 1024 * 1024
 
-# --- IMPORTACIONES DE LA APLICACIÓN (EJEMPLO) ---
-# Asegúrate de que estas importaciones coincidan con la estructura de tu proyecto.
-from app import db
-from app.models import (PersonnelEmployee, PersonnelDepartment, Justificaciones,
-                        IClockTransaction, Permisos, GrupoHorariosEspeciales, DepartmentHorariosEspeciales,
-                        Grupos, GrupoEmpleados)
+
+# ==============================================================================
+# --- FILAS DE CADA HOJA ---
+# ==============================================================================
+def _datos_empleado(empleado):
+    return [empleado.passport, f"{empleado.last_name} {empleado.first_name}", empleado.department.dept_name]
+
+
+def filas_matriz_trabajo(item):
+    """Valores (sin estilo) de las filas de un empleado en la hoja "Matriz de Trabajo"."""
+    datos_empleado = _datos_empleado(item['empleado'])
+    filas = []
+    for reg in item['registros']:
+        estado = reg.estado
+        fila = datos_empleado + [
+            reg.fecha.strftime('%Y-%m-%d'), DIAS_SEMANA[reg.fecha.weekday()], estado,
+            'Sí' if reg.es_atraso == 1 else 'No',
+            minutos_hhmm(reg.entrada_prog) if estado not in SIN_HORARIO else '',
+            reg.hora_ingreso,
+            reg.minutos_atraso if reg.es_atraso == 1 else ''
+        ]
+        if estado not in SIN_HORARIO:
+            fila.extend([reg.hora_salida_almuerzo, reg.hora_regreso_almuerzo, reg.hora_salida_final,
+                         hhmm(reg.segundos_almuerzo), hhmm(reg.segundos_trabajados)])
+        else:
+            fila.extend(['-'] * 5)
+        filas.append(fila)
+    return filas
+
+
+def _fila_resumen(item, params):
+    """
+    Totales del empleado y su valorización con los costos/multas de `params`:
+    horas extras por su costo por hora, y cada atraso y cada falta
+    injustificada por su multa (normal o sábado/feriado).
+    """
+    r = item['resumen']
+    costo = lambda clave: float(params.get(clave) or 0)
+    horas_normal = r['total_horas_extras_normal'].total_seconds() / 3600
+    horas_sabfer = r['total_horas_extras_sabfer'].total_seconds() / 3600
+    valor_extras = horas_normal * costo('costo_hora_normal') + horas_sabfer * costo('costo_hora_sabfer')
+    multa_atrasos = (r['total_atrasos_normal'] * costo('multa_atraso_normal') +
+                     r['total_atrasos_sabfer'] * costo('multa_atraso_sabfer'))
+    multa_faltas = (r['total_faltas_injustificadas_normal'] * costo('multa_falta_normal') +
+                    r['total_faltas_injustificadas_sabfer'] * costo('multa_falta_sabfer'))
+    return _datos_empleado(item['empleado']) + [
+        r['total_asistencias'],
+        r['total_atrasos_normal'], r['total_minutos_atraso_normal'],
+        r['total_atrasos_sabfer'], r['total_minutos_atraso_sabfer'],
+        r['total_faltas_injustificadas_normal'], r['total_faltas_injustificadas_sabfer'],
+        r['total_faltas_justificadas'],
+        round(horas_normal, 2), round(horas_sabfer, 2),
+        round(valor_extras, 2), round(multa_atrasos, 2), round(multa_faltas, 2),
+        round(valor_extras - multa_atrasos - multa_faltas, 2)
+    ]
+
+
+def _filas_asistencia_y_detalle(item):
+    """
+    Recorre los registros una vez: códigos por fecha para la Matriz de
+    Asistencia y filas de los detalles de faltas, atrasos y horas extras.
+    """
+    datos_empleado = _datos_empleado(item['empleado'])
+    codigos, faltas, atrasos, extras = {}, [], [], []
+    for reg in item['registros']:
+        codigos[reg.fecha] = CODIGOS_ASISTENCIA.get(reg.estado, '-')
+        if reg.es_falta != 1 and reg.es_atraso != 1 and not reg.segundos_extras:
+            continue
+        dia = datos_empleado + [reg.fecha.strftime('%Y-%m-%d'), DIAS_SEMANA[reg.fecha.weekday()],
+                                reg.tipo_dia_laborable]
+        if reg.es_falta == 1:
+            faltas.append(dia)
+        if reg.es_atraso == 1:
+            atrasos.append(dia + [minutos_hhmm(reg.entrada_prog), reg.hora_ingreso, reg.minutos_atraso])
+        if reg.segundos_extras:
+            extras.append(dia + [minutos_hhmm(reg.salida_prog), reg.hora_salida_final,
+                                 hhmm(reg.segundos_trabajados), hhmm(reg.segundos_extras)])
+    return codigos, faltas, atrasos, extras
+
+
+class _Anchos:
+    """Ancho de cada columna según el texto más largo (las celdas en negrita suman 4)."""
+
+    def __init__(self, minimo=12):
+        self.minimo = minimo
+        self.maximos = {}
+
+    def medir(self, fila, negrita=False):
+        padding = 4 if negrita else 0
+        for col, valor in enumerate(fila, 1):
+            if valor:
+                largo = len(str(valor)) + padding
+                if largo > self.maximos.get(col, 0):
+                    self.maximos[col] = largo
+
+    def aplicar(self, sheet):
+        for col, largo in self.maximos.items():
+            sheet.column_dimensions[get_column_letter(col)].width = max(self.minimo, min(largo + 2, 50))
+
+
+# ==============================================================================
+# --- ESTILOS COMPARTIDOS ---
+# ==============================================================================
+def _estilo(sheet, **atributos):
+    """StyleArray registrado en el libro con los atributos dados (se copia a cada celda)."""
+    celda = WriteOnlyCell(sheet)
+    for nombre, valor in atributos.items():
+        setattr(celda, nombre, valor)
+    return celda._style
+
+
+def _celda(sheet, valor, estilo):
+    celda = WriteOnlyCell(sheet, value=valor)
+    celda._style = copy(estilo)
+    return celda
+
+
+class _EstilosFilas:
+    """Estilos de las filas de datos: borde, cebra y resaltado de valores en algunas columnas."""
+
+    def __init__(self, sheet, resaltados):
+        def par(**atributos):
+            # (valores generales, horas): las horas llevan el formato h:mm:ss que openpyxl les da por defecto.
+            return (_estilo(sheet, **atributos), _estilo(sheet, number_format=FORMAT_DATE_TIME6, **atributos))
+        self.normal = par(border=THIN_BORDER)
+        self.alterna = par(border=THIN_BORDER, fill=STYLES['alt_row_fill'])
+        self.resaltados = {valor: par(border=THIN_BORDER, fill=STYLES[clave])[0]
+                           for valor, clave in resaltados.items()}
+
+    def fila(self, sheet, valores, alterna, columnas_resaltadas):
+        generales, horas = self.alterna if alterna else self.normal
+        celdas = [_celda(sheet, v, horas if isinstance(v, time) else generales) for v in valores]
+        for col in columnas_resaltadas:
+            estilo = self.resaltados.get(valores[col])
+            if estilo is not None:
+                celdas[col]._style = copy(estilo)
+        return celdas
 
 
 # ==============================================================================
-# --- FUNCIÓN 1: MOTOR DE CÁLCULO DEL REPORTE (SIN CAMBIOS) ---
+# --- ESTILO DE TABLA Y FORMATO CONDICIONAL ---
 # ==============================================================================
+def _relleno_dxf(color):
+    # En los formatos diferenciales Excel pinta el relleno sólido con bgColor, así que se ponen ambos.
+    return PatternFill(start_color=color, end_color=color, fill_type='solid')
+
 
-def build_report(start_date, end_date, department_id=None):
+def _registrar_estilo_tabla(workbook):
     """
-    Construye el reporte de asistencia con todos los cálculos detallados.
+    Estilo de tabla propio con el mismo aspecto que los estilos por celda:
+    bordes finos grises (también los interiores) y cebra empezando por la
+    primera fila de datos.
     """
-    departamentos_permitidos = ['Callcenter', 'Guayaquil', 'Administracion']
-    query_empleados = PersonnelEmployee.query.join(PersonnelDepartment).filter(
-        PersonnelDepartment.dept_name.in_(departamentos_permitidos)
-    )
-    if department_id and department_id.isdigit():
-        query_empleados = query_empleados.filter(PersonnelDepartment.id == int(department_id))
-    empleados_a_reportar = query_empleados.order_by(PersonnelEmployee.last_name).all()
-    if not empleados_a_reportar: return []
-
-    pasaportes = [e.passport for e in empleados_a_reportar]
-    ids_empleados = [e.id for e in empleados_a_reportar]
-
-    sql = text("""
-        SELECT p.passport, (t.punch_time AT TIME ZONE 'America/Guayaquil')::date AS fecha_local,
-               (t.punch_time AT TIME ZONE 'America/Guayaquil')::time AS hora_local
-        FROM iclock_transaction t JOIN personnel_employee p ON t.emp_id = p.id
-        WHERE t.emp_id = ANY(:ids_empleados) AND t.punch_time >= :start_date AND t.punch_time < :end_date_plus_one
-    """)
-    marcaciones_q = db.session.execute(sql, {"ids_empleados": ids_empleados, "start_date": start_date,
-                                             "end_date_plus_one": end_date + timedelta(days=1)}).fetchall()
-
-    justificaciones_q = Justificaciones.query.filter(Justificaciones.employee_passport.in_(pasaportes),
-                                                     Justificaciones.anulada == False,
-                                                     Justificaciones.date_start <= end_date,
-                                                     Justificaciones.date_end >= start_date).all()
-    permisos_q = Permisos.query.filter(Permisos.employee_passport.in_(pasaportes),
-                                       Permisos.fecha.between(start_date, end_date)).all()
-    grupo_horarios_q = GrupoHorariosEspeciales.query.filter(
-        GrupoHorariosEspeciales.fecha.between(start_date, end_date)).all()
-    depto_horarios_q = DepartmentHorariosEspeciales.query.filter(
-        DepartmentHorariosEspeciales.fecha.between(start_date, end_date)).all()
-
-    empleado_grupo_map = {ge.employee_passport: ge.grupo_id for ge, g in
-                          db.session.query(GrupoEmpleados, Grupos).join(Grupos).all()}
-    marcaciones_map = defaultdict(lambda: defaultdict(list))
-    for m in marcaciones_q: marcaciones_map[m.passport][m.fecha_local.strftime('%Y-%m-%d')].append(m.hora_local)
-    justificaciones_map = defaultdict(list)
-    for j in justificaciones_q:
-        d = j.date_start
-        while d <= j.date_end: justificaciones_map[j.employee_passport].append(d); d += timedelta(days=1)
-    permisos_map = defaultdict(dict)
-    for p in permisos_q: permisos_map[p.employee_passport][p.fecha] = p
-
-    horarios_especiales_map = defaultdict(dict)
-    for dh in depto_horarios_q:
-        horarios_especiales_map[('depto', dh.dept_name, dh.fecha)] = {'extras': dh.horas_extras, 'feriado': dh.feriado,
-                                                                      'entrada': dh.hora_entrada_especial,
-                                                                      'salida': dh.hora_salida_especial}
-    for gh in grupo_horarios_q:
-        horarios_especiales_map[('grupo', gh.grupo_id, gh.fecha)] = {'extras': gh.horas_extras, 'feriado': gh.feriado,
-                                                                     'entrada': gh.hora_entrada_especial,
-                                                                     'salida': gh.hora_salida_especial}
-
-    reporte_final = []
-    dias_del_periodo = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1) if
-                        (start_date + timedelta(days=i)).weekday() != 6]
-
-    for empleado in empleados_a_reportar:
-        resumen = {
-            'total_asistencias': 0,
-            'total_atrasos_normal': 0, 'total_atrasos_sabfer': 0,
-            'total_minutos_atraso_normal': 0, 'total_minutos_atraso_sabfer': 0,
-            'total_faltas_normal': 0, 'total_faltas_sabfer': 0,
-            'total_faltas_injustificadas_normal': 0, 'total_faltas_injustificadas_sabfer': 0,
-            'total_faltas_justificadas': 0,
-            'total_horas_extras_normal': timedelta(), 'total_horas_extras_sabfer': timedelta()
-        }
-
-        registros_diarios_emp = []
-        for dia in dias_del_periodo:
-            grupo_id = empleado_grupo_map.get(empleado.passport)
-            regla_depto = horarios_especiales_map.get(('depto', empleado.department.dept_name, dia), {})
-            regla_grupo = horarios_especiales_map.get(('grupo', grupo_id, dia), {})
-            horas_extras_aprobadas_int = max(regla_depto.get('extras', 0), regla_grupo.get('extras', 0))
-            es_feriado = regla_depto.get('feriado', False) or regla_grupo.get('feriado', False)
-            horario_entrada_prog = regla_grupo.get('entrada') or regla_depto.get('entrada') or time(8, 0, 0)
-            horario_salida_prog = regla_grupo.get('salida') or regla_depto.get('salida') or time(18, 0, 0)
-            permiso_del_dia = permisos_map[empleado.passport].get(dia)
-            if permiso_del_dia:
-                if permiso_del_dia.hora_desde <= horario_entrada_prog: horario_entrada_prog = permiso_del_dia.hora_hasta
-                if permiso_del_dia.hora_hasta >= horario_salida_prog: horario_salida_prog = permiso_del_dia.hora_desde
-            hora_limite_entrada = (datetime.combine(dia, horario_entrada_prog) + timedelta(minutes=5)).time()
-
-            registro = {
-                'fecha': dia, 'estado': '-',
-                'horario_prog': f"{horario_entrada_prog.strftime('%H:%M')} - {horario_salida_prog.strftime('%H:%M')}",
-                'marcaciones': '-', 'minutos_atraso': 0, 'tiempo_trabajado': '00:00',
-                'horas_extras_trabajadas': '00:00', 'es_falta': 0, 'es_atraso': 0,
-                'hora_ingreso': None, 'hora_salida_almuerzo': None,
-                'hora_regreso_almuerzo': None, 'hora_salida_final': None,
-                'tiempo_almuerzo': '00:00'
-            }
-
-            if es_feriado and not horas_extras_aprobadas_int > 0:
-                registro['estado'] = 'Feriado'
-            elif dia in justificaciones_map[empleado.passport]:
-                registro['estado'] = 'Justificado'
-                resumen['total_faltas_justificadas'] += 1
-            elif sorted(marcaciones_map[empleado.passport][dia.strftime('%Y-%m-%d')]):
-                resumen['total_asistencias'] += 1
-                marcaciones_dia = sorted(marcaciones_map[empleado.passport][dia.strftime('%Y-%m-%d')])
-                if len(marcaciones_dia) >= 1: registro['hora_ingreso'] = marcaciones_dia[0]
-                if len(marcaciones_dia) >= 2: registro['hora_salida_final'] = marcaciones_dia[-1]
-                if len(marcaciones_dia) == 4:
-                    registro['hora_salida_almuerzo'] = marcaciones_dia[1]
-                    registro['hora_regreso_almuerzo'] = marcaciones_dia[2]
-                    almuerzo_delta = datetime.combine(dia, marcaciones_dia[2]) - datetime.combine(dia, marcaciones_dia[1])
-                    h_a, rem_a = divmod(int(almuerzo_delta.total_seconds()), 3600)
-                    m_a, _ = divmod(rem_a, 60)
-                    registro['tiempo_almuerzo'] = f'{h_a:02d}:{m_a:02d}'
-
-                entrada_real = registro['hora_ingreso']
-                if entrada_real > hora_limite_entrada:
-                    atraso_delta = datetime.combine(dia, entrada_real) - datetime.combine(dia, hora_limite_entrada)
-                    registro['minutos_atraso'] = int(atraso_delta.total_seconds() // 60)
-                    registro['estado'] = 'Atraso'
-                    registro['es_atraso'] = 1
-                    resumen['total_atrasos_normal'] += 1
-                    resumen['total_minutos_atraso_normal'] += registro['minutos_atraso']
-                else:
-                    registro['estado'] = 'Presente'
-
-                if len(marcaciones_dia) >= 2:
-                    salida_real = registro['hora_salida_final']
-                    lunch_duration = timedelta()
-                    if registro['hora_salida_almuerzo'] and registro['hora_regreso_almuerzo']:
-                        lunch_duration = datetime.combine(dia, registro['hora_regreso_almuerzo']) - datetime.combine(dia, registro['hora_salida_almuerzo'])
-                    duracion_neta = (datetime.combine(dia, salida_real) - datetime.combine(dia, entrada_real)) - lunch_duration
-                    if duracion_neta.total_seconds() < 0: duracion_neta = timedelta(seconds=0)
-                    h, rem = divmod(int(duracion_neta.total_seconds()), 3600)
-                    m, _ = divmod(rem, 60)
-                    registro['tiempo_trabajado'] = f'{h:02d}:{m:02d}'
-            else:
-                es_laborable = (dia.weekday() < 5 and not es_feriado) or (es_feriado and horas_extras_aprobadas_int > 0)
-                if es_laborable:
-                    registro['estado'] = 'Falta'
-                    registro['es_falta'] = 1
-                    resumen['total_faltas_normal'] += 1
-                    resumen['total_faltas_injustificadas_normal'] += 1
-                else:
-                    registro['estado'] = 'Fin de Semana'
-            registros_diarios_emp.append(registro)
-        reporte_final.append({'empleado': empleado, 'registros': registros_diarios_emp, 'resumen': resumen})
+    lado = Side(style='thin', color=COLORS['border_grey'])
+    bordes = workbook._differential_styles.add(DifferentialStyle(
+        border=Border(left=lado, right=lado, top=lado, bottom=lado, vertical=lado, horizontal=lado)))
+    cebra = workbook._differential_styles.add(DifferentialStyle(fill=_relleno_dxf(COLORS['alt_row_fill'])))
+    workbook._table_styles.tableStyle.append(TableStyle(name=ESTILO_TABLA, pivot=False, tableStyleElement=[
+        TableStyleElement(type='wholeTable', dxfId=bordes),
+        TableStyleElement(type='firstRowStripe', dxfId=cebra),
+    ]))
 
-    return reporte_final
 
 # ==============================================================================
-# --- FUNCIÓN 2: GENERADOR DE REPORTE EXCEL (MODIFICADO) ---
+# --- HOJAS DE DATOS ---
 # ==============================================================================
-def crear_excel_reporte(report_data, params):
+class _Hoja:
     """
-    Construye un libro de Excel elegante y profesional.
-    Esta versión solo genera la hoja "Matriz de Trabajo".
+    Una hoja del libro: título, subtítulo, una fila libre (o nota) y los
+    encabezados en la fila FILA_HEADER; debajo, las filas de datos.
+
+    Con estilos 'tabla' las filas van sin estilos por celda (solo el
+    formato de hora que openpyxl les da a los time): bordes y cebra salen
+    del estilo de tabla, y los resaltados de reglas de formato condicional.
+    Con 'celdas' se aplican celda por celda.
     """
-    workbook = openpyxl.Workbook()
-    workbook.remove(workbook.active)
-
-    # --- 1. CONFIGURACIÓN DE ESTILOS Y COLORES ---
-    COLORS = {
-        'primary_dark': '44546A', 'primary_light': 'DDEBF7', 'accent_green': 'C6E0B4',
-        'accent_yellow': 'FFF2CC', 'accent_red': 'F8CBAD', 'accent_blue': 'B4C6E7',
-        'font_light': 'FFFFFF', 'font_dark': '000000', 'border_grey': 'BFBFBF',
-        'alt_row_fill': 'F2F2F2'
-    }
-    STYLES = {
-        'title': Font(name='Calibri', size=16, bold=True, color=COLORS['primary_dark']),
-        'subtitle': Font(name='Calibri', size=11, bold=True, color=COLORS['primary_dark']),
-        'header': Font(name='Calibri', size=11, bold=True, color=COLORS['font_light']),
-        'header_fill_resumen': PatternFill(start_color=COLORS['primary_dark'], fill_type="solid"),
-        'header_fill_trabajo': PatternFill(start_color=COLORS['primary_light'], fill_type="solid"),
-        'header_font_dark': Font(name='Calibri', size=11, bold=True, color=COLORS['font_dark']),
-        'alt_row_fill': PatternFill(start_color=COLORS['alt_row_fill'], fill_type="solid"),
-        'center_align': Alignment(horizontal='center', vertical='center'),
-        'highlight_falta': PatternFill(start_color=COLORS['accent_red'], fill_type="solid"),
-        'highlight_atraso': PatternFill(start_color=COLORS['accent_yellow'], fill_type="solid"),
-        'highlight_justificado': PatternFill(start_color=COLORS['accent_blue'], fill_type="solid"),
-    }
-    THIN_BORDER = Border(left=Side(style='thin', color=COLORS['border_grey']),
-                         right=Side(style='thin', color=COLORS['border_grey']),
-                         top=Side(style='thin', color=COLORS['border_grey']),
-                         bottom=Side(style='thin', color=COLORS['border_grey']))
-
-    # --- 2. FUNCIONES AUXILIARES DE DISEÑO ---
-    def set_report_header(sheet, title, params):
-        sheet.cell(row=1, column=1, value=title).font = STYLES['title']
-        sheet.cell(row=2, column=1,
-                   value=f"Período del {params['fecha_desde'].strftime('%d-%m-%Y')} al {params['fecha_hasta'].strftime('%d-%m-%Y')}").font = \
-        STYLES['subtitle']
+
+    def __init__(self, workbook, nombre, tabla, titulo, headers, estilos, header_claro=False, nota=None,
+                 resaltados=None, columnas_resaltadas=(), formatos=None, congelar='A5', ancho_minimo=12):
+        self.sheet = workbook.create_sheet(title=nombre)
+        self.tabla, self.titulo, self.headers, self.nota = tabla, titulo, headers, nota
+        self.estilos, self.header_claro, self.congelar = estilos, header_claro, congelar
+        self.resaltados = resaltados or {}
+        self.columnas_resaltadas = columnas_resaltadas
+        self.formatos = formatos or {}
+        self.anchos = _Anchos(ancho_minimo)
+        self.filas = 0
+
+    def medir(self, filas):
+        for fila in filas:
+            self.anchos.medir(fila)
+
+    def abrir(self, subtitulo):
+        """Aplica los anchos (ya medidos todos los datos) y escribe el encabezado."""
+        sheet = self.sheet
+        self.anchos.medir([self.titulo], negrita=True)
+        self.anchos.medir([subtitulo], negrita=True)
+        self.anchos.medir(self.headers, negrita=True)
+        self.anchos.aplicar(sheet)
+        sheet.freeze_panes = self.congelar
         sheet.row_dimensions[1].height = 20
+        sheet.append([_celda(sheet, self.titulo, _estilo(sheet, font=STYLES['title']))])
+        sheet.append([_celda(sheet, subtitulo, _estilo(sheet, font=STYLES['subtitle']))])
+        sheet.append([self.nota] if self.nota else [])
+        if self.header_claro:
+            fill, font = STYLES['header_fill_trabajo'], STYLES['header_font_dark']
+        else:
+            fill, font = STYLES['header_fill_resumen'], STYLES['header']
+        estilo_header = _estilo(sheet, fill=fill, font=font, border=THIN_BORDER, alignment=STYLES['center_align'])
+        sheet.append([_celda(sheet, h, estilo_header) for h in self.headers])
+
+        self._por_celda = _EstilosFilas(sheet, self.resaltados) if self.estilos == 'celdas' else None
+        self._formatos = [(col, _estilo(sheet, number_format=formato)) for col, formato in self.formatos.items()]
+
+    def agregar(self, valores):
+        if self._por_celda is not None:
+            # La primera fila de datos va con el relleno alterno.
+            valores = self._por_celda.fila(self.sheet, valores, self.filas % 2 == 0, self.columnas_resaltadas)
+            for col, formato in self.formatos.items():
+                valores[col].number_format = formato
+        elif self._formatos:
+            valores = list(valores)
+            for col, estilo in self._formatos:
+                valores[col] = _celda(self.sheet, valores[col], estilo)
+        self.sheet.append(valores)
+        self.filas += 1
+
+    def agregar_total(self, valores):
+        """Fila de totales en negrita, debajo de la tabla."""
+        sheet = self.sheet
+        general = _estilo(sheet, font=STYLES['header_font_dark'], border=THIN_BORDER)
+        formatos = {col: _estilo(sheet, font=STYLES['header_font_dark'], border=THIN_BORDER, number_format=formato)
+                    for col, formato in self.formatos.items()}
+        sheet.append([_celda(sheet, round(v, 2) if isinstance(v, float) else v, formatos.get(col, general))
+                      for col, v in enumerate(valores)])
+
+    def cerrar(self):
+        """Con estilos 'tabla', declara la tabla y el formato condicional sobre las filas escritas."""
+        if self._por_celda is not None or not self.filas:
+            return
+        ultima = FILA_HEADER + self.filas
+        # Las columnas se declaran a mano (en write_only no se pueden leer los encabezados) y sin
+        # autoFilter, para que no aparezcan los botones de filtro que el reporte nunca tuvo.
+        tabla = Table(displayName=self.tabla,
+                      ref=f'A{FILA_HEADER}:{get_column_letter(len(self.headers))}{ultima}',
+                      tableColumns=[TableColumn(id=i, name=h) for i, h in enumerate(self.headers, 1)],
+                      tableStyleInfo=TableStyleInfo(name=ESTILO_TABLA, showRowStripes=True))
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            self.sheet.add_table(tabla)
+
+        if self.columnas_resaltadas:
+            rango = (f'{get_column_letter(min(self.columnas_resaltadas) + 1)}{FILA_HEADER + 1}:'
+                     f'{get_column_letter(max(self.columnas_resaltadas) + 1)}{ultima}')
+            for valor, clave in self.resaltados.items():
+                self.sheet.conditional_formatting.add(rango, CellIsRule(
+                    operator='equal', formula=[f'"{valor}"'], fill=_relleno_dxf(STYLES[clave].start_color.rgb)))
+
+
+def _crear_hojas(workbook, hojas, estilos):
+    """Crea las hojas de `hojas` en el orden de HOJAS; devuelve {clave: _Hoja}."""
+    columnas_moneda = range(HEADERS_RESUMEN.index("Valor H. Extras"), len(HEADERS_RESUMEN))
+    definiciones = {
+        'resumen': [('resumen', dict(nombre="Resumen General", tabla='ResumenGeneral',
+                                     titulo="Resumen General de Asistencia y Costos", headers=HEADERS_RESUMEN,
+                                     formatos={col: FORMATO_MONEDA for col in columnas_moneda}))],
+        'trabajo': [('trabajo', dict(nombre="Matriz de Trabajo", tabla='MatrizTrabajo',
+                                     titulo="Matriz Detallada de Trabajo", headers=HEADERS_TRABAJO,
+                                     header_claro=True, resaltados=ESTADOS_RESALTADOS,
+                                     columnas_resaltadas=(COLUMNA_ESTADO,)))],
+        # Las columnas de los días se agregan al terminar la primera pasada.
+        'asistencia': [('asistencia', dict(nombre="Matriz Asistencia", tabla='MatrizAsistencia',
+                                           titulo="Matriz de Asistencia", headers=HEADERS_EMPLEADO,
+                                           nota=LEYENDA_ASISTENCIA, resaltados=CODIGOS_RESALTADOS,
+                                           congelar='D5', ancho_minimo=7))],
+        'detalles': [('faltas', dict(nombre="Faltas", tabla='DetalleFaltas', titulo="Detalle de Faltas",
+                                     headers=HEADERS_FALTAS)),
+                     ('atrasos', dict(nombre="Atrasos", tabla='DetalleAtrasos', titulo="Detalle de Atrasos",
+                                      headers=HEADERS_ATRASOS)),
+                     ('extras', dict(nombre="Extras", tabla='DetalleExtras', titulo="Detalle de Horas Extras",
+                                     headers=HEADERS_EXTRAS))],
+    }
+    return {clave: _Hoja(workbook, estilos=estilos, **definicion)
+            for hoja in HOJAS if hoja in hojas for clave, definicion in definiciones[hoja]}
 
-    def apply_table_style(sheet, start_row, end_row, start_col, end_col, header_fill, header_font=STYLES['header']):
-        for cell in sheet[start_row][start_col - 1:end_col]:
-            cell.fill = header_fill; cell.font = header_font
-            cell.border = THIN_BORDER; cell.alignment = STYLES['center_align']
-        for row_idx in range(start_row + 1, end_row + 1):
-            is_alt_row = (row_idx - start_row) % 2 != 0
-            for col_idx in range(start_col, end_col + 1):
-                cell = sheet.cell(row=row_idx, column=col_idx)
-                cell.border = THIN_BORDER
-                if is_alt_row: cell.fill = STYLES['alt_row_fill']
-
-    # --- 3. PREPARACIÓN DE DATOS COMUNES ---
-    dias_semana_map = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"]
-
-    # --- 4. CREACIÓN DE LA ÚNICA HOJA REQUERIDA ---
-
-    # --- Hoja: Matriz de Trabajo (ÚNICA HOJA ACTIVA) ---
-    sheet_trabajo = workbook.create_sheet(title="Matriz de Trabajo")
-    set_report_header(sheet_trabajo, "Matriz Detallada de Trabajo", params)
-    sheet_trabajo.append([])
-
-    headers_trabajo = [
-        "Cédula", "Empleado", "Departamento", "Fecha", "Día", "Estado",
-        "Tiene Atraso", "Entrada Programada", "Entrada Real", "Minutos Atraso",
-        "H. Salida Alm.", "H. Reg. Alm.", "H. Salida Final", "T. Almuerzo", "T. Trabajado"
-    ]
-    sheet_trabajo.append(headers_trabajo)
-    start_row_trabajo = 5
 
+# ==============================================================================
+# --- PRIMERA PASADA: FILAS DE TODAS LAS HOJAS ---
+# ==============================================================================
+def _volcar(report_data, hojas, params, spool):
+    """
+    Única pasada por el reporte: arma las filas de cada empleado para todas
+    las hojas, mide los anchos y las guarda en `spool` (un pickle por
+    empleado). Así en memoria solo hay un empleado a la vez. Devuelve las
+    fechas de la Matriz de Asistencia y los totales del resumen.
+    """
+    fechas, totales = set(), None
     for item in report_data:
-        empleado = item['empleado']
-        nombre_completo = f"{empleado.last_name} {empleado.first_name}"
-        for reg in item['registros']:
-            fecha_dia = reg['fecha']
-            estado = reg.get('estado', '')
-            tiene_atraso = 'Sí' if reg.get('es_atraso') == 1 else 'No'
-            entrada_programada = reg.get('horario_prog', ' - ').split(' - ')[0] if reg.get('estado') not in ['Falta', 'Feriado', 'Justificado', 'Fin de Semana'] else ''
-            minutos_atraso = reg.get('minutos_atraso', 0) if reg.get('es_atraso') == 1 else ''
-            row_data = [
-                empleado.passport, nombre_completo, empleado.department.dept_name,
-                fecha_dia.strftime('%Y-%m-%d'), dias_semana_map[fecha_dia.weekday()], estado
-            ]
-            row_data.extend([
-                tiene_atraso, entrada_programada, reg.get('hora_ingreso'), minutos_atraso
-            ])
-            if estado not in ['Falta', 'Justificado', 'Feriado', 'Fin de Semana']:
-                row_data.extend([
-                    reg.get('hora_salida_almuerzo'), reg.get('hora_regreso_almuerzo'),
-                    reg.get('hora_salida_final'), reg.get('tiempo_almuerzo', '00:00'),
-                    reg.get('tiempo_trabajado', '00:00')
-                ])
-            else:
-                row_data.extend(['-'] * 5)
-            sheet_trabajo.append(row_data)
-
-    if sheet_trabajo.max_row >= start_row_trabajo:
-        apply_table_style(sheet_trabajo, start_row_trabajo - 1, sheet_trabajo.max_row, 1, len(headers_trabajo),
-                          STYLES['header_fill_trabajo'], STYLES['header_font_dark'])
-        for row in sheet_trabajo.iter_rows(min_row=start_row_trabajo, min_col=6, max_col=6):
-            for cell in row:
-                if cell.value == 'Falta': cell.fill = STYLES['highlight_falta']
-                elif cell.value == 'Atraso': cell.fill = STYLES['highlight_atraso']
-                elif cell.value == 'Justificado': cell.fill = STYLES['highlight_justificado']
-    sheet_trabajo.freeze_panes = 'A5'
-
-
-    # --- OTRAS HOJAS (DESACTIVADAS MEDIANTE COMENTARIOS) ---
-
-    # --- Hoja 1 DESACTIVADA: Resumen General ---
-    # sheet_resumen = workbook.create_sheet(title="Resumen General")
-    # ... (código para la hoja de resumen) ...
-
-    # --- Hoja 3 DESACTIVADA: Matriz de Asistencia ---
-    # asistencia_codes = {'Presente': 'P', 'Atraso': 'A', 'Falta': 'FI', 'Justificado': 'FJ'}
-    # asistencia_highlights = {'FI': STYLES['highlight_falta'], 'A': STYLES['highlight_atraso']}
-    # crear_hoja_matriz("Matriz Asistencia", 'estado', asistencia_codes, asistencia_highlights)
-
-    # --- Hojas 4, 5 y 6 DESACTIVADAS: Detalles de Faltas, Atrasos, Extras ---
-    # ... (código para las hojas de detalle) ...
-
-
-    # --- 5. AJUSTE FINAL DE COLUMNAS ---
-    # Este bucle ahora solo afectará a la única hoja activa.
-    for sheet in workbook.worksheets:
-        for col_cells in sheet.columns:
-            max_length = 0
-            if isinstance(col_cells[0], openpyxl.cell.cell.MergedCell):
-                continue
-            for cell in col_cells:
-                if cell.value:
-                    try:
-                        padding = 4 if cell.font and cell.font.bold else 0
-                        cell_len = len(str(cell.value)) + padding
-                        if cell_len > max_length: max_length = cell_len
-                    except: pass
-            adjusted_width = max(12, min(max_length + 2, 50))
-            sheet.column_dimensions[get_column_letter(col_cells[0].column)].width = adjusted_width
-
-    # --- 6. GUARDAR Y DEVOLVER EL ARCHIVO ---
-    in_memory_file = BytesIO()
-    workbook.save(in_memory_file)
-    in_memory_file.seek(0)
-    return in_memory_file
\ No newline at end of file
+        filas = {}
+        if 'trabajo' in hojas:
+            filas['trabajo'] = filas_matriz_trabajo(item)
+        if 'resumen' in hojas:
+            fila = _fila_resumen(item, params)
+            filas['resumen'] = [fila]
+            valores = fila[len(HEADERS_EMPLEADO):]
+            totales = valores if totales is None else [t + v for t, v in zip(totales, valores)]
+        if 'asistencia' in hojas or 'faltas' in hojas:
+            codigos, filas['faltas'], filas['atrasos'], filas['extras'] = _filas_asistencia_y_detalle(item)
+            filas['asistencia'] = (_datos_empleado(item['empleado']), codigos)
+            fechas.update(codigos)
+        for clave, hoja in hojas.items():
+            hoja.medir([filas['asistencia'][0]] if clave == 'asistencia' else filas[clave])
+        spool.write(pickle.dumps(filas, pickle.HIGHEST_PROTOCOL))
+    spool.seek(0)
+    return sorted(fechas), totales
+
+
+def _leer(spool):
+    while True:
+        try:
+            yield pickle.load(spool)
+        except EOFError:
+            return
+
+
+# ==============================================================================
+# --- GENERADOR DE REPORTE EXCEL ---
+# ==============================================================================
+def crear_excel_reporte(report_data, params, estilos=None, hojas=None):
+    """
+    Construye un libro de Excel elegante y profesional con las hojas de
+    `hojas` (por defecto REPORT_EXCEL_HOJAS; ver HOJAS): Resumen General
+    valorizado con los costos/multas de `params`, Matriz de Trabajo, Matriz
+    Asistencia y los detalles de Faltas, Atrasos y Extras.
+
+    Se escribe en modo write_only: las filas se emiten una a una y la memoria
+    no crece con la cantidad de filas. El reporte se recorre una sola vez
+    para todas las hojas; como los anchos de columna van al inicio de cada
+    hoja, las filas pasan antes por un temporal mientras se miden. Devuelve
+    un archivo temporal posicionado al inicio (en memoria si es chico).
+
+    `estilos` (por defecto REPORT_EXCEL_ESTILOS): 'tabla' usa un estilo de
+    tabla y formato condicional que Excel evalúa solo; 'celdas' aplica los
+    estilos a cada celda, para visores que no soportan estilos de tabla.
+    """
+    if has_app_context():
+        estilos = estilos or current_app.config.get('REPORT_EXCEL_ESTILOS', 'tabla')
+        hojas = hojas or current_app.config.get('REPORT_EXCEL_HOJAS', HOJAS)
+    estilos, hojas = estilos or 'tabla', hojas or HOJAS
+    if isinstance(hojas, str):
+        hojas = [h.strip() for h in hojas.split(',')]
+    # Un libro sin hojas no se puede guardar: si no queda ninguna válida va la Matriz de Trabajo.
+    hojas = [h for h in HOJAS if h in hojas] or ['trabajo']
+
+    workbook = openpyxl.Workbook(write_only=True)
+    por_clave = _crear_hojas(workbook, hojas, estilos)
+    subtitulo = (f"Período del {params['fecha_desde'].strftime('%d-%m-%Y')} "
+                 f"al {params['fecha_hasta'].strftime('%d-%m-%Y')}")
+
+    with tempfile.TemporaryFile() as spool:
+        fechas, totales = _volcar(report_data, por_clave, params, spool)
+
+        # --- ENCABEZADOS ---
+        asistencia = por_clave.get('asistencia')
+        if asistencia is not None:
+            # Día y mes (y el año si el rango cruza años): los nombres de columna de la tabla no pueden repetirse.
+            formato = '%d/%m/%Y' if fechas and fechas[0].year != fechas[-1].year else '%d/%m'
+            asistencia.headers = HEADERS_EMPLEADO + [f"{f.strftime(formato)} {DIAS_SEMANA[f.weekday()][:3]}"
+                                                     for f in fechas]
+            asistencia.columnas_resaltadas = tuple(range(len(HEADERS_EMPLEADO), len(asistencia.headers)))
+        if estilos != 'celdas':
+            _registrar_estilo_tabla(workbook)
+        for hoja in por_clave.values():
+            hoja.abrir(subtitulo)
+
+        # --- FILAS (en write_only cada hoja va a su propio temporal, así que se pueden intercalar) ---
+        for filas in _leer(spool):
+            for clave, hoja in por_clave.items():
+                if clave == 'asistencia':
+                    datos_empleado, codigos = filas['asistencia']
+                    hoja.agregar(datos_empleado + [codigos.get(f, '') for f in fechas])
+                else:
+                    for valores in filas[clave]:
+                        hoja.agregar(valores)
+
+        for hoja in por_clave.values():
+            hoja.cerrar()
+        if totales is not None:
+            por_clave['resumen'].agregar_total(['TOTAL', '', ''] + totales)
+
+        # --- GUARDAR Y DEVOLVER EL ARCHIVO ---
+        archivo = tempfile.SpooledTemporaryFile(max_size=MAX_EN_MEMORIA)
+        workbook.save(archivo)
+    archivo.seek(0)
+    return archivo
@@ -0,0 +1,299 @@
+"""
+Exportación del reporte a Excel en segundo plano.
+
+`solicitar_exportacion(params)` devuelve el id de un trabajo; el cálculo y
+la escritura del .xlsx corren en un pool de hilos acotado (EXPORT_WORKERS)
+fuera del hilo de la petición, así que no bloquean al worker de gunicorn
+ni chocan con su timeout.
+
+Todo el estado vive en EXPORT_SPOOL_DIR, compartido por los workers:
+
+- `<id>.json`: estado del trabajo (pendiente, en_curso, listo o error),
+  empleados procesados / total y el nombre del archivo a descargar.
+- `<id>.xlsx`: el resultado, que se sirve desde el disco.
+- `<id>.carga.xlsx|csv`: el archivo subido de una importación.
+- `clave-<hash>.json`: puntero al trabajo en curso con los mismos
+  parámetros. Las solicitudes idénticas mientras ese trabajo no termina se
+  suman a él en lugar de calcular otra vez.
+
+Las importaciones masivas (app/services/importaciones.py) usan el mismo
+spool y el mismo pool a través de crear_trabajo, encolar,
+actualizar_trabajo, guardar_archivo y estado_trabajo.
+
+Los archivos con más de EXPORT_TTL_MINUTOS se borran al solicitar o
+consultar exportaciones, salvo los de trabajos pendientes o en curso.
+Mientras un trabajo está en cola o corriendo, un hilo aparte (el latido)
+refresca su estado, aunque espere detrás de otros o esté en una fase sin
+progreso como la escritura de las hojas; uno cuyo estado no se actualiza
+hace ABANDONO (por ejemplo, porque se reinició el worker que lo corría) se
+da por perdido.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from time import monotonic
+
+from flask import current_app
+
+from app.services.excel_builder import crear_excel_reporte
+from app.services.report_builder import iter_report, LimiteMarcacionesExcedido
+
+log = logging.getLogger(__name__)
+
+PENDIENTE, EN_CURSO, LISTO, ERROR = 'pendiente', 'en_curso', 'listo', 'error'
+ABANDONO = timedelta(minutes=15)
+# Cada cuánto (segundos) se escribe el progreso en el archivo de estado.
+INTERVALO_PROGRESO = 1.0
+# Cada cuánto (segundos) el latido de un trabajo en cola o en curso refresca su estado; muy por debajo de ABANDONO.
+INTERVALO_LATIDO = 60.0
+_ID_VALIDO = re.compile(r'^[0-9a-f]{32}$')
+
+# Un pool por proceso (cada worker de gunicorn tiene el suyo), creado al primer uso.
+_pool = None
+# Un trabajo solo se escribe desde el proceso que lo corre: el lock evita que el latido pise otra actualización.
+_lock_estados = threading.Lock()
+
+
+def _obtener_pool():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=current_app.config.get('EXPORT_WORKERS', 2),
+                                   thread_name_prefix='exportacion')
+    return _pool
+
+
+# --- ARCHIVOS DEL SPOOL ---
+
+def directorio_spool():
+    """Directorio del spool (EXPORT_SPOOL_DIR), creado si no existe."""
+    directorio = (current_app.config.get('EXPORT_SPOOL_DIR') or
+                  os.path.join(tempfile.gettempdir(), 'exportaciones'))
+    os.makedirs(directorio, exist_ok=True)
+    return directorio
+
+
+def _ruta(nombre):
+    return os.path.join(directorio_spool(), nombre)
+
+
+def _escribir_json(ruta, datos):
+    """Escritura atómica: los demás workers nunca leen un archivo a medio escribir."""
+    temporal = f'{ruta}.{uuid.uuid4().hex}.tmp'
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, default=str)
+    os.replace(temporal, ruta)
+
+
+def _leer_json(ruta):
+    try:
+        with open(ruta, encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _borrar(ruta):
+    try:
+        os.remove(ruta)
+    except FileNotFoundError:
+        pass
+
+
+def _en_curso(estado):
+    return (estado is not None and estado['estado'] in (PENDIENTE, EN_CURSO) and
+            datetime.now() - datetime.fromisoformat(estado['actualizado']) < ABANDONO)
+
+
+def actualizar_trabajo(id_trabajo, **cambios):
+    ruta = _ruta(f'{id_trabajo}.json')
+    with _lock_estados:
+        estado = _leer_json(ruta) or {}
+        estado.update(cambios, actualizado=datetime.now().isoformat())
+        _escribir_json(ruta, estado)
+    return estado
+
+
+def _latir(id_trabajo):
+    ruta = _ruta(f'{id_trabajo}.json')
+    with _lock_estados:
+        estado = _leer_json(ruta)
+        if estado is not None:
+            estado['actualizado'] = datetime.now().isoformat()
+            _escribir_json(ruta, estado)
+
+
+def _iniciar_latido(app, id_trabajo):
+    """
+    Refresca `actualizado` del trabajo cada INTERVALO_LATIDO segundos desde un
+    hilo aparte, hasta que se llame a la función devuelta.
+    """
+    detener = threading.Event()
+
+    def latir():
+        with app.app_context():
+            while not detener.wait(INTERVALO_LATIDO):
+                _latir(id_trabajo)
+
+    threading.Thread(target=latir, name=f'latido-{id_trabajo[:8]}', daemon=True).start()
+    return detener.set
+
+
+def limpiar_vencidos():
+    """
+    Borra resultados, estados, subidas y punteros más viejos que EXPORT_TTL_MINUTOS, salvo los
+    archivos (`<id>.*`) de trabajos pendientes o en curso.
+    """
+    limite = datetime.now().timestamp() - current_app.config.get('EXPORT_TTL_MINUTOS', 60) * 60
+    directorio = directorio_spool()
+    for nombre in os.listdir(directorio):
+        ruta = os.path.join(directorio, nombre)
+        try:
+            if os.path.getmtime(ruta) >= limite:
+                continue
+        except FileNotFoundError:
+            continue
+        id_trabajo = nombre.split('.', 1)[0]
+        if _ID_VALIDO.match(id_trabajo) and _en_curso(_leer_json(os.path.join(directorio, f'{id_trabajo}.json'))):
+            continue
+        _borrar(ruta)
+
+
+def guardar_archivo(id_trabajo, archivo):
+    """Copia `archivo` (y lo cierra) a `<id>.xlsx`; el reemplazo es atómico."""
+    destino = _ruta(f'{id_trabajo}.xlsx')
+    with archivo, open(f'{destino}.tmp', 'wb') as salida:
+        shutil.copyfileobj(archivo, salida)
+    os.replace(f'{destino}.tmp', destino)
+
+
+# --- TRABAJOS ---
+
+def crear_trabajo(**datos):
+    """Registra un trabajo pendiente, con `datos` adicionales en su estado, y devuelve su id."""
+    limpiar_vencidos()
+    id_trabajo = uuid.uuid4().hex
+    _escribir_json(_ruta(f'{id_trabajo}.json'), {
+        'id': id_trabajo, 'estado': PENDIENTE, 'procesados': 0, 'total': None, 'mensaje': None, **datos,
+        'creado': datetime.now().isoformat(), 'actualizado': datetime.now().isoformat()})
+    return id_trabajo
+
+
+def encolar(funcion, id_trabajo, *args):
+    """
+    Corre `funcion(id_trabajo, *args)` en el pool, dentro de un contexto de la aplicación
+    actual. Desde que se encola hasta que termina (también mientras espera detrás de otros
+    trabajos) un latido mantiene vivo su estado.
+    """
+    app = current_app._get_current_object()
+    detener = _iniciar_latido(app, id_trabajo)
+    try:
+        _obtener_pool().submit(_en_contexto, app, detener, funcion, (id_trabajo, *args))
+    except BaseException:
+        detener()
+        raise
+
+
+def _en_contexto(app, detener, funcion, args):
+    try:
+        with app.app_context():
+            funcion(*args)
+    finally:
+        detener()
+
+
+# --- API ---
+
+def _clave(params):
+    return hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def solicitar_exportacion(params):
+    """
+    Encola la exportación del reporte con `params` (los mismos de crear_excel_reporte) y
+    devuelve el id del trabajo; si ya hay uno en curso con los mismos parámetros, devuelve ese.
+    """
+    id_trabajo = crear_trabajo(
+        nombre_archivo=f"Reporte_Financiero_{params['fecha_desde']}_a_{params['fecha_hasta']}.xlsx")
+    ruta_estado = _ruta(f'{id_trabajo}.json')
+
+    # El puntero se publica con os.link, que falla si ya existe: entre workers solo uno gana la clave,
+    # y nadie lee nunca un puntero vacío.
+    puntero = _ruta(f'clave-{_clave(params)}.json')
+    propuesto = f'{puntero}.{id_trabajo}.tmp'
+    _escribir_json(propuesto, {'id': id_trabajo})
+    try:
+        while True:
+            try:
+                os.link(propuesto, puntero)
+                break
+            except FileExistsError:
+                existente = (_leer_json(puntero) or {}).get('id')
+                if existente and _en_curso(_leer_json(_ruta(f'{existente}.json'))):
+                    _borrar(ruta_estado)
+                    return existente
+                # Puntero de un trabajo terminado o abandonado: se descarta y se vuelve a intentar.
+                _borrar(puntero)
+    finally:
+        _borrar(propuesto)
+
+    encolar(_ejecutar, id_trabajo, puntero, params)
+    return id_trabajo
+
+
+def estado_trabajo(id_trabajo, interrumpido='El trabajo se interrumpió; vuelva a intentarlo.'):
+    """Estado del trabajo (dict) o None si el id no existe o ya venció; si quedó abandonado, error con `interrumpido`."""
+    if not _ID_VALIDO.match(id_trabajo):
+        return None
+    limpiar_vencidos()
+    estado = _leer_json(_ruta(f'{id_trabajo}.json'))
+    if estado is not None and estado['estado'] in (PENDIENTE, EN_CURSO) and not _en_curso(estado):
+        estado.update(estado=ERROR, mensaje=interrumpido)
+    return estado
+
+
+def estado_exportacion(id_trabajo):
+    """Estado de la exportación (dict) o None si el id no existe o ya venció."""
+    return estado_trabajo(id_trabajo, 'La exportación se interrumpió; vuelva a solicitarla.')
+
+
+def archivo_exportacion(id_trabajo):
+    """Ruta del .xlsx de un trabajo terminado, o None."""
+    estado = estado_exportacion(id_trabajo)
+    if estado is None or estado['estado'] != LISTO:
+        return None
+    ruta = _ruta(f'{id_trabajo}.xlsx')
+    return ruta if os.path.exists(ruta) else None
+
+
+# --- EJECUCIÓN EN EL POOL ---
+
+def _ejecutar(id_trabajo, puntero, params):
+    try:
+        actualizar_trabajo(id_trabajo, estado=EN_CURSO)
+        ultimo = [0.0]
+
+        def progreso(procesados, total):
+            if procesados == total or monotonic() - ultimo[0] >= INTERVALO_PROGRESO:
+                ultimo[0] = monotonic()
+                actualizar_trabajo(id_trabajo, procesados=procesados, total=total)
+
+        reporte = iter_report(params['fecha_desde'], params['fecha_hasta'], params['departamento_id'],
+                              progreso=progreso)
+        # Escribir las hojas no informa progreso: el latido (ver encolar) mantiene vivo el estado mientras tanto.
+        guardar_archivo(id_trabajo, crear_excel_reporte(reporte, params))
+        actualizar_trabajo(id_trabajo, estado=LISTO)
+    except LimiteMarcacionesExcedido as e:
+        actualizar_trabajo(id_trabajo, estado=ERROR, mensaje=str(e))
+    except Exception:
+        log.exception('Falló la exportación %s', id_trabajo)
+        actualizar_trabajo(id_trabajo, estado=ERROR, mensaje='Ocurrió un error al generar el reporte.')
+    finally:
+        _borrar(puntero)
@@ -0,0 +1,108 @@
+"""
+Exportación de listados (justificaciones, permisos) a Excel o CSV.
+
+Recibe un `select` de SQLAlchemy Core con las columnas en el orden de los
+encabezados y lo lee con un cursor del lado del servidor (`yield_per`),
+sin armar objetos del ORM. El Excel se escribe en modo write_only, así que
+la memoria no depende de cuántas filas tenga el listado.
+
+Los anchos de columna van al inicio de la hoja, antes que las filas: se
+calculan con una consulta aparte (`max(length(...))` de cada columna sobre
+el mismo select), en lugar de recorrer las celdas después.
+"""
+import csv
+import io
+import tempfile
+
+import openpyxl
+from flask import Response, send_file, stream_with_context
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill
+from openpyxl.utils import get_column_letter
+from sqlalchemy import String, cast, func, select
+
+from app import db
+from app.services.excel_builder import MAX_EN_MEMORIA
+from app.services.instrumentacion import medir_flujo
+
+FILAS_POR_LOTE = 2000
+ANCHO_MAXIMO = 50
+
+
+def _filas(consulta, convertir):
+    """Filas de `consulta` (tuplas), aplicando `convertir` ({índice: función}) a las columnas indicadas."""
+    resultado = db.session.execute(consulta, execution_options={'stream_results': True,
+                                                                'yield_per': FILAS_POR_LOTE})
+    try:
+        for fila in resultado:
+            fila = list(fila)
+            if convertir:
+                for col, funcion in convertir.items():
+                    if fila[col] is not None:
+                        fila[col] = funcion(fila[col])
+            yield fila
+    finally:
+        resultado.close()
+
+
+def anchos_columnas(consulta, headers):
+    """Ancho de cada columna: el texto más largo entre el encabezado y los datos, más 2 (máximo 50)."""
+    sub = consulta.order_by(None).subquery()
+    largos = db.session.execute(select(*[func.max(func.length(cast(c, String))) for c in sub.c])).one()
+    return [min(max(len(h), largo or 0) + 2, ANCHO_MAXIMO) for h, largo in zip(headers, largos)]
+
+
+def crear_excel_consulta(consulta, headers, titulo_hoja, convertir=None):
+    """
+    Libro con una hoja `titulo_hoja`: encabezados en negrita sobre celeste y
+    una fila por resultado de `consulta`. Devuelve un archivo temporal
+    posicionado al inicio (en memoria si es chico).
+    """
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=titulo_hoja)
+    for col, ancho in enumerate(anchos_columnas(consulta, headers), 1):
+        sheet.column_dimensions[get_column_letter(col)].width = ancho
+
+    encabezado = []
+    for h in headers:
+        celda = WriteOnlyCell(sheet, value=h)
+        celda.font = Font(bold=True)
+        celda.fill = PatternFill("solid", fgColor="DDEBF7")
+        encabezado.append(celda)
+    sheet.append(encabezado)
+    for fila in _filas(consulta, convertir):
+        sheet.append(fila)
+
+    archivo = tempfile.SpooledTemporaryFile(max_size=MAX_EN_MEMORIA)
+    workbook.save(archivo)
+    archivo.seek(0)
+    return archivo
+
+
+def iter_csv_consulta(consulta, headers, convertir=None):
+    """Texto CSV de `consulta`: el encabezado y luego un bloque cada FILAS_POR_LOTE filas."""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, lineterminator='\n')
+    escritor.writerow(headers)
+    for i, fila in enumerate(_filas(consulta, convertir), 1):
+        escritor.writerow(fila)
+        if i % FILAS_POR_LOTE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def respuesta_descarga(consulta, headers, nombre_base, titulo_hoja, formato='xlsx', convertir=None):
+    """
+    Respuesta de descarga de `consulta`: CSV enviado a medida que se lee (formato='csv') o .xlsx.
+    La lectura del CSV ocurre después de la petición; se mide con medir_flujo.
+    """
+    if formato == 'csv':
+        return Response(stream_with_context(medir_flujo(iter_csv_consulta(consulta, headers, convertir))),
+                        mimetype='text/csv', headers={'Content-Disposition': f'attachment; filename={nombre_base}.csv'})
+    return send_file(
+        crear_excel_consulta(consulta, headers, titulo_hoja, convertir), as_attachment=True,
+        download_name=f'{nombre_base}.xlsx',
+        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
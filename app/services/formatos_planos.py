@@ -0,0 +1,129 @@
+"""
+Exportación del reporte en formatos planos: CSV y Parquet.
+
+Tienen las mismas columnas que la hoja "Matriz de Trabajo" del Excel
+(HEADERS_TRABAJO) pero sin estilos, anchos ni temporal intermedio, así que
+cuestan una fracción del .xlsx.
+
+- CSV: `iter_csv` genera el texto empleado por empleado, para responder
+  con un generador de Flask a medida que se calcula el reporte.
+- Parquet: `crear_parquet_reporte` acumula las filas por columna y escribe
+  un row group cada PARQUET_FILAS_POR_GRUPO filas. Necesita pyarrow
+  (en requirements.txt); si falta se lanza FormatoNoDisponible y la página
+  no ofrece el formato (`parquet_disponible`).
+"""
+import csv
+import importlib.util
+import io
+import tempfile
+from datetime import date
+
+from app.services.excel_builder import HEADERS_TRABAJO, MAX_EN_MEMORIA, filas_matriz_trabajo
+
+PARQUET_FILAS_POR_GRUPO = 50000
+
+# Columnas con tipo propio en Parquet; las demás van como texto, igual que en el CSV.
+# En estas columnas '' y '-' (sin dato) se guardan como nulos.
+COLUMNAS_FECHA = {'Fecha'}
+COLUMNAS_ENTERAS = {'Minutos Atraso'}
+COLUMNAS_HORA = {'Entrada Real', 'H. Salida Alm.', 'H. Reg. Alm.', 'H. Salida Final'}
+SIN_DATO = ('', '-', None)
+
+
+class FormatoNoDisponible(Exception):
+    """El formato pedido necesita una dependencia opcional que no está instalada."""
+
+
+# ==============================================================================
+# --- CSV ---
+# ==============================================================================
+def iter_csv(report_data):
+    """Texto CSV del reporte: primero el encabezado y luego un bloque por empleado."""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, lineterminator='\n')
+
+    def vaciar():
+        texto = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return texto
+
+    escritor.writerow(HEADERS_TRABAJO)
+    yield vaciar()
+    for item in report_data:
+        escritor.writerows(filas_matriz_trabajo(item))
+        yield vaciar()
+
+
+# ==============================================================================
+# --- PARQUET ---
+# ==============================================================================
+def parquet_disponible():
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise FormatoNoDisponible('La exportación a Parquet requiere pyarrow (pip install pyarrow).') from None
+    return pyarrow, pyarrow.parquet
+
+
+def _esquema(pa):
+    def tipo(columna):
+        if columna in COLUMNAS_FECHA:
+            return pa.date32()
+        if columna in COLUMNAS_ENTERAS:
+            return pa.int32()
+        if columna in COLUMNAS_HORA:
+            return pa.time64('us')
+        return pa.string()
+    return pa.schema([(columna, tipo(columna)) for columna in HEADERS_TRABAJO])
+
+
+def _convertidores():
+    """Una función por columna que pasa el valor de la fila al tipo de la columna Parquet."""
+    def nulo_o(convertir):
+        return lambda v: None if v in SIN_DATO else convertir(v)
+
+    def convertidor(columna):
+        if columna in COLUMNAS_FECHA:
+            return nulo_o(date.fromisoformat)
+        if columna in COLUMNAS_ENTERAS:
+            return nulo_o(int)
+        if columna in COLUMNAS_HORA:
+            return nulo_o(lambda v: v)
+        return lambda v: v if v is None else str(v)
+    return [convertidor(columna) for columna in HEADERS_TRABAJO]
+
+
+def crear_parquet_reporte(report_data, filas_por_grupo=PARQUET_FILAS_POR_GRUPO):
+    """
+    Escribe el reporte en Parquet, un row group cada `filas_por_grupo` filas:
+    en memoria solo están las columnas del grupo en curso. Devuelve un archivo
+    temporal posicionado al inicio (en memoria si es chico).
+    """
+    pa, pq = _pyarrow()
+    esquema = _esquema(pa)
+    convertidores = _convertidores()
+    columnas = [[] for _ in HEADERS_TRABAJO]
+
+    archivo = tempfile.SpooledTemporaryFile(max_size=MAX_EN_MEMORIA)
+    with pq.ParquetWriter(archivo, esquema) as escritor:
+        def escribir_grupo():
+            escritor.write_batch(pa.record_batch(columnas, schema=esquema))
+            for columna in columnas:
+                columna.clear()
+
+        for item in report_data:
+            for fila in filas_matriz_trabajo(item):
+                for columna, convertir, valor in zip(columnas, convertidores, fila):
+                    columna.append(convertir(valor))
+            if len(columnas[0]) >= filas_por_grupo:
+                escribir_grupo()
+        if columnas[0]:
+            escribir_grupo()
+    archivo.seek(0)
+    return archivo
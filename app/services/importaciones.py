@@ -0,0 +1,102 @@
+"""
+Cargas masivas en segundo plano (asignaciones, justificaciones, permisos).
+
+`solicitar_importacion(tipo, file)` guarda la subida en el spool de
+exportaciones y encola un trabajo en el mismo pool (exportaciones.encolar):
+la petición responde enseguida y la página consulta el estado. El trabajo
+procesa el archivo por lotes con un commit por lote (carga_comun.por_lotes)
+y va dejando en su estado:
+
+- `procesados` / `total`: filas leídas y la estimación de filas del archivo.
+- `resumen`: el mensaje final, el mismo que antes se mostraba con flash.
+- `errores`: los primeros MAX_ERRORES_ESTADO errores como 'Fila N: motivo',
+  y `total_errores`; si hay alguno, el informe completo queda como el
+  .xlsx del trabajo (exportaciones.archivo_exportacion).
+"""
+import logging
+import os
+from time import monotonic
+
+from flask import current_app
+
+from app.services.carga_asignaciones import procesar_asignaciones, COLUMNAS as COLUMNAS_ASIGNACIONES
+from app.services.carga_comun import crear_informe_errores
+from app.services.carga_justificaciones import cargar_justificaciones, COLUMNAS as COLUMNAS_JUSTIFICACIONES
+from app.services.carga_permisos import cargar_permisos, COLUMNAS as COLUMNAS_PERMISOS
+from app.services.exportaciones import (crear_trabajo, encolar, actualizar_trabajo, guardar_archivo,
+                                        directorio_spool, INTERVALO_PROGRESO, EN_CURSO, LISTO, ERROR)
+from app.services.ingesta import ArchivoCarga, recibir_archivo
+
+log = logging.getLogger(__name__)
+
+MAX_ERRORES_ESTADO = 50
+
+
+def _importar_asignaciones(filas, filas_por_lote, progreso):
+    stats, errores = procesar_asignaciones(filas, filas_por_lote, progreso)
+    return (f"Proceso completado: {stats['carteras_creadas']} carteras nuevas, {stats['grupos_creados']} grupos "
+            f"nuevos, {stats['asignaciones_creadas']} empleados asignados, "
+            f"{stats['horarios_especiales_creados_o_actualizados']} horarios especiales aplicados."), errores
+
+
+def _importar_justificaciones(filas, filas_por_lote, progreso):
+    creadas, errores = cargar_justificaciones(filas, filas_por_lote, progreso)
+    return (f'Carga masiva completada: {creadas} justificaciones creadas, '
+            f'{len(errores)} filas con errores.'), errores
+
+
+def _importar_permisos(filas, filas_por_lote, progreso):
+    creados, errores = cargar_permisos(filas, filas_por_lote, progreso)
+    return f'Carga masiva completada: {creados} permisos creados, {len(errores)} filas con errores.', errores
+
+
+# Tipo -> (función de carga, columnas del archivo).
+TIPOS = {
+    'asignaciones': (_importar_asignaciones, COLUMNAS_ASIGNACIONES),
+    'justificaciones': (_importar_justificaciones, COLUMNAS_JUSTIFICACIONES),
+    'permisos': (_importar_permisos, COLUMNAS_PERMISOS),
+}
+
+
+def solicitar_importacion(tipo, file):
+    """
+    Guarda la subida `file` y encola su carga; devuelve el id del trabajo.
+    Lanza ingesta.ArchivoNoValido si el archivo falta, no es .xlsx/.csv o es muy grande.
+    """
+    carga = recibir_archivo(file, directorio_spool())
+    id_trabajo = crear_trabajo(tipo=tipo, archivo=carga.nombre, nombre_archivo=f'errores_{tipo}.xlsx',
+                               resumen=None, errores=[], total_errores=0)
+    # Con el nombre del trabajo, la limpieza del spool no la borra mientras el trabajo esté en cola o en curso.
+    ruta = os.path.join(directorio_spool(), f'{id_trabajo}.carga{carga.formato}')
+    os.replace(carga.ruta, ruta)
+    encolar(_ejecutar, id_trabajo, tipo, ruta, carga.formato, carga.nombre)
+    return id_trabajo
+
+
+def _ejecutar(id_trabajo, tipo, ruta, formato, nombre):
+    importar, columnas = TIPOS[tipo]
+    with ArchivoCarga(ruta, formato, nombre) as carga:
+        try:
+            total = carga.total_filas()
+            actualizar_trabajo(id_trabajo, estado=EN_CURSO, total=total)
+            avance = {'procesados': 0, 'escrito': 0.0}
+
+            def progreso(procesados):
+                avance['procesados'] = procesados
+                if monotonic() - avance['escrito'] >= INTERVALO_PROGRESO:
+                    avance['escrito'] = monotonic()
+                    # La estimación puede quedarse corta (p. ej. saltos de línea dentro de un campo del CSV).
+                    actualizar_trabajo(id_trabajo, procesados=procesados,
+                                       total=max(total, procesados) if total is not None else None)
+
+            resumen, errores = importar(carga.filas(len(columnas)),
+                                        current_app.config.get('CARGA_FILAS_POR_LOTE', 5000), progreso)
+            if errores:
+                guardar_archivo(id_trabajo, crear_informe_errores(errores, columnas))
+            actualizar_trabajo(id_trabajo, estado=LISTO, procesados=avance['procesados'], total=avance['procesados'],
+                               resumen=resumen, total_errores=len(errores),
+                               errores=[f'Fila {e.fila}: {e.motivo}' for e in errores[:MAX_ERRORES_ESTADO]])
+        except Exception as e:
+            # CargaInterrumpida ya indica cuántas filas de lotes anteriores quedaron guardadas.
+            log.exception('Falló la importación %s', id_trabajo)
+            actualizar_trabajo(id_trabajo, estado=ERROR, mensaje=f'Ocurrió un error al procesar el archivo: {e}')
@@ -0,0 +1,193 @@
+"""
+Recepción de archivos de carga masiva (.xlsx o .csv).
+
+`recibir_archivo(file)` copia la subida por bloques a un archivo temporal
+propio (cortando si supera MAX_CONTENT_LENGTH) y devuelve un ArchivoCarga,
+cuyo método `filas` entrega las filas de a una, sin cargar el archivo
+completo:
+
+- .xlsx: openpyxl en modo read_only/data_only, sin estilos; los valores
+  llegan con el tipo de la celda (texto, número, fecha, hora).
+- .csv: módulo csv, con el separador detectado (coma, punto y coma o
+  tabulación) y UTF-8 o, si no decodifica, Windows-1252 (lo que guarda
+  Excel en español). Los valores llegan como texto.
+
+En ambos casos la primera fila es el encabezado, las celdas vacías son
+None y se saltan las filas sin ningún valor. Para cargas de cientos de
+miles de filas el CSV se lee bastante más rápido que el .xlsx.
+
+Werkzeug ya rechaza con 413 las peticiones más grandes que
+MAX_CONTENT_LENGTH; `registrar_limite_carga` convierte ese error en un
+mensaje legible.
+"""
+import codecs
+import csv
+import os
+import posixpath
+import re
+import tempfile
+import zipfile
+from xml.etree import ElementTree
+
+import openpyxl
+from flask import current_app, flash, jsonify, redirect, request, url_for
+from werkzeug.exceptions import RequestEntityTooLarge
+
+FORMATOS = ('.xlsx', '.csv')
+TAMANO_COPIA = 1024 * 1024
+# Bytes del inicio del archivo que se miran: codificación y separador del CSV, dimensión de la hoja del .xlsx.
+MUESTRA = 64 * 1024
+_DIMENSION = re.compile(r'<dimension ref="[A-Z]+\d+:[A-Z]+(\d+)"')
+_NS = {'m': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main',
+       'r': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships',
+       'rel': 'http://schemas.openxmlformats.org/package/2006/relationships'}
+
+
+class ArchivoNoValido(Exception):
+    """La subida falta, no es .xlsx ni .csv o supera MAX_CONTENT_LENGTH."""
+
+
+def _megas(limite):
+    return f'{limite / (1024 * 1024):g} MB'
+
+
+class ArchivoCarga:
+    """Subida guardada en un archivo temporal; se borra con `cerrar` (o al salir del `with`)."""
+
+    def __init__(self, ruta, formato, nombre):
+        self.ruta = ruta
+        self.formato = formato
+        self.nombre = nombre
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def cerrar(self):
+        try:
+            os.remove(self.ruta)
+        except FileNotFoundError:
+            pass
+
+    def filas(self, columnas):
+        """(número de fila, tupla de `columnas` valores) por cada fila con datos, desde la 2."""
+        leer = self._filas_csv if self.formato == '.csv' else self._filas_xlsx
+        for fila, valores in leer():
+            valores = (tuple(valores) + (None,) * columnas)[:columnas]
+            if any(v is not None for v in valores):
+                yield fila, valores
+
+    def total_filas(self):
+        """
+        Estimación de las filas de datos, para mostrar el progreso (None si no se
+        puede saber sin leer el archivo): en .csv cuenta los saltos de línea; en
+        .xlsx usa la dimensión que Excel guarda al inicio de la hoja activa (la
+        misma que lee `filas`).
+        """
+        if self.formato == '.csv':
+            lineas, ultimo = 0, b'\n'
+            with open(self.ruta, 'rb') as f:
+                for bloque in iter(lambda: f.read(TAMANO_COPIA), b''):
+                    lineas += bloque.count(b'\n')
+                    ultimo = bloque[-1:]
+            # La última línea puede no terminar en salto de línea; se descuenta el encabezado.
+            return max(lineas + (ultimo != b'\n') - 1, 0)
+        try:
+            with zipfile.ZipFile(self.ruta) as libro, libro.open(_hoja_activa(libro)) as hoja:
+                dimension = _DIMENSION.search(hoja.read(MUESTRA).decode('utf-8', errors='replace'))
+        except (KeyError, IndexError, zipfile.BadZipFile, ElementTree.ParseError):
+            return None
+        return int(dimension.group(1)) - 1 if dimension else None
+
+    def _filas_xlsx(self):
+        workbook = openpyxl.load_workbook(self.ruta, read_only=True, data_only=True)
+        try:
+            yield from enumerate(workbook.active.iter_rows(min_row=2, values_only=True), start=2)
+        finally:
+            workbook.close()
+
+    def _formato_csv(self):
+        with open(self.ruta, 'rb') as f:
+            muestra = f.read(MUESTRA)
+        try:
+            # Decodificador incremental: un carácter cortado al final de la muestra no es un error.
+            texto = codecs.getincrementaldecoder('utf-8-sig')().decode(muestra, final=False)
+            codificacion = 'utf-8-sig'
+        except UnicodeDecodeError:
+            texto, codificacion = muestra.decode('cp1252', errors='replace'), 'cp1252'
+        try:
+            separador = csv.Sniffer().sniff(texto, delimiters=',;\t').delimiter
+        except csv.Error:
+            separador = ','
+        return codificacion, separador
+
+    def _filas_csv(self):
+        codificacion, separador = self._formato_csv()
+        with open(self.ruta, newline='', encoding=codificacion) as f:
+            lector = csv.reader(f, delimiter=separador)
+            next(lector, None)
+            for fila, valores in enumerate(lector, start=2):
+                yield fila, [v.strip() or None for v in valores]
+
+
+def _hoja_activa(libro):
+    """
+    Ruta dentro del .xlsx de la hoja que openpyxl entrega como `workbook.active`:
+    la de posición activeTab (0 si no está) entre las hojas de xl/workbook.xml.
+    """
+    workbook = ElementTree.fromstring(libro.read('xl/workbook.xml'))
+    vista = workbook.find('m:bookViews/m:workbookView', _NS)
+    activa = int(vista.get('activeTab', 0)) if vista is not None else 0
+    id_relacion = workbook.findall('m:sheets/m:sheet', _NS)[activa].get(f"{{{_NS['r']}}}id")
+    relaciones = ElementTree.fromstring(libro.read('xl/_rels/workbook.xml.rels'))
+    destino = next(r.get('Target') for r in relaciones.findall('rel:Relationship', _NS) if r.get('Id') == id_relacion)
+    # El destino es relativo a xl/ salvo que empiece con '/'.
+    return destino.lstrip('/') if destino.startswith('/') else posixpath.normpath(posixpath.join('xl', destino))
+
+
+def recibir_archivo(file, directorio=None):
+    """
+    Copia la subida `file` (FileStorage de request.files) a un temporal en
+    `directorio` y devuelve su ArchivoCarga. Lanza ArchivoNoValido si falta,
+    si no es .xlsx/.csv o si supera MAX_CONTENT_LENGTH.
+    """
+    if file is None or file.filename == '':
+        raise ArchivoNoValido('No se seleccionó ningún archivo.')
+    formato = os.path.splitext(file.filename)[1].lower()
+    if formato not in FORMATOS:
+        raise ArchivoNoValido('Formato de archivo no válido. Por favor, sube un archivo .xlsx o .csv')
+
+    limite = current_app.config.get('MAX_CONTENT_LENGTH')
+    descriptor, ruta = tempfile.mkstemp(suffix=formato, prefix='carga-', dir=directorio)
+    try:
+        with os.fdopen(descriptor, 'wb') as destino:
+            copiados = 0
+            while bloque := file.stream.read(TAMANO_COPIA):
+                copiados += len(bloque)
+                if limite and copiados > limite:
+                    raise ArchivoNoValido(f'El archivo supera el tamaño máximo permitido ({_megas(limite)}).')
+                destino.write(bloque)
+    except BaseException:
+        os.remove(ruta)
+        raise
+    return ArchivoCarga(ruta, formato, file.filename)
+
+
+def _archivo_demasiado_grande(error):
+    limite = current_app.config.get('MAX_CONTENT_LENGTH')
+    mensaje = (f'El archivo supera el tamaño máximo permitido ({_megas(limite)}).' if limite else
+               'El archivo es demasiado grande.')
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({'error': mensaje}), 413
+    flash(mensaje, 'danger')
+    return redirect(request.referrer or url_for('main.home'))
+
+
+def registrar_limite_carga(app):
+    """
+    Las subidas que superan MAX_CONTENT_LENGTH responden con un mensaje: JSON
+    (413) si la petición lo acepta, o vuelta a la página de origen.
+    """
+    app.register_error_handler(RequestEntityTooLarge, _archivo_demasiado_grande)
@@ -0,0 +1,235 @@
+"""
+Instrumentación por petición: SQL, tiempo de base, filas leídas y render.
+
+Los eventos del Engine (before/after_cursor_execute) suman cada sentencia
+a la petición en curso (`g`), y las señales de plantillas miden el tiempo
+de Jinja. Al terminar la petición se agrega el encabezado Server-Timing
+(db, render, app y total) y se guardan las mediciones por endpoint en una
+ventana deslizante de METRICAS_VENTANA peticiones, de donde /metrics saca
+p50/p95/p99 en formato de texto de Prometheus.
+
+Las métricas son por proceso: con varios workers de gunicorn cada uno
+expone las suyas.
+
+Las filas se toman de `cursor.rowcount`: psycopg2 lo informa en los SELECT
+normales, pero no en los cursores del lado del servidor (`stream_results`).
+Por eso las marcaciones leídas en lotes las suma aparte
+`report_builder.iter_marcaciones` con `registrar_marcaciones`, que además
+las informa en Server-Timing (marcaciones) y en /metrics.
+
+Detector de N+1 (desarrollo y pruebas): con SQL_REPETIDAS_MAX > 0 se cuenta
+cuántas veces se ejecuta cada forma de sentencia (el texto SQL con las
+listas de parámetros colapsadas) dentro de la petición. Si alguna supera el
+umbral se registra una advertencia con las formas culpables; con
+SQL_REPETIDAS_ERROR además se lanza ConsultasRepetidas, que en modo testing
+hace fallar la prueba.
+"""
+import logging
+import re
+import threading
+from collections import Counter, defaultdict, deque
+from time import perf_counter
+
+from flask import g, request, current_app, has_app_context, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+CUANTILES = (0.5, 0.95, 0.99)
+# Nombre de la métrica -> (clave de la medición, descripción).
+MEDICIONES = {
+    'asistencia_request_duration_seconds': ('total', 'Duración total de la petición.'),
+    'asistencia_request_db_seconds': ('db', 'Tiempo en la base de datos por petición.'),
+    'asistencia_request_render_seconds': ('render', 'Tiempo de render de plantillas por petición.'),
+    'asistencia_request_sql_statements': ('sql', 'Sentencias SQL por petición.'),
+    'asistencia_request_rows_fetched': ('filas', 'Filas leídas de la base por petición.'),
+    'asistencia_request_punch_rows': ('marcaciones', 'Marcaciones leídas en lotes por petición.'),
+    'asistencia_request_punch_seconds': ('marcaciones_db', 'Tiempo de carga de marcaciones por petición.'),
+}
+ENDPOINTS_EXCLUIDOS = {'static', 'metricas.metrics'}
+
+log = logging.getLogger(__name__)
+
+# "(%(p_1)s, %(p_2)s)", "(?, ?, ?)" o "(:a, :b)" -> "(?)": un IN con otra cantidad de valores es la misma forma.
+_LISTA_PARAMETROS = re.compile(r'\((?:\s*(?:%\(\w+\)s|\?|:\w+)\s*,?)+\)')
+
+
+class ConsultasRepetidas(Exception):
+    """Una petición repitió la misma forma de consulta más de SQL_REPETIDAS_MAX veces (probable N+1)."""
+
+
+class Metricas:
+    """Ventana deslizante de mediciones por endpoint, más totales acumulados."""
+
+    def __init__(self, ventana):
+        self._lock = threading.Lock()
+        self._ventanas = defaultdict(lambda: deque(maxlen=ventana))
+        self._sumas = defaultdict(float)
+        self._cuentas = defaultdict(int)
+
+    def registrar(self, endpoint, medicion):
+        with self._lock:
+            self._ventanas[endpoint].append(medicion)
+            self._cuentas[endpoint] += 1
+            for clave, valor in medicion.items():
+                self._sumas[endpoint, clave] += valor
+
+    def texto_prometheus(self):
+        with self._lock:
+            ventanas = {endpoint: list(ventana) for endpoint, ventana in self._ventanas.items()}
+            sumas, cuentas = dict(self._sumas), dict(self._cuentas)
+        lineas = []
+        for nombre, (clave, ayuda) in MEDICIONES.items():
+            lineas += [f'# HELP {nombre} {ayuda}', f'# TYPE {nombre} summary']
+            for endpoint in sorted(ventanas):
+                valores = sorted(m[clave] for m in ventanas[endpoint])
+                for q in CUANTILES:
+                    lineas.append(f'{nombre}{{endpoint="{endpoint}",quantile="{q}"}} {_cuantil(valores, q):g}')
+                lineas.append(f'{nombre}_sum{{endpoint="{endpoint}"}} {sumas[endpoint, clave]:g}')
+                lineas.append(f'{nombre}_count{{endpoint="{endpoint}"}} {cuentas[endpoint]}')
+        return '\n'.join(lineas) + '\n'
+
+
+def _cuantil(valores_ordenados, q):
+    """Cuantil por el método del rango más cercano."""
+    if not valores_ordenados:
+        return 0
+    return valores_ordenados[min(len(valores_ordenados) - 1, int(q * len(valores_ordenados)))]
+
+
+# --- MEDICIÓN DE LA PETICIÓN ---
+
+def _medicion():
+    """Contadores de la petición en curso, o None fuera de una petición instrumentada."""
+    return g.get('instrumentacion') if has_app_context() else None
+
+
+def _antes_de_sql(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('instrumentacion_t0', []).append(perf_counter())
+
+
+def _despues_de_sql(conn, cursor, statement, parameters, context, executemany):
+    t0 = conn.info['instrumentacion_t0'].pop()
+    medicion = _medicion()
+    if medicion is None:
+        return
+    medicion['sql'] += 1
+    medicion['db'] += perf_counter() - t0
+    if medicion['formas'] is not None:
+        medicion['formas'][_LISTA_PARAMETROS.sub('(?)', statement)] += 1
+    if cursor.description is not None and cursor.rowcount > 0:
+        medicion['filas'] += cursor.rowcount
+
+
+def _error_de_sql(contexto):
+    if contexto.connection is not None and contexto.connection.info.get('instrumentacion_t0'):
+        contexto.connection.info['instrumentacion_t0'].pop()
+
+
+def registrar_marcaciones(filas, segundos):
+    """Suma a la petición en curso un lote de marcaciones leído por cursor (ver iter_marcaciones)."""
+    medicion = _medicion()
+    if medicion is not None:
+        medicion['filas'] += filas
+        medicion['marcaciones'] += filas
+        medicion['marcaciones_db'] += segundos
+
+
+def _antes_de_render(app, template, context, **extra):
+    medicion = _medicion()
+    if medicion is not None:
+        medicion['render_t0'].append(perf_counter())
+
+
+def _despues_de_render(app, template, context, **extra):
+    medicion = _medicion()
+    if medicion is not None and medicion['render_t0']:
+        t0 = medicion['render_t0'].pop()
+        # Solo el render más externo suma (render_template dentro de otro render no se cuenta dos veces).
+        if not medicion['render_t0']:
+            medicion['render'] += perf_counter() - t0
+
+
+def _iniciar_peticion():
+    g.instrumentacion = {'inicio': perf_counter(), 'sql': 0, 'db': 0.0, 'filas': 0, 'render': 0.0,
+                         'marcaciones': 0, 'marcaciones_db': 0.0, 'render_t0': [], 'formas': Counter() if current_app.config.get('SQL_REPETIDAS_MAX') else None}
+
+
+def _revisar_repetidas(formas):
+    umbral = current_app.config['SQL_REPETIDAS_MAX']
+    repetidas = [(n, forma) for forma, n in formas.most_common() if n > umbral]
+    if not repetidas:
+        return
+    detalle = '; '.join(f'{n}x {" ".join(forma.split())[:200]}' for n, forma in repetidas[:3])
+    mensaje = f'{request.method} {request.path}: consultas repetidas más de {umbral} veces (N+1?): {detalle}'
+    log.warning(mensaje)
+    if current_app.config.get('SQL_REPETIDAS_ERROR'):
+        raise ConsultasRepetidas(mensaje)
+
+
+def _registrar(medicion, endpoint, total):
+    if endpoint not in ENDPOINTS_EXCLUIDOS:
+        current_app.extensions['metricas'].registrar(endpoint, {
+            'total': total, 'db': medicion['db'], 'render': medicion['render'], 'sql': medicion['sql'],
+            'filas': medicion['filas'], 'marcaciones': medicion['marcaciones'],
+            'marcaciones_db': medicion['marcaciones_db']})
+    if medicion['formas']:
+        _revisar_repetidas(medicion['formas'])
+
+
+def _terminar_peticion(response):
+    medicion = g.pop('instrumentacion', None)
+    if medicion is None:
+        return response
+    total = perf_counter() - medicion['inicio']
+    tiempos = [
+        f'db;dur={medicion["db"] * 1000:.1f};desc="{medicion["sql"]} SQL"',
+        f'render;dur={medicion["render"] * 1000:.1f}',
+        f'app;dur={max(0.0, total - medicion["db"] - medicion["render"]) * 1000:.1f}',
+        f'total;dur={total * 1000:.1f}',
+    ]
+    if medicion['marcaciones']:
+        # Incluye la lectura por cursor, que en parte cae fuera de `db` (solo mide el execute).
+        tiempos.insert(1, f'marcaciones;dur={medicion["marcaciones_db"] * 1000:.1f};'
+                          f'desc="{medicion["marcaciones"]} filas"')
+    response.headers['Server-Timing'] = ', '.join(tiempos)
+    _registrar(medicion, request.endpoint or 'sin_ruta', total)
+    return response
+
+
+def medir_flujo(partes):
+    """
+    Instrumenta el cuerpo de una respuesta en streaming (usar dentro de
+    stream_with_context). Lo que se calcula al generar ocurre después de
+    after_request, así que se mide aparte y se registra en /metrics como
+    '<endpoint>:flujo'; el encabezado Server-Timing ya se envió sin ello.
+    """
+    if 'metricas' not in current_app.extensions:
+        yield from partes
+        return
+    _iniciar_peticion()
+    try:
+        yield from partes
+    finally:
+        medicion = g.pop('instrumentacion')
+        _registrar(medicion, f'{request.endpoint or "sin_ruta"}:flujo', perf_counter() - medicion['inicio'])
+
+
+def registrar_instrumentacion(app):
+    """Activa la instrumentación en `app` (si METRICAS_HABILITADAS) y registra /metrics."""
+    if not app.config.get('METRICAS_HABILITADAS', True):
+        return
+    app.extensions['metricas'] = Metricas(app.config.get('METRICAS_VENTANA', 1000))
+
+    # Los listeners del Engine y las señales son globales: se registran una sola vez por proceso.
+    if not event.contains(Engine, 'before_cursor_execute', _antes_de_sql):
+        event.listen(Engine, 'before_cursor_execute', _antes_de_sql)
+        event.listen(Engine, 'after_cursor_execute', _despues_de_sql)
+        event.listen(Engine, 'handle_error', _error_de_sql)
+        before_render_template.connect(_antes_de_render)
+        template_rendered.connect(_despues_de_render)
+
+    app.before_request(_iniciar_peticion)
+    app.after_request(_terminar_peticion)
+
+    from app.routes.metricas import metricas_bp
+    app.register_blueprint(metricas_bp)
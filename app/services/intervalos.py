@@ -0,0 +1,89 @@
+"""
+Índice de intervalos cerrados [inicio, fin] agrupados por clave (p. ej. el
+pasaporte del empleado).
+
+Reemplaza la expansión de cada justificación a una lista de días: las
+consultas "¿este día está cubierto?" y "¿este rango se cruza con alguno?"
+se resuelven con bisect sobre listas ordenadas, sin importar lo largo de
+los rangos.
+"""
+from bisect import bisect_right
+from collections import defaultdict
+
+
+class _Rangos:
+    """Intervalos de una clave, compilados a listas ordenadas al primer uso."""
+    __slots__ = ('pendientes', 'inicios', 'fines_max', 'pos_max', 'datos', 'fusion_inicios', 'fusion_fines')
+
+    def __init__(self):
+        self.pendientes = []
+        self.inicios = None
+
+    def compilar(self):
+        self.pendientes.sort(key=lambda r: (r[0], r[1]))
+        self.inicios = [r[0] for r in self.pendientes]
+        self.datos = [r[2] for r in self.pendientes]
+
+        # Máximo acumulado de los fines (y qué intervalo lo tiene) para buscar cruces.
+        self.fines_max, self.pos_max = [], []
+        for i, (_, fin, _) in enumerate(self.pendientes):
+            if not self.fines_max or fin > self.fines_max[-1]:
+                self.fines_max.append(fin)
+                self.pos_max.append(i)
+            else:
+                self.fines_max.append(self.fines_max[-1])
+                self.pos_max.append(self.pos_max[-1])
+
+        # Rangos fusionados para las consultas de pertenencia.
+        self.fusion_inicios, self.fusion_fines = [], []
+        for inicio, fin, _ in self.pendientes:
+            if self.fusion_fines and inicio <= self.fusion_fines[-1]:
+                self.fusion_fines[-1] = max(self.fusion_fines[-1], fin)
+            else:
+                self.fusion_inicios.append(inicio)
+                self.fusion_fines.append(fin)
+
+
+class IndiceIntervalos:
+    def __init__(self):
+        self._claves = defaultdict(_Rangos)
+
+    def agregar(self, clave, inicio, fin, dato=None):
+        """Agrega el intervalo cerrado [inicio, fin] a `clave`; `dato` se devuelve en `cruce`."""
+        rangos = self._claves[clave]
+        rangos.pendientes.append((inicio, fin, dato))
+        rangos.inicios = None
+
+    def _rangos(self, clave):
+        rangos = self._claves.get(clave)
+        if rangos is None:
+            return None
+        if rangos.inicios is None:
+            rangos.compilar()
+        return rangos
+
+    def contiene(self, clave, valor):
+        """True si algún intervalo de `clave` cubre `valor`."""
+        rangos = self._rangos(clave)
+        if rangos is None:
+            return False
+        i = bisect_right(rangos.fusion_inicios, valor) - 1
+        return i >= 0 and valor <= rangos.fusion_fines[i]
+
+    def cruce(self, clave, inicio, fin):
+        """Dato de un intervalo de `clave` que se cruza con [inicio, fin], o None si no hay ninguno."""
+        rangos = self._rangos(clave)
+        if rangos is None:
+            return None
+        i = bisect_right(rangos.inicios, fin) - 1
+        if i >= 0 and rangos.fines_max[i] >= inicio:
+            return rangos.datos[rangos.pos_max[i]]
+        return None
+
+
+def indice_justificaciones(justificaciones):
+    """Índice por pasaporte de las justificaciones dadas (el dato es la propia justificación)."""
+    indice = IndiceIntervalos()
+    for j in justificaciones:
+        indice.agregar(j.employee_passport, j.date_start, j.date_end, j)
+    return indice
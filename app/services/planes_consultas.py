@@ -0,0 +1,80 @@
+"""
+Verificación de los planes de ejecución de las consultas críticas.
+
+Ejecuta EXPLAIN (FORMAT JSON) de cada consulta con `enable_seqscan = off`
+y exige que el plan use el índice compuesto creado para ella por la
+migración 129cdd8e316c. No basta con que no haya Seq Scan: los índices de
+una sola columna (emp_id, punch_time, employee_passport) ya existían antes
+y el planificador cae en ellos si falta el compuesto. Funciona igual con la
+base vacía o con datos sintéticos/reales (tests/test_planes_consultas.py).
+"""
+from datetime import date, timedelta
+
+from sqlalchemy import text, select
+
+from app import db
+from app.models import Justificaciones
+from app.services.report_builder import SQL_MARCACIONES
+
+TABLAS_VIGILADAS = {'iclock_transaction', 'justificaciones'}
+
+
+def _consultas(dias):
+    hasta = date.today()
+    desde = hasta - timedelta(days=dias)
+    ids = db.session.execute(text('SELECT id FROM personnel_employee ORDER BY id LIMIT 50')).scalars().all()
+    pasaportes = db.session.execute(
+        text('SELECT passport FROM personnel_employee ORDER BY id LIMIT 50')).scalars().all()
+    # Nombre -> (consulta, parámetros, índice que debe aparecer en el plan).
+    return {
+        'Marcaciones del reporte': (SQL_MARCACIONES, {
+            'ids_empleados': ids or [0], 'start_date': desde, 'end_date_plus_one': hasta + timedelta(days=1)},
+            'ix_iclock_transaction_emp_id_punch_time'),
+        'Justificaciones: cruce al crear': (select(Justificaciones).where(
+            Justificaciones.employee_passport == (pasaportes[0] if pasaportes else ''),
+            Justificaciones.anulada == False,
+            Justificaciones.date_start <= hasta,
+            Justificaciones.date_end >= desde), None, 'ix_justificaciones_vigentes'),
+        'Justificaciones del reporte': (select(Justificaciones).where(
+            Justificaciones.employee_passport.in_(pasaportes or ['']),
+            Justificaciones.anulada == False,
+            Justificaciones.date_start <= hasta,
+            Justificaciones.date_end >= desde), None, 'ix_justificaciones_vigentes'),
+    }
+
+
+def _nodos(plan):
+    yield plan
+    for hijo in plan.get('Plans', ()):
+        yield from _nodos(hijo)
+
+
+def verificar_planes(dias=31):
+    """
+    Devuelve una lista con un dict por consulta: nombre, nodos del plan
+    ('Tipo on tabla using índice'), el índice esperado, `falta_indice` (True
+    si el plan no lo usa) y las tablas vigiladas leídas con Seq Scan.
+    """
+    resultados = []
+    conexion = db.session.connection()
+    conexion.exec_driver_sql('SET LOCAL enable_seqscan = off')
+    try:
+        for nombre, (consulta, parametros, indice) in _consultas(dias).items():
+            consulta = consulta.bindparams(**parametros) if parametros else consulta
+            compilada = consulta.compile(dialect=conexion.dialect, compile_kwargs={'render_postcompile': True})
+            plan = conexion.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {compilada}', compilada.params).scalar()
+            nodos = list(_nodos(plan[0]['Plan']))
+            resultados.append({
+                'nombre': nombre,
+                'nodos': [' '.join(filter(None, [n['Node Type'],
+                                                 n.get('Relation Name') and f"on {n['Relation Name']}",
+                                                 n.get('Index Name') and f"using {n['Index Name']}"]))
+                          for n in nodos],
+                'indice': indice,
+                'falta_indice': indice not in {n.get('Index Name') for n in nodos},
+                'secuenciales': sorted({n['Relation Name'] for n in nodos if n['Node Type'] == 'Seq Scan'
+                                        and n.get('Relation Name') in TABLAS_VIGILADAS}),
+            })
+    finally:
+        db.session.rollback()
+    return resultados
@@ -0,0 +1,89 @@
+"""
+Registro diario del reporte de asistencia (un empleado, un día).
+
+Solo guarda valores crudos: enteros (minutos del día para el horario,
+segundos para las duraciones) y referencias a los date/time de las
+marcaciones. Los textos 'HH:MM' se arman al presentar, con los filtros de
+Jinja registrados en create_app y en crear_excel_reporte.
+"""
+NORMAL = 'Normal'
+SABADO_FERIADO = 'Sabado/Feriado'
+
+
+class RegistroDia:
+    __slots__ = ('fecha', 'estado', 'entrada_prog', 'salida_prog', 'tipo_dia_laborable', 'es_feriado_laborable',
+                 'minutos_atraso', 'segundos_trabajados', 'segundos_extras', 'segundos_almuerzo',
+                 'es_falta', 'es_atraso', 'hora_ingreso', 'hora_salida_almuerzo', 'hora_regreso_almuerzo',
+                 'hora_salida_final')
+
+    def __init__(self, fecha, estado, entrada_prog, salida_prog, tipo_dia_laborable=NORMAL,
+                 es_feriado_laborable=False, minutos_atraso=0, segundos_trabajados=0, segundos_extras=0,
+                 segundos_almuerzo=0, es_falta=0, es_atraso=0, hora_ingreso=None, hora_salida_almuerzo=None,
+                 hora_regreso_almuerzo=None, hora_salida_final=None):
+        self.fecha = fecha
+        self.estado = estado
+        self.entrada_prog = entrada_prog  # minutos desde la medianoche
+        self.salida_prog = salida_prog
+        self.tipo_dia_laborable = tipo_dia_laborable
+        self.es_feriado_laborable = es_feriado_laborable
+        self.minutos_atraso = minutos_atraso
+        self.segundos_trabajados = segundos_trabajados
+        self.segundos_extras = segundos_extras
+        self.segundos_almuerzo = segundos_almuerzo
+        self.es_falta = es_falta
+        self.es_atraso = es_atraso
+        self.hora_ingreso = hora_ingreso
+        self.hora_salida_almuerzo = hora_salida_almuerzo
+        self.hora_regreso_almuerzo = hora_regreso_almuerzo
+        self.hora_salida_final = hora_salida_final
+
+    def __eq__(self, otro):
+        if not isinstance(otro, RegistroDia):
+            return NotImplemented
+        return all(getattr(self, campo) == getattr(otro, campo) for campo in self.__slots__)
+
+    def __repr__(self):
+        return f'<RegistroDia {self.fecha} {self.estado}>'
+
+
+# --- PRESENTACIÓN ---
+
+def hhmm(segundos):
+    """Duración en segundos a 'HH:MM' (los segundos sobrantes se descartan)."""
+    h, rem = divmod(segundos, 3600)
+    return f'{h:02d}:{rem // 60:02d}'
+
+
+def minutos_hhmm(minutos):
+    """Minutos desde la medianoche a 'HH:MM'."""
+    return f'{minutos // 60:02d}:{minutos % 60:02d}'
+
+
+def horario_prog(reg):
+    return f'{minutos_hhmm(reg.entrada_prog)} - {minutos_hhmm(reg.salida_prog)}'
+
+
+def marcaciones(reg):
+    if reg.hora_ingreso is None:
+        return '-'
+    texto = reg.hora_ingreso.strftime('%H:%M')
+    if reg.hora_salida_final and reg.hora_salida_final != reg.hora_ingreso:
+        texto += f' - {reg.hora_salida_final.strftime("%H:%M")}'
+    return texto
+
+
+def registro_formateado(reg):
+    """El registro como dict con los textos ya armados (formato anterior de build_report)."""
+    return {
+        'fecha': reg.fecha, 'estado': reg.estado, 'horario_prog': horario_prog(reg),
+        'marcaciones': marcaciones(reg), 'minutos_atraso': reg.minutos_atraso,
+        'tiempo_trabajado': hhmm(reg.segundos_trabajados), 'horas_extras_trabajadas': hhmm(reg.segundos_extras),
+        'es_falta': reg.es_falta, 'es_atraso': reg.es_atraso, 'tipo_dia_laborable': reg.tipo_dia_laborable,
+        'es_feriado_laborable': reg.es_feriado_laborable, 'hora_ingreso': reg.hora_ingreso,
+        'hora_salida_almuerzo': reg.hora_salida_almuerzo, 'hora_regreso_almuerzo': reg.hora_regreso_almuerzo,
+        'hora_salida_final': reg.hora_salida_final, 'tiempo_almuerzo': hhmm(reg.segundos_almuerzo)
+    }
+
+
+# Filtros de plantilla: {{ registro.segundos_trabajados|hhmm }}, {{ registro|horario_prog }}, ...
+FILTROS = {'hhmm': hhmm, 'horario_prog': horario_prog, 'marcaciones': marcaciones}
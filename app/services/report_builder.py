@@ -1,38 +1,263 @@
+import logging
 from collections import defaultdict
-from datetime import timedelta, datetime, time
+from datetime import timedelta, datetime
+from itertools import groupby
+from operator import attrgetter
+from time import perf_counter
+from flask import current_app
 from sqlalchemy import text
+from sqlalchemy.orm import contains_eager
 from app import db
 from app.models import (PersonnelEmployee, PersonnelDepartment, Justificaciones,
                         IClockTransaction, Permisos, GrupoHorariosEspeciales, DepartmentHorariosEspeciales,
                         Grupos, GrupoEmpleados)
+from app.services.calendario_horarios import calendario_horarios
+from app.services.instrumentacion import registrar_marcaciones
+from app.services.intervalos import indice_justificaciones
+from app.services.registro_dia import RegistroDia, NORMAL, SABADO_FERIADO
+from app.services.report_cache import reporte_en_cache, guardar_reporte, generacion_cache, ultimo_transaction_id
 
+log = logging.getLogger(__name__)
 
-def build_report(start_date, end_date, department_id=None):
+
+def build_report(start_date, end_date, department_id=None, engine=None):
     """
     Construye el reporte de asistencia con todos los cálculos detallados,
     incluyendo la identificación de marcaciones de almuerzo.
+
+    Si REPORT_USE_FACTS está activo, los empleados cuyos días ya están en la
+    tabla `asistencia_diaria` se leen desde allí; el resto se calcula con el
+    motor indicado en `engine` o el configurado en REPORT_ENGINE ('python' o
+    'pandas'). Todas las vías devuelven la misma estructura.
+
+    Sin `engine` explícito, el resultado pasa por la caché de reportes
+    (ver report_cache); con `engine` se calcula siempre.
+
+    Como en iter_report, los empleados se calculan por lotes: en memoria solo
+    están las marcaciones del lote en curso, no las de todo el reporte.
+    """
+    usar_cache = engine is None
+    if usar_cache:
+        reporte = reporte_en_cache(start_date, end_date, department_id)
+        if reporte is not None:
+            return reporte
+        # Se toman antes de calcular: marcaciones que lleguen o cambios que se confirmen
+        # durante el cálculo invalidan la entrada (o evitan que se guarde).
+        generacion = generacion_cache()
+        ultimo_id = ultimo_transaction_id()
+
+    empleados_a_reportar = consultar_empleados(department_id)
+    if not empleados_a_reportar: return []
+
+    reporte = list(_calcular_por_lotes(start_date, end_date, empleados_a_reportar, engine, _tamano_lote()))
+    if usar_cache:
+        guardar_reporte(start_date, end_date, department_id, ultimo_id, reporte, generacion)
+    return reporte
+
+
+def iter_report(start_date, end_date, department_id=None, engine=None, lote=None, progreso=None):
     """
-    # --- Consultas a la base de datos (sin cambios) ---
+    Variante de build_report que entrega el reporte empleado por empleado
+    ({'empleado', 'registros', 'resumen'}), en el mismo orden.
+
+    Los empleados se procesan en lotes de `lote` (ver _tamano_lote) y las
+    marcaciones de cada lote se leen con un cursor del lado del servidor, así
+    que la memoria usada no depende del rango de fechas ni del total de
+    empleados. Si el reporte ya está en caché se entrega desde allí.
+    `progreso(procesados, total)`, si se pasa, se llama después de cada empleado.
+    """
+    if engine is None:
+        reporte = reporte_en_cache(start_date, end_date, department_id)
+        if reporte is not None:
+            yield from _con_progreso(reporte, len(reporte), progreso)
+            return
+
+    empleados_a_reportar = consultar_empleados(department_id)
+    if not empleados_a_reportar: return
+
+    items = _calcular_por_lotes(start_date, end_date, empleados_a_reportar, engine, _tamano_lote(lote))
+    yield from _con_progreso(items, len(empleados_a_reportar), progreso)
+
+
+def _tamano_lote(lote=None):
+    """
+    Empleados por lote: `lote` o REPORT_LOTE_EMPLEADOS. Con el cálculo en paralelo
+    activo, al menos REPORT_PARALLEL_MIN_EMPLEADOS por worker, para que cada lote
+    pase el umbral de calcular_reporte y cada proceso reciba un fragmento que
+    compense el envío.
+    """
+    config = current_app.config
+    lote = lote or config.get('REPORT_LOTE_EMPLEADOS', 50)
+    workers = config.get('REPORT_PARALLEL_WORKERS', 0)
+    if workers > 1:
+        lote = max(lote, workers * config.get('REPORT_PARALLEL_MIN_EMPLEADOS', 100))
+    return lote
+
+
+def _calcular_por_lotes(start_date, end_date, empleados, engine, lote):
+    """
+    Items del reporte de `empleados`, calculados de a `lote` empleados (cada lote carga sus propias marcaciones).
+    Las métricas de carga de marcaciones se acumulan para todo el reporte: REPORT_MARCACIONES_MAX_FILAS
+    limita el total y no cada lote.
+    """
+    comunes = cargar_datos_comunes(start_date, end_date)
+    metricas = []
+    for inicio in range(0, len(empleados), lote):
+        yield from calcular_empleados(start_date, end_date, empleados[inicio:inicio + lote], engine, comunes,
+                                      metricas)
+    if metricas:
+        log.info('Marcaciones del reporte %s a %s: %d filas en %d consultas, %.3fs', start_date, end_date,
+                 sum(m['filas'] for m in metricas), len(metricas), sum(m['segundos'] for m in metricas))
+
+
+def _con_progreso(items, total, progreso):
+    if progreso is None:
+        yield from items
+        return
+    for procesados, item in enumerate(items, 1):
+        yield item
+        progreso(procesados, total)
+
+
+def calcular_empleados(start_date, end_date, empleados, engine=None, comunes=None, metricas=None):
+    """
+    Reporte de los empleados indicados, en su mismo orden. Si REPORT_USE_FACTS
+    está activo, los que ya están en `asistencia_diaria` se leen desde allí.
+    `comunes` y `metricas` se pasan a cargar_datos_reporte.
+    """
+    hechos = {}
+    if current_app.config.get('REPORT_USE_FACTS'):
+        from app.services.asistencia_diaria import leer_hechos
+        hechos = leer_hechos(empleados, start_date, end_date)
+
+    pendientes = [e for e in empleados if e.id not in hechos]
+    calculados = {}
+    if pendientes:
+        datos = cargar_datos_reporte(start_date, end_date, pendientes, comunes, metricas)
+        calculados = {item['empleado'].id: item for item in calcular_reporte(datos, engine)}
+
+    return [hechos[e.id] if e.id in hechos else calculados[e.id] for e in empleados]
+
+
+def calcular_reporte(datos, engine=None):
+    """
+    Ejecuta el motor de cálculo indicado (o el configurado) sobre los datos crudos.
+    Con REPORT_PARALLEL_WORKERS > 1 y al menos REPORT_PARALLEL_MIN_EMPLEADOS
+    empleados, el cálculo se reparte en un pool de procesos.
+    """
+    engine = engine or current_app.config.get('REPORT_ENGINE', 'python')
+    workers = current_app.config.get('REPORT_PARALLEL_WORKERS', 0)
+    if workers > 1 and len(datos['empleados']) >= current_app.config.get('REPORT_PARALLEL_MIN_EMPLEADOS', 100):
+        from app.services.report_paralelo import calcular_en_paralelo
+        return calcular_en_paralelo(datos, engine, workers)
+    if engine == 'pandas':
+        from app.services.report_engine_pandas import calcular_reporte_pandas
+        return calcular_reporte_pandas(datos)
+    return calcular_reporte_python(datos)
+
+
+def consultar_empleados(department_id=None):
+    """Empleados de los departamentos permitidos, ordenados por apellido."""
     departamentos_permitidos = ['Callcenter', 'Guayaquil', 'Administracion']
-    query_empleados = PersonnelEmployee.query.join(PersonnelDepartment).filter(
-        PersonnelDepartment.dept_name.in_(departamentos_permitidos)
-    )
+    query_empleados = PersonnelEmployee.query.join(PersonnelEmployee.department).options(
+        contains_eager(PersonnelEmployee.department)
+    ).filter(PersonnelDepartment.dept_name.in_(departamentos_permitidos))
     if department_id and department_id.isdigit():
         query_empleados = query_empleados.filter(PersonnelDepartment.id == int(department_id))
-    empleados_a_reportar = query_empleados.order_by(PersonnelEmployee.last_name).all()
-    if not empleados_a_reportar: return []
+    return query_empleados.order_by(PersonnelEmployee.last_name).all()
+
+
+def dias_del_periodo(start_date, end_date):
+    """Días del período que entran en el reporte (se excluyen los domingos)."""
+    return [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1) if
+            (start_date + timedelta(days=i)).weekday() != 6]
 
+
+def cargar_datos_comunes(start_date, end_date):
+    """Datos del período que no dependen de los empleados: días, horarios especiales y grupos."""
+    grupo_horarios_q = GrupoHorariosEspeciales.query.filter(
+        GrupoHorariosEspeciales.fecha.between(start_date, end_date)).all()
+    depto_horarios_q = DepartmentHorariosEspeciales.query.filter(
+        DepartmentHorariosEspeciales.fecha.between(start_date, end_date)).all()
+
+    empleado_grupo_map = {ge.employee_passport: ge.grupo_id for ge, g in
+                          db.session.query(GrupoEmpleados, Grupos).join(Grupos).all()}
+
+    return {
+        'dias': dias_del_periodo(start_date, end_date), 'grupo_horarios': grupo_horarios_q,
+        'depto_horarios': depto_horarios_q, 'empleado_grupo_map': empleado_grupo_map
+    }
+
+
+SQL_MARCACIONES = text("""
+    SELECT t.emp_id, p.passport, (t.punch_time AT TIME ZONE 'America/Guayaquil')::date AS fecha_local,
+           (t.punch_time AT TIME ZONE 'America/Guayaquil')::time AS hora_local
+    FROM iclock_transaction t JOIN personnel_employee p ON t.emp_id = p.id
+    WHERE t.emp_id = ANY(:ids_empleados) AND t.punch_time >= :start_date AND t.punch_time < :end_date_plus_one
+    ORDER BY t.emp_id, t.punch_time
+""")
+
+
+class LimiteMarcacionesExcedido(Exception):
+    """El reporte pedido supera REPORT_MARCACIONES_MAX_FILAS marcaciones."""
+
+
+def iter_marcaciones(ids_empleados, start_date, end_date, lote_ids=None, max_filas=None, metricas=None):
+    """
+    Marcaciones del rango agrupadas por empleado: genera (emp_id, filas) en orden de emp_id.
+
+    Los ids se consultan en lotes de `lote_ids` (REPORT_MARCACIONES_LOTE_IDS), ordenados por
+    (emp_id, punch_time) y leídos con un cursor del lado del servidor, así que en memoria solo
+    está el lote en curso. Por cada lote se agrega a `metricas` (si se pasa) un dict con empleados,
+    filas y segundos, que también se suma a la instrumentación de la petición en curso. Si el total,
+    contando las filas que ya estaban en `metricas` (lotes anteriores del mismo reporte), supera
+    `max_filas` (REPORT_MARCACIONES_MAX_FILAS, 0 = sin límite) se lanza LimiteMarcacionesExcedido.
+    """
+    config = current_app.config
+    lote_ids = lote_ids or config.get('REPORT_MARCACIONES_LOTE_IDS', 200)
+    max_filas = max_filas if max_filas is not None else config.get('REPORT_MARCACIONES_MAX_FILAS', 0)
+
+    ids_empleados = sorted(ids_empleados)
+    total = sum(m['filas'] for m in metricas) if metricas else 0
+    for inicio in range(0, len(ids_empleados), lote_ids):
+        lote = ids_empleados[inicio:inicio + lote_ids]
+        t0 = perf_counter()
+        filas_lote = 0
+        resultado = db.session.execute(SQL_MARCACIONES, {"ids_empleados": lote, "start_date": start_date,
+                                             "end_date_plus_one": end_date + timedelta(days=1)},
+                                       execution_options={'stream_results': True, 'yield_per': 5000})
+        try:
+            for emp_id, filas in groupby(resultado, key=attrgetter('emp_id')):
+                filas = list(filas)
+                filas_lote += len(filas)
+                if max_filas and total + filas_lote > max_filas:
+                    raise LimiteMarcacionesExcedido(
+                        f'El reporte supera el límite de {max_filas} marcaciones; reduzca el rango de fechas '
+                        f'o filtre por departamento.')
+                yield emp_id, filas
+        finally:
+            resultado.close()
+        total += filas_lote
+        segundos = perf_counter() - t0
+        log.debug('Marcaciones: lote de %d empleados, %d filas en %.3fs', len(lote), filas_lote, segundos)
+        registrar_marcaciones(filas_lote, segundos)
+        if metricas is not None:
+            metricas.append({'empleados': len(lote), 'filas': filas_lote, 'segundos': segundos})
+
+
+def cargar_datos_reporte(start_date, end_date, empleados_a_reportar, comunes=None, metricas=None):
+    """
+    Ejecuta las consultas del reporte para los empleados indicados y devuelve
+    los resultados en crudo, listos para cualquiera de los motores de cálculo.
+    `comunes` permite reutilizar lo de cargar_datos_comunes entre lotes, y
+    `metricas` acumular la carga de marcaciones de todos los lotes de un
+    reporte (ver iter_marcaciones).
+    """
     pasaportes = [e.passport for e in empleados_a_reportar]
     ids_empleados = [e.id for e in empleados_a_reportar]
 
-    sql = text("""
-        SELECT p.passport, (t.punch_time AT TIME ZONE 'America/Guayaquil')::date AS fecha_local,
-               (t.punch_time AT TIME ZONE 'America/Guayaquil')::time AS hora_local
-        FROM iclock_transaction t JOIN personnel_employee p ON t.emp_id = p.id
-        WHERE t.emp_id = ANY(:ids_empleados) AND t.punch_time >= :start_date AND t.punch_time < :end_date_plus_one
-    """)
-    marcaciones_q = db.session.execute(sql, {"ids_empleados": ids_empleados, "start_date": start_date,
-                                             "end_date_plus_one": end_date + timedelta(days=1)}).fetchall()
+    marcaciones_q = [fila for _, filas in iter_marcaciones(ids_empleados, start_date, end_date, metricas=metricas)
+                     for fila in filas]
 
     # Resto de consultas y mapeos...
     justificaciones_q = Justificaciones.query.filter(Justificaciones.employee_passport.in_(pasaportes),
@@ -41,35 +266,36 @@ def build_report(start_date, end_date, department_id=None):
                                                      Justificaciones.date_end >= start_date).all()
     permisos_q = Permisos.query.filter(Permisos.employee_passport.in_(pasaportes),
                                        Permisos.fecha.between(start_date, end_date)).all()
-    grupo_horarios_q = GrupoHorariosEspeciales.query.filter(
-        GrupoHorariosEspeciales.fecha.between(start_date, end_date)).all()
-    depto_horarios_q = DepartmentHorariosEspeciales.query.filter(
-        DepartmentHorariosEspeciales.fecha.between(start_date, end_date)).all()
+    if comunes is None:
+        comunes = cargar_datos_comunes(start_date, end_date)
+
+    return dict(comunes, empleados=empleados_a_reportar, marcaciones=marcaciones_q,
+                justificaciones=justificaciones_q, permisos=permisos_q)
+
+
+def calcular_reporte_python(datos):
+    """
+    Motor de cálculo original: recorre empleado por empleado y día por día.
+    Cada día se devuelve como un RegistroDia con valores crudos.
+    """
+    empleados_a_reportar = datos['empleados']
+    dias_del_periodo = datos['dias']
+    empleado_grupo_map = datos['empleado_grupo_map']
+    marcaciones_q = datos['marcaciones']
+    justificaciones_q = datos['justificaciones']
+    permisos_q = datos['permisos']
+    grupo_horarios_q = datos['grupo_horarios']
+    depto_horarios_q = datos['depto_horarios']
 
-    empleado_grupo_map = {ge.employee_passport: ge.grupo_id for ge, g in
-                          db.session.query(GrupoEmpleados, Grupos).join(Grupos).all()}
     marcaciones_map = defaultdict(lambda: defaultdict(list))
     for m in marcaciones_q: marcaciones_map[m.passport][m.fecha_local.strftime('%Y-%m-%d')].append(m.hora_local)
-    justificaciones_map = defaultdict(list)
-    for j in justificaciones_q:
-        d = j.date_start
-        while d <= j.date_end: justificaciones_map[j.employee_passport].append(d); d += timedelta(days=1)
+    justificaciones_idx = indice_justificaciones(justificaciones_q)
     permisos_map = defaultdict(dict)
     for p in permisos_q: permisos_map[p.employee_passport][p.fecha] = p
 
-    horarios_especiales_map = defaultdict(dict)
-    for dh in depto_horarios_q:
-        horarios_especiales_map[('depto', dh.dept_name, dh.fecha)] = {'extras': dh.horas_extras, 'feriado': dh.feriado,
-                                                                      'entrada': dh.hora_entrada_especial,
-                                                                      'salida': dh.hora_salida_especial}
-    for gh in grupo_horarios_q:
-        horarios_especiales_map[('grupo', gh.grupo_id, gh.fecha)] = {'extras': gh.horas_extras, 'feriado': gh.feriado,
-                                                                     'entrada': gh.hora_entrada_especial,
-                                                                     'salida': gh.hora_salida_especial}
+    calendario = calendario_horarios(dias_del_periodo, grupo_horarios_q, depto_horarios_q)
 
     reporte_final = []
-    dias_del_periodo = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1) if
-                        (start_date + timedelta(days=i)).weekday() != 6]
 
     for empleado in empleados_a_reportar:
         # ✨ DICCIONARIO DE RESUMEN CORREGIDO Y COMPLETO
@@ -84,17 +310,12 @@ def build_report(start_date, end_date, department_id=None):
         }
 
         registros_diarios_emp = []
-        for dia in dias_del_periodo:
-            lunch_duration = timedelta(hours=1 if empleado.department.dept_name != 'Administracion' else 2)
-            grupo_id = empleado_grupo_map.get(empleado.passport)
-
-            regla_depto = horarios_especiales_map.get(('depto', empleado.department.dept_name, dia), {})
-            regla_grupo = horarios_especiales_map.get(('grupo', grupo_id, dia), {})
-
-            horas_extras_aprobadas_int = max(regla_depto.get('extras', 0), regla_grupo.get('extras', 0))
-            es_feriado = regla_depto.get('feriado', False) or regla_grupo.get('feriado', False)
-            horario_entrada_prog = regla_grupo.get('entrada') or regla_depto.get('entrada') or time(8, 0, 0)
-            horario_salida_prog = regla_grupo.get('salida') or regla_depto.get('salida') or time(18, 0, 0)
+        horarios_emp = calendario.para(empleado_grupo_map.get(empleado.passport), empleado.department.dept_name)
+        for dia, horario in zip(dias_del_periodo, horarios_emp):
+            horas_extras_aprobadas_int = horario.extras
+            es_feriado = horario.feriado
+            horario_entrada_prog = horario.entrada
+            horario_salida_prog = horario.salida
 
             permiso_del_dia = permisos_map[empleado.passport].get(dia)
             if permiso_del_dia:
@@ -106,70 +327,56 @@ def build_report(start_date, end_date, department_id=None):
             es_sabado = dia.weekday() == 5
             es_feriado_laborable = es_feriado and horas_extras_aprobadas_int > 0
 
-            tipo_dia_laborable = 'Normal'
+            tipo_dia_laborable = NORMAL
             if es_sabado or es_feriado_laborable:
-                tipo_dia_laborable = 'Sabado/Feriado'
-
-            registro = {
-                'fecha': dia, 'estado': '-',
-                'horario_prog': f"{horario_entrada_prog.strftime('%H:%M')} - {horario_salida_prog.strftime('%H:%M')}",
-                'marcaciones': '-', 'minutos_atraso': 0, 'tiempo_trabajado': '00:00',
-                'horas_extras_trabajadas': '00:00', 'es_falta': 0, 'es_atraso': 0,
-                'tipo_dia_laborable': tipo_dia_laborable, 'es_feriado_laborable': es_feriado_laborable,
-                'hora_ingreso': None, 'hora_salida_almuerzo': None,
-                'hora_regreso_almuerzo': None, 'hora_salida_final': None,
-                'tiempo_almuerzo': '00:00'
-            }
+                tipo_dia_laborable = SABADO_FERIADO
+
+            registro = RegistroDia(dia, '-', horario_entrada_prog.hour * 60 + horario_entrada_prog.minute,
+                                   horario_salida_prog.hour * 60 + horario_salida_prog.minute,
+                                   tipo_dia_laborable, es_feriado_laborable)
 
             if es_feriado and not es_feriado_laborable:
-                registro['estado'] = 'Feriado'
-            elif dia in justificaciones_map[empleado.passport]:
-                registro['estado'] = 'Justificado'
+                registro.estado = 'Feriado'
+            elif justificaciones_idx.contiene(empleado.passport, dia):
+                registro.estado = 'Justificado'
                 resumen['total_faltas_justificadas'] += 1
-            elif sorted(marcaciones_map[empleado.passport][dia.strftime('%Y-%m-%d')]):
+            elif marcaciones_map[empleado.passport][dia.strftime('%Y-%m-%d')]:
                 resumen['total_asistencias'] += 1
                 marcaciones_dia = sorted(marcaciones_map[empleado.passport][dia.strftime('%Y-%m-%d')])
 
-                if len(marcaciones_dia) >= 1: registro['hora_ingreso'] = marcaciones_dia[0]
-                if len(marcaciones_dia) >= 2: registro['hora_salida_final'] = marcaciones_dia[-1]
+                if len(marcaciones_dia) >= 1: registro.hora_ingreso = marcaciones_dia[0]
+                if len(marcaciones_dia) >= 2: registro.hora_salida_final = marcaciones_dia[-1]
                 if len(marcaciones_dia) == 4:
-                    registro['hora_salida_almuerzo'] = marcaciones_dia[1]
-                    registro['hora_regreso_almuerzo'] = marcaciones_dia[2]
+                    registro.hora_salida_almuerzo = marcaciones_dia[1]
+                    registro.hora_regreso_almuerzo = marcaciones_dia[2]
                     almuerzo_delta = datetime.combine(dia, marcaciones_dia[2]) - datetime.combine(dia,
                                                                                                   marcaciones_dia[1])
-                    h_a, rem_a = divmod(int(almuerzo_delta.total_seconds()), 3600)
-                    m_a, _ = divmod(rem_a, 60)
-                    registro['tiempo_almuerzo'] = f'{h_a:02d}:{m_a:02d}'
-
-                entrada_real = registro['hora_ingreso']
-                salida_real = registro['hora_salida_final']
+                    registro.segundos_almuerzo = int(almuerzo_delta.total_seconds())
 
-                if entrada_real:
-                    registro['marcaciones'] = entrada_real.strftime("%H:%M")
-                    if salida_real and salida_real != entrada_real:
-                        registro['marcaciones'] += f' - {salida_real.strftime("%H:%M")}'
+                entrada_real = registro.hora_ingreso
+                salida_real = registro.hora_salida_final
 
                 if entrada_real > hora_limite_entrada:
                     atraso_delta = datetime.combine(dia, entrada_real) - datetime.combine(dia, hora_limite_entrada)
-                    registro['minutos_atraso'] = int(atraso_delta.total_seconds() // 60)
-                    registro['estado'] = 'Atraso';
-                    registro['es_atraso'] = 1
-                    if tipo_dia_laborable == 'Normal':
+                    registro.minutos_atraso = int(atraso_delta.total_seconds() // 60)
+                    registro.estado = 'Atraso'
+                    registro.es_atraso = 1
+                    if tipo_dia_laborable == NORMAL:
                         resumen['total_atrasos_normal'] += 1
-                        resumen['total_minutos_atraso_normal'] += registro['minutos_atraso']
+                        resumen['total_minutos_atraso_normal'] += registro.minutos_atraso
                     else:
                         resumen['total_atrasos_sabfer'] += 1
-                        resumen['total_minutos_atraso_sabfer'] += registro['minutos_atraso']
+                        resumen['total_minutos_atraso_sabfer'] += registro.minutos_atraso
                 else:
-                    registro['estado'] = 'Presente'
+                    registro.estado = 'Presente'
 
-                if permiso_del_dia and registro['estado'] != 'Atraso': registro['estado'] = 'Permiso'
+                if permiso_del_dia and registro.estado != 'Atraso': registro.estado = 'Permiso'
 
                 if len(marcaciones_dia) >= 2:
                     lunch_duration = timedelta()
-                    if registro['hora_salida_almuerzo'] and registro['hora_regreso_almuerzo']:
-                        lunch_duration = datetime.combine(dia, registro['hora_regreso_almuerzo']) - datetime.combine(
-                            dia, registro['hora_salida_almuerzo'])
+                    if registro.hora_salida_almuerzo and registro.hora_regreso_almuerzo:
+                        lunch_duration = datetime.combine(dia, registro.hora_regreso_almuerzo) - datetime.combine(
+                            dia, registro.hora_salida_almuerzo)
 
                     duracion_neta = (datetime.combine(dia, salida_real) - datetime.combine(dia,
                                                                                            entrada_real)) - lunch_duration
@@ -185,30 +392,26 @@ def build_report(start_date, end_date, department_id=None):
 
                     extras_a_reportar_delta = min(extras_reales_delta, timedelta(hours=horas_extras_aprobadas_int))
                     if extras_a_reportar_delta.total_seconds() > 0:
-                        h_e, rem_e = divmod(int(extras_a_reportar_delta.total_seconds()), 3600)
-                        m_e, _ = divmod(rem_e, 60)
-                        registro['horas_extras_trabajadas'] = f'{h_e:02d}:{m_e:02d}'
-                        if tipo_dia_laborable == 'Normal':
+                        registro.segundos_extras = int(extras_a_reportar_delta.total_seconds())
+                        if tipo_dia_laborable == NORMAL:
                             resumen['total_horas_extras_normal'] += extras_a_reportar_delta
                         else:
                             resumen['total_horas_extras_sabfer'] += extras_a_reportar_delta
 
-                    h, rem = divmod(int(duracion_neta.total_seconds()), 3600)
-                    m, _ = divmod(rem, 60)
-                    registro['tiempo_trabajado'] = f'{h:02d}:{m:02d}'
+                    registro.segundos_trabajados = int(duracion_neta.total_seconds())
             else:
                 es_laborable = (dia.weekday() < 5 and not es_feriado) or dia.weekday() == 5 or es_feriado_laborable
                 if es_laborable:
-                    registro['estado'] = 'Falta';
-                    registro['es_falta'] = 1
-                    if tipo_dia_laborable == 'Normal':
+                    registro.estado = 'Falta'
+                    registro.es_falta = 1
+                    if tipo_dia_laborable == NORMAL:
                         resumen['total_faltas_normal'] += 1
                         resumen['total_faltas_injustificadas_normal'] += 1
                     else:
                         resumen['total_faltas_sabfer'] += 1
                         resumen['total_faltas_injustificadas_sabfer'] += 1
                 else:
-                    registro['estado'] = 'Fin de Semana'
+                    registro.estado = 'Fin de Semana'
 
             registros_diarios_emp.append(registro)
 
@@ -0,0 +1,322 @@
+"""
+Caché de reportes de asistencia ya calculados.
+
+La clave es (fecha_desde, fecha_hasta, departamento). Hay dos backends,
+elegidos con REPORT_CACHE_BACKEND:
+
+- 'memoria': LRU dentro del proceso, acotado por cantidad de entradas y
+  por cantidad total de registros diarios. Con varios procesos
+  (REPORT_CACHE_PROCESOS > 1, p. ej. workers de gunicorn) cada uno tiene
+  su LRU, así que además comparten un archivo de generación en
+  REPORT_CACHE_DIR: cualquier invalidación lo reemplaza y los demás
+  procesos, al verlo cambiado, vacían su LRU completo.
+- 'archivo': un archivo pickle por entrada en REPORT_CACHE_DIR, compartido
+  por todos los workers de gunicorn; LRU por fecha de último acceso y
+  acotado por tamaño total en disco.
+
+Cada entrada recuerda el último id de `iclock_transaction` al momento del
+cálculo; si llegaron marcaciones nuevas dentro del rango, la entrada se
+descarta. Los commits que tocan Justificaciones, Permisos, GrupoEmpleados
+u horarios especiales invalidan solo las entradas cuyo rango se cruza.
+"""
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import date, timedelta
+
+from flask import current_app, has_app_context
+from sqlalchemy import text, select, func
+
+from app import db
+from app.models import IClockTransaction
+from app.services.cambios import al_confirmar_cambios
+
+# Se incrementa cuando cambia la estructura de los items del reporte; las entradas de otra versión se ignoran.
+FORMATO = 2
+
+# Versión del empleado que se guarda en la caché (los objetos ORM no sobreviven entre peticiones).
+EmpleadoCache = namedtuple('EmpleadoCache', 'id passport first_name last_name department')
+DepartamentoCache = namedtuple('DepartamentoCache', 'id dept_name')
+
+
+def empleado_plano(e):
+    """Copia picklable de un PersonnelEmployee con su departamento."""
+    departamento = DepartamentoCache(e.department.id, e.department.dept_name) if e.department else None
+    return EmpleadoCache(e.id, e.passport, e.first_name, e.last_name, departamento)
+
+
+def _departamento(department_id):
+    return department_id if department_id and str(department_id).isdigit() else ''
+
+
+def _cruza(desde, hasta, entrada_desde, entrada_hasta):
+    if desde is None:
+        return True
+    return desde <= entrada_hasta and hasta >= entrada_desde
+
+
+def _identidad(ruta):
+    """Identidad del archivo de generación; cambia cada vez que se publica uno nuevo."""
+    if ruta is None:
+        return None
+    try:
+        st = os.stat(ruta)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def _publicar_generacion(ruta):
+    """
+    Reemplaza el archivo de generación (un archivo nuevo, así cambia aunque el
+    reloj no avance) y devuelve su identidad.
+    """
+    directorio = os.path.dirname(ruta)
+    os.makedirs(directorio, exist_ok=True)
+    fd, temporal = tempfile.mkstemp(dir=directorio, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        f.write(f'{os.getpid()} {time.time_ns()}')
+        f.flush()
+        st = os.fstat(f.fileno())
+    os.replace(temporal, ruta)
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+class CacheMemoria:
+    """LRU en memoria del proceso."""
+
+    def __init__(self, max_entradas=32, max_registros=500_000, ruta_generacion=None):
+        self.max_entradas = max_entradas
+        self.max_registros = max_registros
+        self.ruta_generacion = ruta_generacion
+        self._entradas = OrderedDict()
+        self._registros = 0
+        self._generacion = _identidad(ruta_generacion)
+        self._invalidaciones = 0
+        self._lock = threading.Lock()
+
+    def _sincronizar(self):
+        """Vacía el LRU si otro proceso invalidó desde la última vez (llamar con el lock tomado)."""
+        generacion = _identidad(self.ruta_generacion)
+        if generacion != self._generacion:
+            self._entradas.clear()
+            self._registros = 0
+            self._generacion = generacion
+
+    def generacion(self):
+        """Marca que cambia con cada invalidación, propia o de otro proceso (ver `guardar`)."""
+        with self._lock:
+            self._sincronizar()
+            return self._invalidaciones, self._generacion
+
+    def obtener(self, clave):
+        with self._lock:
+            self._sincronizar()
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                self._entradas.move_to_end(clave)
+            return entrada
+
+    def guardar(self, clave, entrada, generacion=None):
+        with self._lock:
+            self._sincronizar()
+            if generacion is not None and generacion != (self._invalidaciones, self._generacion):
+                return False
+            self._quitar(clave)
+            self._entradas[clave] = entrada
+            self._registros += entrada['registros']
+            while self._entradas and (len(self._entradas) > self.max_entradas or
+                                      self._registros > self.max_registros):
+                self._quitar(next(iter(self._entradas)))
+            return True
+
+    def invalidar(self, desde=None, hasta=None):
+        with self._lock:
+            self._invalidaciones += 1
+            if self.ruta_generacion is not None:
+                # Los otros procesos no saben qué rango cambió: vacían todo al ver la generación nueva.
+                self._sincronizar()
+                # Identidad tomada del propio archivo: si otro proceso lo reemplaza después, se nota en _sincronizar.
+                self._generacion = _publicar_generacion(self.ruta_generacion)
+            claves = [c for c in self._entradas if _cruza(desde, hasta, c[0], c[1])]
+            for clave in claves:
+                self._quitar(clave)
+            return len(claves)
+
+    def _quitar(self, clave):
+        entrada = self._entradas.pop(clave, None)
+        if entrada is not None:
+            self._registros -= entrada['registros']
+
+
+class CacheArchivo:
+    """Un archivo por entrada; el nombre codifica la clave para poder invalidar sin abrirlos."""
+
+    def __init__(self, directorio, max_bytes=512 * 1024 * 1024):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self.ruta_generacion = os.path.join(directorio, 'generacion')
+        os.makedirs(directorio, exist_ok=True)
+        if _identidad(self.ruta_generacion) is None:
+            _publicar_generacion(self.ruta_generacion)
+
+    def _ruta(self, clave):
+        desde, hasta, departamento = clave
+        return os.path.join(self.directorio, f"{desde:%Y%m%d}_{hasta:%Y%m%d}_{departamento or 'todos'}.pkl")
+
+    @staticmethod
+    def _rango(nombre):
+        desde, hasta, _ = nombre[:-4].split('_', 2)
+        return date(int(desde[:4]), int(desde[4:6]), int(desde[6:])), date(int(hasta[:4]), int(hasta[4:6]),
+                                                                           int(hasta[6:]))
+
+    def _archivos(self):
+        return [n for n in os.listdir(self.directorio) if n.endswith('.pkl')]
+
+    def obtener(self, clave):
+        ruta = self._ruta(clave)
+        try:
+            with open(ruta, 'rb') as f:
+                entrada = pickle.load(f)
+            os.utime(ruta)  # marca de último uso para el LRU
+            return entrada
+        except FileNotFoundError:
+            return None
+        except (pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+            self._borrar(ruta)
+            return None
+
+    def generacion(self):
+        """Marca que cambia con cada invalidación de cualquier proceso (ver `guardar`)."""
+        return _identidad(self.ruta_generacion)
+
+    def guardar(self, clave, entrada, generacion=None):
+        fd, temporal = tempfile.mkstemp(dir=self.directorio, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(entrada, f, protocol=pickle.HIGHEST_PROTOCOL)
+        if generacion is not None and generacion != self.generacion():
+            self._borrar(temporal)
+            return False
+        ruta = self._ruta(clave)
+        os.replace(temporal, ruta)
+        # Una invalidación que listó el directorio antes del replace no vio el archivo,
+        # pero publicó la generación antes de listar: se nota acá y se deshace.
+        if generacion is not None and generacion != self.generacion():
+            self._borrar(ruta)
+            return False
+        self._recortar()
+        return True
+
+    def invalidar(self, desde=None, hasta=None):
+        _publicar_generacion(self.ruta_generacion)
+        borrados = 0
+        for nombre in self._archivos():
+            if _cruza(desde, hasta, *self._rango(nombre)):
+                borrados += self._borrar(os.path.join(self.directorio, nombre))
+        return borrados
+
+    def _recortar(self):
+        archivos = []
+        for nombre in self._archivos():
+            try:
+                st = os.stat(os.path.join(self.directorio, nombre))
+            except FileNotFoundError:
+                continue
+            archivos.append((st.st_mtime, st.st_size, nombre))
+        total = sum(a[1] for a in archivos)
+        for _, tamano, nombre in sorted(archivos):
+            if total <= self.max_bytes:
+                break
+            self._borrar(os.path.join(self.directorio, nombre))
+            total -= tamano
+
+    @staticmethod
+    def _borrar(ruta):
+        try:
+            os.remove(ruta)
+            return 1
+        except FileNotFoundError:
+            return 0
+
+
+def obtener_cache():
+    """Caché configurada para la app actual (None si REPORT_CACHE_BACKEND = 'ninguno')."""
+    if 'report_cache' not in current_app.extensions:
+        config = current_app.config
+        backend = config.get('REPORT_CACHE_BACKEND', 'memoria')
+        directorio = config.get('REPORT_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'report_cache')
+        if backend == 'archivo':
+            cache = CacheArchivo(directorio, config.get('REPORT_CACHE_MAX_MB', 512) * 1024 * 1024)
+        elif backend == 'memoria':
+            compartida = config.get('REPORT_CACHE_PROCESOS', 1) > 1
+            cache = CacheMemoria(config.get('REPORT_CACHE_MAX_ENTRADAS', 32),
+                                 config.get('REPORT_CACHE_MAX_REGISTROS', 500_000),
+                                 os.path.join(directorio, 'generacion') if compartida else None)
+        else:
+            cache = None
+        current_app.extensions['report_cache'] = cache
+    return current_app.extensions['report_cache']
+
+
+def ultimo_transaction_id():
+    return db.session.execute(select(func.coalesce(func.max(IClockTransaction.id), 0))).scalar()
+
+
+def _hay_marcaciones_nuevas(start_date, end_date, ultimo_id):
+    sql = text("""
+        SELECT EXISTS (SELECT 1 FROM iclock_transaction t WHERE t.id > :ultimo_id
+                       AND t.punch_time >= :start_date AND t.punch_time < :end_date_plus_one)
+    """)
+    return db.session.execute(sql, {'ultimo_id': ultimo_id, 'start_date': start_date,
+                                    'end_date_plus_one': end_date + timedelta(days=1)}).scalar()
+
+
+def reporte_en_cache(start_date, end_date, department_id=None):
+    """Devuelve el reporte guardado para la clave, o None si no existe o ya no es válido."""
+    cache = obtener_cache()
+    if cache is None:
+        return None
+    entrada = cache.obtener((start_date, end_date, _departamento(department_id)))
+    if entrada is None or entrada.get('formato') != FORMATO or _hay_marcaciones_nuevas(start_date, end_date, entrada['ultimo_transaction_id']):
+        return None
+    return entrada['reporte']
+
+
+def generacion_cache():
+    """
+    Marca de invalidaciones de la caché, a tomar antes de calcular un reporte
+    y pasar a `guardar_reporte` (None si no hay caché).
+    """
+    cache = obtener_cache()
+    return cache.generacion() if cache is not None else None
+
+
+def guardar_reporte(start_date, end_date, department_id, ultimo_id, reporte, generacion=None):
+    """
+    Guarda el reporte calculado. Con `generacion` (de `generacion_cache`) no se
+    guarda si hubo invalidaciones desde entonces: un cambio confirmado durante
+    el cálculo ya invalidó antes de que la entrada existiera.
+    """
+    cache = obtener_cache()
+    if cache is None:
+        return
+    copia = [{'empleado': empleado_plano(item['empleado']), 'registros': item['registros'],
+              'resumen': item['resumen']} for item in reporte]
+    cache.guardar((start_date, end_date, _departamento(department_id)), {
+        'formato': FORMATO, 'ultimo_transaction_id': ultimo_id, 'reporte': copia,
+        'registros': sum(len(item['registros']) for item in copia)
+    }, generacion)
+
+
+@al_confirmar_cambios
+def invalidar_por_cambios(cambios):
+    if not has_app_context():
+        return
+    cache = obtener_cache()
+    if cache is None:
+        return
+    for cambio in cambios:
+        cache.invalidar(cambio.desde, cambio.hasta)
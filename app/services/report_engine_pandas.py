@@ -0,0 +1,249 @@
+"""
+Motor vectorizado (pandas/NumPy) del reporte de asistencia.
+
+Recibe los mismos datos crudos que el motor original (ver
+`report_builder.cargar_datos_reporte`) y calcula la matriz completa
+empleado x día con operaciones por columna. Devuelve exactamente la misma
+estructura `reporte_final` y los mismos valores que `calcular_reporte_python`.
+
+Todas las horas se manejan como enteros de microsegundos desde la medianoche,
+de modo que las comparaciones y restas coinciden con las de `datetime.time`.
+"""
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from app.services.registro_dia import RegistroDia, NORMAL, SABADO_FERIADO
+
+US_SEGUNDO = 1_000_000
+US_MINUTO = 60 * US_SEGUNDO
+US_HORA = 60 * US_MINUTO
+US_DIA = 24 * US_HORA
+
+ENTRADA_DEFECTO_US = 8 * US_HORA
+SALIDA_DEFECTO_US = 18 * US_HORA
+TOLERANCIA_ATRASO_US = 5 * US_MINUTO
+
+def _time_a_us(t):
+    if t is None:
+        return np.nan
+    return ((t.hour * 60 + t.minute) * 60 + t.second) * US_SEGUNDO + t.microsecond
+
+
+def _resumen_vacio():
+    return {
+        'total_asistencias': 0,
+        'total_atrasos_normal': 0, 'total_atrasos_sabfer': 0,
+        'total_minutos_atraso_normal': 0, 'total_minutos_atraso_sabfer': 0,
+        'total_faltas_normal': 0, 'total_faltas_sabfer': 0,
+        'total_faltas_injustificadas_normal': 0, 'total_faltas_injustificadas_sabfer': 0,
+        'total_faltas_justificadas': 0,
+        'total_horas_extras_normal': timedelta(), 'total_horas_extras_sabfer': timedelta()
+    }
+
+
+def _reglas_df(filas, clave, dia_idx):
+    """DataFrame de horarios especiales (una fila por clave y día; la última gana, como en el dict original)."""
+    df = pd.DataFrame.from_records(
+        [(getattr(h, clave), dia_idx.get(h.fecha, -1), h.horas_extras, bool(h.feriado),
+          _time_a_us(h.hora_entrada_especial), _time_a_us(h.hora_salida_especial)) for h in filas],
+        columns=[clave, 'dia', 'extras', 'feriado', 'entrada', 'salida'])
+    df = df[df['dia'] >= 0].drop_duplicates([clave, 'dia'], keep='last')
+    df['extras'] = df['extras'].fillna(0).astype('int64')
+    return df
+
+
+def _marcaciones_df(marcaciones, dia_idx):
+    """Punches ordenados por empleado/día/hora con su posición dentro del día."""
+    df = pd.DataFrame.from_records(
+        [(m.passport, dia_idx.get(m.fecha_local, -1), _time_a_us(m.hora_local), m.hora_local)
+         for m in marcaciones],
+        columns=['passport', 'dia', 'hora_us', 'hora'])
+    df = df[df['dia'] >= 0]
+    df = df.sort_values(['passport', 'dia', 'hora_us'], kind='stable')
+    df['pos'] = df.groupby(['passport', 'dia']).cumcount()
+    return df
+
+
+def _justificados_df(justificaciones, dias_ord):
+    """Expande cada justificación a los índices de día del período que cubre (sin bucles por día)."""
+    if not justificaciones:
+        return pd.DataFrame({'passport': pd.Series(dtype=object), 'dia': pd.Series(dtype='int64')})
+    pasaportes = np.array([j.employee_passport for j in justificaciones], dtype=object)
+    ini = np.searchsorted(dias_ord, [j.date_start.toordinal() for j in justificaciones], side='left')
+    fin = np.searchsorted(dias_ord, [j.date_end.toordinal() for j in justificaciones], side='right')
+    largos = np.maximum(fin - ini, 0)
+    total = int(largos.sum())
+    offsets = np.arange(total) - np.repeat(np.cumsum(largos) - largos, largos)
+    df = pd.DataFrame({'passport': np.repeat(pasaportes, largos), 'dia': np.repeat(ini, largos) + offsets})
+    return df.drop_duplicates()
+
+
+def _pick(grid, marc, pos, columnas):
+    """Trae al grid la marcación en la posición `pos` de cada empleado/día."""
+    sel = marc.loc[marc['pos'] == pos, ['passport', 'dia'] + columnas]
+    sel = sel.rename(columns={c: f'{c}_{pos}' for c in columnas})
+    return grid.merge(sel, how='left', on=['passport', 'dia'])
+
+
+def calcular_reporte_pandas(datos):
+    """Motor vectorizado: calcula todos los empleado-día como operaciones por columna."""
+    empleados = datos['empleados']
+    dias = datos['dias']
+    n_emp, n_dias = len(empleados), len(dias)
+    if not n_dias:
+        return [{'empleado': e, 'registros': [], 'resumen': _resumen_vacio()} for e in empleados]
+
+    dia_idx = {d: i for i, d in enumerate(dias)}
+    dias_ord = np.array([d.toordinal() for d in dias])
+    weekday = np.array([d.weekday() for d in dias])
+
+    # --- 1. GRID EMPLEADO x DÍA ---
+    emp_df = pd.DataFrame({
+        'passport': [e.passport for e in empleados],
+        'dept_name': [e.department.dept_name for e in empleados],
+        'grupo_id': [datos['empleado_grupo_map'].get(e.passport, -1) for e in empleados],
+    })
+    emp_df['grupo_id'] = emp_df['grupo_id'].fillna(-1).astype('int64')
+    emp = np.repeat(np.arange(n_emp), n_dias)
+    grid = emp_df.iloc[emp].reset_index(drop=True)
+    grid['dia'] = np.tile(np.arange(n_dias), n_emp)
+
+    # --- 2. REGLAS DE HORARIO, PERMISOS Y JUSTIFICACIONES ---
+    depto = _reglas_df(datos['depto_horarios'], 'dept_name', dia_idx)
+    grupo = _reglas_df(datos['grupo_horarios'], 'grupo_id', dia_idx)
+    grupo['grupo_id'] = grupo['grupo_id'].astype('int64')
+    grid = grid.merge(depto.add_prefix('d_').rename(columns={'d_dept_name': 'dept_name', 'd_dia': 'dia'}),
+                      how='left', on=['dept_name', 'dia'])
+    grid = grid.merge(grupo.add_prefix('g_').rename(columns={'g_grupo_id': 'grupo_id', 'g_dia': 'dia'}),
+                      how='left', on=['grupo_id', 'dia'])
+
+    permisos = pd.DataFrame.from_records(
+        [(p.employee_passport, dia_idx.get(p.fecha, -1), _time_a_us(p.hora_desde), _time_a_us(p.hora_hasta))
+         for p in datos['permisos']],
+        columns=['passport', 'dia', 'p_desde', 'p_hasta'])
+    permisos = permisos[permisos['dia'] >= 0].drop_duplicates(['passport', 'dia'], keep='last')
+    grid = grid.merge(permisos, how='left', on=['passport', 'dia'])
+
+    justificados = _justificados_df(datos['justificaciones'], dias_ord)
+    justificados['justificado'] = True
+    grid = grid.merge(justificados, how='left', on=['passport', 'dia'])
+
+    # --- 3. MARCACIONES (1ª, 2ª, 3ª y última del día) ---
+    marc = _marcaciones_df(datos['marcaciones'], dia_idx)
+    conteo = marc.groupby(['passport', 'dia']).size().rename('n').reset_index()
+    ultima = marc.drop_duplicates(['passport', 'dia'], keep='last')[['passport', 'dia', 'hora_us', 'hora']]
+    ultima = ultima.rename(columns={'hora_us': 'hora_us_ult', 'hora': 'hora_ult'})
+    grid = grid.merge(conteo, how='left', on=['passport', 'dia'])
+    grid = grid.merge(ultima, how='left', on=['passport', 'dia'])
+    for pos in (0, 1, 2):
+        grid = _pick(grid, marc, pos, ['hora_us', 'hora'])
+
+    # --- 4. CÁLCULOS POR COLUMNA ---
+    dia = grid['dia'].to_numpy()
+    es_sabado = weekday[dia] == 5
+    extras_h = np.maximum(grid['d_extras'].fillna(0).to_numpy(dtype='int64'),
+                          grid['g_extras'].fillna(0).to_numpy(dtype='int64'))
+    es_feriado = grid['d_feriado'].fillna(False).to_numpy(dtype=bool) | \
+        grid['g_feriado'].fillna(False).to_numpy(dtype=bool)
+
+    g_ent, d_ent = grid['g_entrada'].to_numpy(dtype=float), grid['d_entrada'].to_numpy(dtype=float)
+    g_sal, d_sal = grid['g_salida'].to_numpy(dtype=float), grid['d_salida'].to_numpy(dtype=float)
+    entrada_prog = np.where(~np.isnan(g_ent), g_ent, np.where(~np.isnan(d_ent), d_ent, ENTRADA_DEFECTO_US))
+    salida_prog = np.where(~np.isnan(g_sal), g_sal, np.where(~np.isnan(d_sal), d_sal, SALIDA_DEFECTO_US))
+
+    p_desde, p_hasta = grid['p_desde'].to_numpy(dtype=float), grid['p_hasta'].to_numpy(dtype=float)
+    tiene_permiso = ~np.isnan(p_desde)
+    entrada_prog_orig = entrada_prog
+    entrada_prog = np.where(tiene_permiso & (p_desde <= entrada_prog_orig), p_hasta, entrada_prog_orig)
+    salida_prog = np.where(tiene_permiso & (p_hasta >= salida_prog), p_desde, salida_prog)
+    entrada_prog = entrada_prog.astype('int64')
+    salida_prog = salida_prog.astype('int64')
+    hora_limite = (entrada_prog + TOLERANCIA_ATRASO_US) % US_DIA
+
+    es_feriado_laborable = es_feriado & (extras_h > 0)
+    es_sabfer = es_sabado | es_feriado_laborable
+    es_normal = ~es_sabfer
+
+    n = grid['n'].fillna(0).to_numpy(dtype='int64')
+    es_feriado_libre = es_feriado & ~es_feriado_laborable
+    es_justificado = ~es_feriado_libre & grid['justificado'].fillna(False).to_numpy(dtype=bool)
+    asistio = ~es_feriado_libre & ~es_justificado & (n > 0)
+    sin_marcas = ~es_feriado_libre & ~es_justificado & (n == 0)
+    es_laborable = ((weekday[dia] < 5) & ~es_feriado) | (weekday[dia] == 5) | es_feriado_laborable
+    es_falta = sin_marcas & es_laborable
+
+    ingreso = grid['hora_us_0'].fillna(0).to_numpy(dtype='int64')
+    ultima_us = grid['hora_us_ult'].fillna(0).to_numpy(dtype='int64')
+    con_salida = asistio & (n >= 2)
+    con_almuerzo = asistio & (n == 4)
+    almuerzo = np.where(con_almuerzo,
+                        grid['hora_us_2'].fillna(0).to_numpy(dtype='int64') -
+                        grid['hora_us_1'].fillna(0).to_numpy(dtype='int64'), 0)
+
+    es_atraso = asistio & (ingreso > hora_limite)
+    minutos_atraso = np.where(es_atraso, (ingreso - hora_limite) // US_MINUTO, 0)
+
+    neta = np.where(con_salida, np.maximum((ultima_us - ingreso) - almuerzo, 0), 0)
+    extras_reales = np.where(es_sabfer, neta, np.where(ultima_us > salida_prog, ultima_us - salida_prog, 0))
+    extras_reportar = np.where(con_salida, np.minimum(extras_reales, extras_h * US_HORA), 0)
+    extras_reportar = np.where(extras_reportar > 0, extras_reportar, 0)
+
+    estado = np.full(len(grid), '-', dtype=object)
+    estado[es_feriado_libre] = 'Feriado'
+    estado[es_justificado] = 'Justificado'
+    estado[asistio] = 'Presente'
+    estado[asistio & tiene_permiso] = 'Permiso'
+    estado[es_atraso] = 'Atraso'
+    estado[es_falta] = 'Falta'
+    estado[sin_marcas & ~es_laborable] = 'Fin de Semana'
+
+    tipo_dia = np.where(es_sabfer, SABADO_FERIADO, NORMAL).astype(object)
+
+    def _horas(columna, mascara):
+        valores = grid[columna].to_numpy(dtype=object)
+        return np.where(mascara, valores, None)
+
+    hora_ingreso = _horas('hora_0', asistio)
+    hora_salida_final = _horas('hora_ult', con_salida)
+    hora_salida_almuerzo = _horas('hora_1', con_almuerzo)
+    hora_regreso_almuerzo = _horas('hora_2', con_almuerzo)
+
+    # --- 5. RESUMEN POR EMPLEADO (suma sobre el eje de días) ---
+    def _por_emp(valores):
+        return np.asarray(valores, dtype='int64').reshape(n_emp, n_dias).sum(axis=1).tolist()
+
+    atraso_normal, atraso_sabfer = es_atraso & es_normal, es_atraso & es_sabfer
+    falta_normal, falta_sabfer = es_falta & es_normal, es_falta & es_sabfer
+    tot = {
+        'total_asistencias': _por_emp(asistio),
+        'total_atrasos_normal': _por_emp(atraso_normal), 'total_atrasos_sabfer': _por_emp(atraso_sabfer),
+        'total_minutos_atraso_normal': _por_emp(np.where(atraso_normal, minutos_atraso, 0)),
+        'total_minutos_atraso_sabfer': _por_emp(np.where(atraso_sabfer, minutos_atraso, 0)),
+        'total_faltas_normal': _por_emp(falta_normal), 'total_faltas_sabfer': _por_emp(falta_sabfer),
+        'total_faltas_injustificadas_normal': _por_emp(falta_normal),
+        'total_faltas_injustificadas_sabfer': _por_emp(falta_sabfer),
+        'total_faltas_justificadas': _por_emp(es_justificado),
+    }
+    extras_normal = _por_emp(np.where(es_normal, extras_reportar, 0))
+    extras_sabfer = _por_emp(np.where(es_sabfer, extras_reportar, 0))
+
+    # --- 6. ARMADO DE LA ESTRUCTURA reporte_final ---
+    columnas = zip(
+        estado.tolist(), (entrada_prog // US_MINUTO).tolist(), (salida_prog // US_MINUTO).tolist(),
+        tipo_dia.tolist(), es_feriado_laborable.tolist(), minutos_atraso.tolist(), (neta // US_SEGUNDO).tolist(),
+        (extras_reportar // US_SEGUNDO).tolist(), (almuerzo // US_SEGUNDO).tolist(),
+        es_falta.astype(int).tolist(), es_atraso.astype(int).tolist(), hora_ingreso.tolist(),
+        hora_salida_almuerzo.tolist(), hora_regreso_almuerzo.tolist(), hora_salida_final.tolist()
+    )
+
+    reporte_final = []
+    for i, empleado in enumerate(empleados):
+        registros = [RegistroDia(fecha, *valores) for fecha, valores in zip(dias, columnas)]
+        resumen = {clave: valores[i] for clave, valores in tot.items()}
+        resumen['total_horas_extras_normal'] = timedelta(microseconds=extras_normal[i])
+        resumen['total_horas_extras_sabfer'] = timedelta(microseconds=extras_sabfer[i])
+        reporte_final.append({'empleado': empleado, 'registros': registros, 'resumen': resumen})
+
+    return reporte_final
@@ -0,0 +1,127 @@
+"""
+Cálculo del reporte repartido en un pool de procesos.
+
+Los datos crudos (objetos ORM y filas de SQLAlchemy) se copian a
+namedtuples para poder enviarlos a los procesos hijos, y cada fragmento
+lleva solo las marcaciones, justificaciones y permisos de sus empleados.
+Los fragmentos son contiguos, así que al unirlos se conserva el orden por
+apellido de `consultar_empleados`. Las marcaciones (el grueso de los datos)
+viajan como enteros y se reconstruyen en el hijo, porque serializar miles
+de objetos date/time en el proceso padre costaba más que el cálculo.
+"""
+import logging
+from collections import namedtuple, defaultdict
+from datetime import date, time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from app.services.report_cache import empleado_plano
+
+Marcacion = namedtuple('Marcacion', 'passport fecha_local hora_local')
+Justificacion = namedtuple('Justificacion', 'employee_passport date_start date_end')
+Permiso = namedtuple('Permiso', 'employee_passport fecha hora_desde hora_hasta')
+HorarioGrupo = namedtuple('HorarioGrupo',
+                          'grupo_id fecha hora_entrada_especial hora_salida_especial horas_extras feriado')
+HorarioDepto = namedtuple('HorarioDepto',
+                          'dept_name fecha hora_entrada_especial hora_salida_especial horas_extras feriado')
+
+log = logging.getLogger(__name__)
+
+# Un pool por proceso (cada worker de gunicorn tiene el suyo), creado al primer uso.
+_pool = None
+_pool_workers = 0
+
+
+def _obtener_pool(workers):
+    global _pool, _pool_workers
+    if _pool is None or _pool_workers != workers:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        _pool = ProcessPoolExecutor(max_workers=workers)
+        _pool_workers = workers
+    return _pool
+
+
+def _horarios_planos(horarios, tipo, clave):
+    return [tipo(getattr(h, clave), h.fecha, h.hora_entrada_especial, h.hora_salida_especial, h.horas_extras,
+                 h.feriado) for h in horarios]
+
+
+def _marcaciones_compactas(marcaciones):
+    """(pasaporte, ordinal de la fecha, microsegundos del día) por marcación."""
+    return [(m.passport, m.fecha_local.toordinal(),
+             ((m.hora_local.hour * 60 + m.hora_local.minute) * 60 + m.hora_local.second) * 1_000_000
+             + m.hora_local.microsecond) for m in marcaciones]
+
+
+def _marcaciones_expandidas(compactas):
+    marcaciones = []
+    for passport, ordinal, us in compactas:
+        s, us = divmod(us, 1_000_000)
+        m, s = divmod(s, 60)
+        h, m = divmod(m, 60)
+        marcaciones.append(Marcacion(passport, date.fromordinal(ordinal), time(h, m, s, us)))
+    return marcaciones
+
+
+def _fragmentos(datos, partes):
+    """Divide `datos` en `partes` fragmentos contiguos de empleados, ya en forma picklable."""
+    marcaciones, justificaciones, permisos = defaultdict(list), defaultdict(list), defaultdict(list)
+    for m in _marcaciones_compactas(datos['marcaciones']):
+        marcaciones[m[0]].append(m)
+    for j in datos['justificaciones']:
+        justificaciones[j.employee_passport].append(Justificacion(j.employee_passport, j.date_start, j.date_end))
+    for p in datos['permisos']:
+        permisos[p.employee_passport].append(Permiso(p.employee_passport, p.fecha, p.hora_desde, p.hora_hasta))
+
+    comunes = {
+        'dias': datos['dias'],
+        'grupo_horarios': _horarios_planos(datos['grupo_horarios'], HorarioGrupo, 'grupo_id'),
+        'depto_horarios': _horarios_planos(datos['depto_horarios'], HorarioDepto, 'dept_name'),
+    }
+    empleados = datos['empleados']
+    tamano = -(-len(empleados) // partes)
+    for inicio in range(0, len(empleados), tamano):
+        fragmento = empleados[inicio:inicio + tamano]
+        pasaportes = [e.passport for e in fragmento]
+        yield dict(comunes,
+                   empleados=[empleado_plano(e) for e in fragmento],
+                   marcaciones=[m for pas in pasaportes for m in marcaciones.get(pas, ())],
+                   justificaciones=[j for pas in pasaportes for j in justificaciones.get(pas, ())],
+                   permisos=[p for pas in pasaportes for p in permisos.get(pas, ())],
+                   empleado_grupo_map={pas: datos['empleado_grupo_map'][pas] for pas in pasaportes
+                                       if pas in datos['empleado_grupo_map']})
+
+
+def _calcular_fragmento(engine, datos):
+    # Se ejecuta en el proceso hijo: no hay contexto de aplicación.
+    datos = dict(datos, marcaciones=_marcaciones_expandidas(datos['marcaciones']))
+    if engine == 'pandas':
+        from app.services.report_engine_pandas import calcular_reporte_pandas
+        return calcular_reporte_pandas(datos)
+    from app.services.report_builder import calcular_reporte_python
+    return calcular_reporte_python(datos)
+
+
+def calcular_en_paralelo(datos, engine, workers):
+    """
+    Calcula el reporte con `workers` procesos. El resultado es el mismo que
+    el del motor en serie, con los objetos de empleado originales.
+    """
+    global _pool
+    originales = {e.id: e for e in datos['empleados']}
+    fragmentos = list(_fragmentos(datos, workers))
+    try:
+        pool = _obtener_pool(workers)
+        resultados = list(pool.map(_calcular_fragmento, [engine] * len(fragmentos), fragmentos))
+    except BrokenProcessPool:
+        log.exception("Pool de procesos del reporte caído; se calcula en serie.")
+        _pool = None
+        resultados = [_calcular_fragmento(engine, fragmento) for fragmento in fragmentos]
+
+    reporte = []
+    for resultado in resultados:
+        for item in resultado:
+            item['empleado'] = originales[item['empleado'].id]
+            reporte.append(item)
+    return reporte
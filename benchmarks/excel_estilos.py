@@ -0,0 +1,73 @@
+"""
+Benchmark de los estilos del Excel del reporte: 'celdas' (borde, cebra y
+resaltado aplicados a cada celda) contra 'tabla' (estilo de tabla más
+formato condicional en la columna Estado), cada uno con solo la Matriz
+de Trabajo y con todas las hojas.
+
+Genera datos sintéticos (sin base de datos), calcula el reporte con el
+motor python y mide, para cada combinación, el tiempo de
+crear_excel_reporte (mediana de --repeticiones), el pico de memoria y el
+tamaño del archivo.
+
+    python -m benchmarks.excel_estilos --empleados 400 --dias 31
+"""
+import argparse
+import gc
+import statistics
+import tracemalloc
+from time import perf_counter
+
+from app.services.excel_builder import crear_excel_reporte, HOJAS
+from app.services.report_builder import calcular_reporte_python
+from benchmarks.memoria_registros import datos_sinteticos
+
+MODOS = ('celdas', 'tabla')
+VARIANTES = {'trabajo': ('trabajo',), 'todas': HOJAS}
+
+
+def medir(reporte, params, estilos, hojas, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        gc.collect()
+        t0 = perf_counter()
+        archivo = crear_excel_reporte(reporte, params, estilos, hojas)
+        tiempos.append(perf_counter() - t0)
+        tamano = len(archivo.read())
+        archivo.close()
+    gc.collect()
+    tracemalloc.start()
+    crear_excel_reporte(reporte, params, estilos, hojas).close()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(tiempos), pico, tamano
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--empleados', type=int, default=200)
+    parser.add_argument('--dias', type=int, default=31)
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    datos = datos_sinteticos(args.empleados, args.dias)
+    reporte = calcular_reporte_python(datos)
+    n = sum(len(item['registros']) for item in reporte)
+    params = {'fecha_desde': datos['dias'][0], 'fecha_hasta': datos['dias'][-1]}
+
+    print(f'{args.empleados} empleados x {len(datos["dias"])} días = {n} filas')
+    print(f'{"":18}{"mediana s":>12}{"pico MiB":>10}{"KiB":>10}')
+    resultados = {}
+    for modo in MODOS:
+        for variante, hojas in VARIANTES.items():
+            segundos, pico, tamano = resultados[modo, variante] = medir(reporte, params, modo, hojas,
+                                                                        args.repeticiones)
+            print(f'{modo + " " + variante:18}{segundos:12.3f}{pico / 2 ** 20:10.1f}{tamano / 1024:10.0f}')
+    celdas, tabla = resultados['celdas', 'trabajo'], resultados['tabla', 'trabajo']
+    print(f'tabla / celdas: tiempo {tabla[0] / celdas[0]:.2f}x, tamaño {tabla[2] / celdas[2]:.2f}x')
+    for modo in MODOS:
+        una, todas = resultados[modo, 'trabajo'], resultados[modo, 'todas']
+        print(f'{modo}, todas / trabajo: tiempo {todas[0] / una[0]:.2f}x, tamaño {todas[2] / una[2]:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark de memoria de los registros diarios del reporte.
+
+Genera datos sintéticos (sin base de datos), calcula el reporte con el
+motor python y compara la memoria retenida y la cantidad de bloques
+asignados de los RegistroDia contra el formato anterior (dict de 16
+claves con los textos 'HH:MM' ya armados). La fila del dict cuenta solo
+los dicts y sus textos: las horas de las marcaciones se comparten con los
+RegistroDia, así que la comparación favorece al formato anterior.
+
+    python -m benchmarks.memoria_registros --empleados 400 --dias 365
+"""
+import argparse
+import gc
+import random
+import tracemalloc
+from collections import namedtuple
+from datetime import date, time, timedelta
+
+from app.services.report_builder import calcular_reporte_python, dias_del_periodo
+from app.services.registro_dia import registro_formateado
+
+Departamento = namedtuple('Departamento', 'id dept_name')
+Empleado = namedtuple('Empleado', 'id passport first_name last_name department')
+Marcacion = namedtuple('Marcacion', 'passport fecha_local hora_local')
+
+
+def datos_sinteticos(n_empleados, n_dias, semilla=0):
+    rnd = random.Random(semilla)
+    departamentos = [Departamento(i, n) for i, n in enumerate(['Callcenter', 'Guayaquil', 'Administracion'])]
+    empleados = [Empleado(i, f'P{i:05d}', f'Nombre{i}', f'Apellido{i:05d}', rnd.choice(departamentos))
+                 for i in range(n_empleados)]
+    inicio = date(2025, 1, 1)
+    dias = dias_del_periodo(inicio, inicio + timedelta(days=n_dias - 1))
+    marcaciones = []
+    for e in empleados:
+        for dia in dias:
+            if rnd.random() < 0.1:
+                continue
+            horas = sorted(time(h, rnd.randrange(60), rnd.randrange(60))
+                           for h in rnd.sample([7, 8, 12, 13, 17, 18], rnd.choice([1, 2, 4])))
+            marcaciones.extend(Marcacion(e.passport, dia, h) for h in horas)
+    return {'empleados': empleados, 'dias': dias, 'marcaciones': marcaciones, 'justificaciones': [],
+            'permisos': [], 'grupo_horarios': [], 'depto_horarios': [], 'empleado_grupo_map': {}}
+
+
+def medir(funcion):
+    """(resultado, bytes retenidos, bloques retenidos, pico) de ejecutar `funcion`."""
+    gc.collect()
+    tracemalloc.start()
+    antes = tracemalloc.take_snapshot()
+    resultado = funcion()
+    despues = tracemalloc.take_snapshot()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    diferencias = despues.compare_to(antes, 'filename')
+    return (resultado, sum(d.size_diff for d in diferencias), sum(d.count_diff for d in diferencias), pico)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--empleados', type=int, default=200)
+    parser.add_argument('--dias', type=int, default=180)
+    args = parser.parse_args()
+
+    datos = datos_sinteticos(args.empleados, args.dias)
+    reporte, bytes_reg, bloques_reg, pico_reg = medir(lambda: calcular_reporte_python(datos))
+    n = sum(len(item['registros']) for item in reporte)
+    _, bytes_dict, bloques_dict, pico_dict = medir(
+        lambda: [[registro_formateado(r) for r in item['registros']] for item in reporte])
+
+    print(f'{args.empleados} empleados x {len(datos["dias"])} días = {n} registros')
+    print(f'{"":24}{"MiB retenidos":>14}{"bloques":>12}{"bytes/registro":>16}')
+    print(f'{"RegistroDia (cálculo)":24}{bytes_reg / 2 ** 20:14.1f}{bloques_reg:12d}{bytes_reg / n:16.0f}')
+    print(f'{"dict (dicts y textos)":24}{bytes_dict / 2 ** 20:14.1f}{bloques_dict:12d}{bytes_dict / n:16.0f}')
+    print(f'pico durante el cálculo: {pico_reg / 2 ** 20:.1f} MiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+"""
+Siembra una base local con datos sintéticos para los benchmarks.
+
+Crea las tablas (db.create_all, incluidas las externas de ZKTeco) y llena
+departamentos, empleados, marcaciones, justificaciones, permisos, carteras,
+grupos, asignaciones y horarios especiales con volúmenes configurables. Los
+datos salen de una semilla fija: dos bases sembradas con los mismos
+parámetros son iguales, así que sus tiempos se pueden comparar.
+
+Solo escribe en la base indicada con --db (o BENCH_DATABASE_URL) y se niega
+a sembrar si personnel_employee ya tiene filas.
+
+    python -m benchmarks.sembrar --db postgresql+psycopg2://.../asistencia_bench --empleados 5000 --meses 12
+"""
+import argparse
+import os
+import random
+from datetime import date, datetime, time, timedelta
+from time import perf_counter
+
+from sqlalchemy import insert, select, func
+
+from app import create_app, db
+from app.models import (PersonnelDepartment, PersonnelEmployee, IClockTransaction, Justificaciones, Permisos,
+                        Carteras, Grupos, GrupoEmpleados, GrupoHorariosEspeciales, DepartmentHorariosEspeciales)
+from config import Config
+
+DEPARTAMENTOS = ['Callcenter', 'Guayaquil', 'Administracion', 'Cobranzas', 'Ventas', 'Sistemas', 'Operaciones',
+                 'Legal']
+TIPOS_JUSTIFICACION = ['permiso_personal', 'incapacidad_medica', 'vacaciones', 'calamidad_domestica']
+FERIADOS = [(1, 1), (2, 12), (2, 13), (4, 18), (5, 1), (5, 24), (8, 10), (10, 9), (11, 2), (11, 3), (12, 25)]
+TAMANO_BLOQUE = 20000
+
+
+def config_benchmark(url):
+    """Config de la app apuntando a la base de benchmarks, sin caché de reportes."""
+    class ConfigBenchmark(Config):
+        SQLALCHEMY_DATABASE_URI = url
+        SECRET_KEY = Config.SECRET_KEY or 'benchmark'
+        REPORT_CACHE_BACKEND = 'ninguno'
+    return ConfigBenchmark
+
+
+def _insertar(modelo, filas):
+    """Inserta `filas` (iterable de dicts) en bloques; devuelve la cantidad."""
+    total, bloque = 0, []
+    for fila in filas:
+        bloque.append(fila)
+        if len(bloque) == TAMANO_BLOQUE:
+            db.session.execute(insert(modelo), bloque)
+            total += len(bloque)
+            bloque = []
+    if bloque:
+        db.session.execute(insert(modelo), bloque)
+        total += len(bloque)
+    return total
+
+
+def _hora(rnd, h, m, variacion):
+    """h:m más/menos `variacion` minutos, con segundos al azar."""
+    minutos = h * 60 + m + rnd.randint(-variacion, variacion)
+    return time(minutos // 60, minutos % 60, rnd.randrange(60))
+
+
+def _marcaciones(rnd, empleados, dias):
+    """Marcaciones de lunes a sábado: la mayoría con almuerzo (4), algunas incompletas y ~5% de ausencias."""
+    for emp_id in empleados:
+        for dia in dias:
+            if dia.weekday() == 6 or rnd.random() < 0.05:
+                continue
+            patron = rnd.random()
+            if dia.weekday() == 5 or patron < 0.20:
+                horas = [_hora(rnd, 8, 0, 15), _hora(rnd, 13 if dia.weekday() == 5 else 18, 10, 15)]
+            elif patron < 0.25:
+                horas = [_hora(rnd, 8, 5, 20)]
+            else:
+                salida_almuerzo = _hora(rnd, 12, 45, 15)
+                regreso = (datetime.combine(dia, salida_almuerzo) + timedelta(minutes=rnd.randint(40, 75))).time()
+                horas = [_hora(rnd, 8, 0, 15), salida_almuerzo, regreso, _hora(rnd, 18, 15, 20)]
+            for h in horas:
+                yield {'emp_id': emp_id, 'punch_time': datetime.combine(dia, h)}
+
+
+def _justificaciones(rnd, pasaportes, desde, dias_periodo, por_empleado):
+    """Justificaciones sin cruces entre sí para cada empleado (algunas anuladas)."""
+    for passport in pasaportes:
+        ocupado_hasta = desde - timedelta(days=1)
+        for inicio in sorted(rnd.sample(range(dias_periodo), min(por_empleado, dias_periodo))):
+            date_start = desde + timedelta(days=inicio)
+            if date_start <= ocupado_hasta:
+                continue
+            date_end = date_start + timedelta(days=rnd.choice([0, 0, 1, 2, 4, 14]))
+            ocupado_hasta = date_end
+            yield {'employee_passport': passport, 'justification_type': rnd.choice(TIPOS_JUSTIFICACION),
+                   'date_start': date_start, 'date_end': date_end, 'reason': 'Sintético',
+                   'anulada': rnd.random() < 0.05, 'created_at': datetime(2025, 1, 1)}
+
+
+def _permisos(rnd, pasaportes, dias, por_empleado):
+    for passport in pasaportes:
+        for dia in rnd.sample(dias, min(por_empleado, len(dias))):
+            hora_desde = rnd.choice([time(8, 0), time(9, 0), time(14, 0), time(16, 0)])
+            yield {'employee_passport': passport, 'fecha': dia, 'hora_desde': hora_desde,
+                   'hora_hasta': time(hora_desde.hour + rnd.choice([1, 2]), 0),
+                   'motivo': 'Trámite personal', 'observacion': '', 'created_at': datetime(2025, 1, 1)}
+
+
+def sembrar(empleados=5000, meses=12, desde=date(2025, 1, 1), departamentos=8, carteras=5, grupos=40,
+            justificaciones_por_empleado=3, permisos_por_empleado=4, horarios_por_grupo_mes=4, semilla=0, log=print):
+    """Llena la base de la app activa. Devuelve un dict con la cantidad de filas por tabla."""
+    rnd = random.Random(semilla)
+    hasta = date(desde.year + (desde.month - 1 + meses) // 12, (desde.month - 1 + meses) % 12 + 1, 1) \
+        - timedelta(days=1)
+    dias = [desde + timedelta(days=i) for i in range((hasta - desde).days + 1)]
+    laborables = [d for d in dias if d.weekday() != 6]
+    cantidades = {}
+
+    def paso(nombre, funcion):
+        t0 = perf_counter()
+        cantidades[nombre] = funcion()
+        db.session.commit()
+        log(f'{nombre:32}{cantidades[nombre]:>10} filas  {perf_counter() - t0:7.1f}s')
+
+    nombres_depto = (DEPARTAMENTOS * (departamentos // len(DEPARTAMENTOS) + 1))[:departamentos]
+    nombres_depto = [n if i < len(DEPARTAMENTOS) else f'{n} {i}' for i, n in enumerate(nombres_depto)]
+    paso('personnel_department', lambda: _insertar(PersonnelDepartment, (
+        {'id': i, 'dept_code': f'D{i:03d}', 'dept_name': n} for i, n in enumerate(nombres_depto, start=1))))
+
+    pasaportes = [f'{900000000 + i}' for i in range(1, empleados + 1)]
+    paso('personnel_employee', lambda: _insertar(PersonnelEmployee, (
+        {'id': i, 'passport': p, 'first_name': f'Nombre{i}', 'last_name': f'Apellido{i:05d}',
+         'department_id': rnd.randint(1, departamentos)} for i, p in enumerate(pasaportes, start=1))))
+
+    paso('iclock_transaction', lambda: _insertar(
+        IClockTransaction, _marcaciones(rnd, range(1, empleados + 1), dias)))
+    paso('justificaciones', lambda: _insertar(
+        Justificaciones, _justificaciones(rnd, pasaportes, desde, len(dias), justificaciones_por_empleado)))
+    paso('permisos', lambda: _insertar(Permisos, _permisos(rnd, pasaportes, laborables, permisos_por_empleado)))
+
+    # Carteras y grupos con el ORM: son pocas filas y las asignaciones necesitan sus ids.
+    ids_grupos = []
+
+    def crear_grupos():
+        lista_carteras = [Carteras(code=f'CAR-{i:04d}', name=f'Cartera {i}') for i in range(1, carteras + 1)]
+        db.session.add_all(lista_carteras)
+        db.session.flush()
+        lista = [Grupos(code=f'GRP-{i:04d}', name=f'Grupo {i}', cartera_id=rnd.choice(lista_carteras).id,
+                        hora_entrada=time(8, 0), hora_salida=time(18, 0)) for i in range(1, grupos + 1)]
+        db.session.add_all(lista)
+        db.session.flush()
+        ids_grupos.extend(g.id for g in lista)
+        return len(lista_carteras) + len(lista)
+    paso('carteras + grupos', crear_grupos)
+
+    # Seis de cada diez empleados en algún grupo.
+    paso('grupo_empleados', lambda: _insertar(GrupoEmpleados, (
+        {'grupo_id': rnd.choice(ids_grupos), 'employee_passport': p} for p in pasaportes if rnd.random() < 0.6)))
+
+    def horarios_grupo():
+        for grupo_id in ids_grupos:
+            for fecha in rnd.sample(laborables, min(len(laborables), horarios_por_grupo_mes * meses)):
+                yield {'grupo_id': grupo_id, 'fecha': fecha, 'hora_entrada_especial': time(rnd.choice([7, 9]), 0),
+                       'hora_salida_especial': time(rnd.choice([16, 17, 19]), 0),
+                       'horas_extras': rnd.choice([0, 0, 1, 2]), 'feriado': False}
+    paso('grupo_horarios_especiales', lambda: _insertar(GrupoHorariosEspeciales, horarios_grupo()))
+
+    feriados = [d for d in dias if (d.month, d.day) in FERIADOS]
+    paso('department_horarios_especiales', lambda: _insertar(DepartmentHorariosEspeciales, (
+        {'dept_name': n, 'fecha': f, 'hora_entrada_especial': None, 'hora_salida_especial': None,
+         'horas_extras': 4, 'feriado': True} for n in nombres_depto for f in feriados)))
+    return cantidades
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default=os.getenv('BENCH_DATABASE_URL'),
+                        help='URL SQLAlchemy de la base de benchmarks (por defecto BENCH_DATABASE_URL)')
+    parser.add_argument('--empleados', type=int, default=5000)
+    parser.add_argument('--meses', type=int, default=12)
+    parser.add_argument('--desde', type=date.fromisoformat, default=date(2025, 1, 1))
+    parser.add_argument('--departamentos', type=int, default=8)
+    parser.add_argument('--carteras', type=int, default=5)
+    parser.add_argument('--grupos', type=int, default=40)
+    parser.add_argument('--justificaciones-por-empleado', type=int, default=3)
+    parser.add_argument('--permisos-por-empleado', type=int, default=4)
+    parser.add_argument('--horarios-por-grupo-mes', type=int, default=4)
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args()
+    if not args.db:
+        parser.error('Indique la base con --db o BENCH_DATABASE_URL.')
+
+    app = create_app(config_benchmark(args.db))
+    with app.app_context():
+        db.create_all()
+        if db.session.scalar(select(func.count()).select_from(PersonnelEmployee)):
+            parser.error('personnel_employee ya tiene filas: use una base vacía para sembrar.')
+        t0 = perf_counter()
+        sembrar(args.empleados, args.meses, args.desde, args.departamentos, args.carteras, args.grupos,
+                args.justificaciones_por_empleado, args.permisos_por_empleado, args.horarios_por_grupo_mes,
+                args.semilla)
+        print(f'Listo en {perf_counter() - t0:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,338 @@
+"""
+Benchmarks de reportes, listados y cargas masivas sobre una base sembrada
+con `python -m benchmarks.sembrar`.
+
+Por cada escenario mide el tiempo de pared (mediana y mínimo de
+--repeticiones corridas), el pico de memoria de Python (una corrida extra
+con tracemalloc, para no inflar los tiempos) y la cantidad de sentencias
+SQL enviadas a la base. Las cargas corren como trabajos en segundo plano:
+se mide desde el POST hasta que el trabajo termina (consultando su
+estado), y recién entonces se revierten (se borran las filas con id mayor
+al que había antes), así que la base queda igual.
+
+Los resultados se pueden guardar como línea base en benchmarks/baselines/
+y comparar después; con --comparar el proceso termina con código 1 si
+algún escenario es más lento que la tolerancia o hace más consultas.
+
+Los escenarios del reporte usan SQL de PostgreSQL (como producción); con
+otra base se omiten.
+
+    python -m benchmarks.suite --db postgresql+psycopg2://.../asistencia_bench --guardar antes
+    python -m benchmarks.suite --db postgresql+psycopg2://.../asistencia_bench --comparar antes
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import tracemalloc
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
+from io import BytesIO
+from time import perf_counter, sleep
+
+import openpyxl
+from sqlalchemy import event, select, func, delete
+
+from app import create_app, db
+from app.models import (PersonnelDepartment, PersonnelEmployee, IClockTransaction, Justificaciones, Permisos,
+                        Carteras, Grupos, GrupoEmpleados, GrupoHorariosEspeciales, DepartmentHorariosEspeciales)
+from app.services.report_builder import build_report
+from app.services.excel_builder import crear_excel_reporte
+from benchmarks.sembrar import config_benchmark
+
+DIRECTORIO_BASES = os.path.join(os.path.dirname(__file__), 'baselines')
+TABLAS = [PersonnelDepartment, PersonnelEmployee, IClockTransaction, Justificaciones, Permisos, Grupos,
+          GrupoEmpleados, GrupoHorariosEspeciales, DepartmentHorariosEspeciales]
+# Orden de borrado al revertir una carga (hijos antes que padres).
+TABLAS_CARGAS = [Justificaciones, Permisos, GrupoHorariosEspeciales, GrupoEmpleados, Grupos, Carteras]
+# Segundos entre consultas del estado de una carga, y máximo de espera.
+INTERVALO_CARGA = 0.05
+ESPERA_MAXIMA_CARGA = 1800
+
+# preparar() -> estado (sin medir); ejecutar(estado) (medido); limpiar(estado) -> lista de avisos (sin medir).
+Escenario = namedtuple('Escenario', 'nombre preparar ejecutar limpiar')
+
+
+class ContadorSQL:
+    """Cuenta las sentencias que pasan por el cursor del engine."""
+
+    def __init__(self, engine):
+        self.total = 0
+        event.listen(engine, 'before_cursor_execute', self._contar)
+
+    def _contar(self, *args):
+        self.total += 1
+
+
+# --- ESCENARIOS ---
+
+def _nada():
+    return None
+
+
+def _sin_avisos(estado):
+    return []
+
+
+def escenarios_reporte(app, desde, hasta, departamento_id):
+    params = {'fecha_desde': desde, 'fecha_hasta': hasta, 'departamento_id': departamento_id,
+              'costo_hora_normal': 2.5, 'costo_hora_sabfer': 3.75, 'multa_atraso_normal': 1.0,
+              'multa_atraso_sabfer': 1.5, 'multa_falta_normal': 20.0, 'multa_falta_sabfer': 30.0}
+
+    def ejecutar_reporte(estado):
+        with app.app_context():
+            return build_report(desde, hasta, departamento_id)
+
+    def preparar_excel():
+        return ejecutar_reporte(None)
+
+    def ejecutar_excel(reporte):
+        return crear_excel_reporte(reporte, params)
+
+    return [Escenario('build_report', _nada, ejecutar_reporte, _sin_avisos),
+            Escenario('crear_excel_reporte', preparar_excel, ejecutar_excel, _sin_avisos)]
+
+
+def escenario_listado(cliente, nombre, url):
+    def ejecutar(estado):
+        estado['respuesta'] = cliente.get(url)
+
+    def limpiar(estado):
+        codigo = estado['respuesta'].status_code
+        return [] if codigo == 200 else [f'{url} respondió {codigo}']
+
+    return Escenario(nombre, dict, ejecutar, limpiar)
+
+
+def _ids_maximos(app):
+    with app.app_context():
+        return {m: db.session.scalar(select(func.coalesce(func.max(m.id), 0))) for m in TABLAS_CARGAS}
+
+
+def _revertir(app, maximos):
+    with app.app_context():
+        for modelo in TABLAS_CARGAS:
+            db.session.execute(delete(modelo).where(modelo.id > maximos[modelo]))
+        db.session.commit()
+
+
+def _xlsx(filas):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    for fila in filas:
+        sheet.append(fila)
+    salida = BytesIO()
+    workbook.save(salida)
+    return salida.getvalue()
+
+
+def _esperar_importacion(cliente, respuesta):
+    """Estado final del trabajo de carga creado por `respuesta` (202), consultando /importaciones/<id>."""
+    if respuesta.status_code != 202:
+        return {'estado': 'error', 'mensaje': f'respondió {respuesta.status_code}: {respuesta.get_data(as_text=True)}'}
+    url_estado = respuesta.get_json()['estado_url']
+    limite = perf_counter() + ESPERA_MAXIMA_CARGA
+    while True:
+        trabajo = cliente.get(url_estado).get_json()
+        if trabajo['estado'] in ('listo', 'error'):
+            return trabajo
+        if perf_counter() > limite:
+            raise RuntimeError(f'La carga {url_estado} no terminó en {ESPERA_MAXIMA_CARGA} s.')
+        sleep(INTERVALO_CARGA)
+
+
+def escenario_carga(app, cliente, nombre, url, generar_filas):
+    """
+    POST de un .xlsx generado al vuelo y espera del trabajo en segundo plano (medidos);
+    después se revierte la carga y se informan los errores del trabajo.
+    """
+    def preparar():
+        return {'maximos': _ids_maximos(app), 'archivo': _xlsx(generar_filas())}
+
+    def ejecutar(estado):
+        respuesta = cliente.post(url, data={'archivo_excel': (BytesIO(estado['archivo']), 'carga.xlsx')},
+                                 content_type='multipart/form-data', headers={'Accept': 'application/json'})
+        estado['trabajo'] = _esperar_importacion(cliente, respuesta)
+
+    def limpiar(estado):
+        # El trabajo ya terminó (ejecutar lo espera), así que ningún hilo sigue insertando.
+        _revertir(app, estado['maximos'])
+        trabajo = estado['trabajo']
+        if trabajo['estado'] == 'error':
+            return [f"{url}: {trabajo['mensaje']}"]
+        return [f"{url}: {trabajo['resumen']}"] if trabajo.get('total_errores') else []
+
+    return Escenario(nombre, preparar, ejecutar, limpiar)
+
+
+def escenarios_cargas(app, cliente, filas, desde_cargas):
+    """Cargas con fechas posteriores a los datos sembrados, para que no choquen con lo existente."""
+    with app.app_context():
+        pasaportes = db.session.scalars(select(PersonnelEmployee.passport).order_by(PersonnelEmployee.id)).all()
+        grupos = db.session.execute(select(Grupos.name, Carteras.name).join(Carteras, Grupos.cartera_id == Carteras.id)
+                                    .order_by(Grupos.id)).all()
+    if not pasaportes:
+        return []
+
+    def justificaciones():
+        yield ['Pasaporte', 'Tipo_Justificacion', 'Fecha_Inicio', 'Fecha_Fin', 'Razon']
+        for i in range(filas):
+            inicio = desde_cargas + timedelta(days=3 * (i // len(pasaportes)))
+            yield [pasaportes[i % len(pasaportes)], 'vacaciones', inicio, inicio + timedelta(days=1), 'Benchmark']
+
+    def permisos():
+        yield ['Pasaporte', 'Fecha', 'Hora_Desde', 'Hora_Hasta', 'Motivo', 'Observacion']
+        for i in range(filas):
+            fecha = desde_cargas + timedelta(days=i // len(pasaportes))
+            yield [pasaportes[i % len(pasaportes)], fecha, time(9, 0), time(11, 0), 'Benchmark', '']
+
+    def asignacion():
+        yield ['Pasaporte_Empleado', 'Nombre_Cartera', 'Nombre_Grupo', 'Fecha_Horario_Especial',
+               'Entrada_Especial', 'Salida_Especial', 'Horas_Extras']
+        for i in range(filas):
+            # Uno de cada veinte con un grupo nuevo, para pasar también por la creación de grupos.
+            grupo, cartera = grupos[i % len(grupos)] if grupos and i % 20 else (f'Grupo carga {i % 7}', 'Cartera carga')
+            yield [pasaportes[i % len(pasaportes)], cartera, grupo, desde_cargas + timedelta(days=i % 60),
+                   '10:00', '16:00', 1]
+
+    return [escenario_carga(app, cliente, 'carga_justificaciones', '/justificaciones/cargar-excel', justificaciones),
+            escenario_carga(app, cliente, 'carga_permisos', '/permisos/cargar-excel', permisos),
+            escenario_carga(app, cliente, 'carga_asignacion_masiva', '/asignacion-masiva/procesar-excel', asignacion)]
+
+
+# --- MEDICIÓN ---
+
+def medir(escenario, contador, repeticiones):
+    tiempos, sentencias, avisos = [], [], []
+    for _ in range(repeticiones):
+        estado = escenario.preparar()
+        gc.collect()
+        n0, t0 = contador.total, perf_counter()
+        escenario.ejecutar(estado)
+        tiempos.append(perf_counter() - t0)
+        sentencias.append(contador.total - n0)
+        avisos.extend(escenario.limpiar(estado))
+
+    estado = escenario.preparar()
+    gc.collect()
+    tracemalloc.start()
+    escenario.ejecutar(estado)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    escenario.limpiar(estado)
+
+    return {'segundos': statistics.median(tiempos), 'segundos_min': min(tiempos), 'pico_mib': pico / 2 ** 20,
+            'sentencias_sql': sentencias[-1], 'avisos': sorted(set(avisos))}
+
+
+def volumen(app):
+    with app.app_context():
+        return {m.__tablename__: db.session.scalar(select(func.count()).select_from(m)) for m in TABLAS}
+
+
+# --- LÍNEAS BASE ---
+
+def _ruta_base(nombre):
+    return os.path.join(DIRECTORIO_BASES, f'{nombre}.json')
+
+
+def guardar_base(nombre, datos):
+    os.makedirs(DIRECTORIO_BASES, exist_ok=True)
+    with open(_ruta_base(nombre), 'w', encoding='utf-8') as f:
+        json.dump(datos, f, indent=2, ensure_ascii=False, default=str)
+
+
+def comparar(base, resultados, tolerancia):
+    """Imprime la comparación contra la línea base; devuelve los nombres de los escenarios que empeoraron."""
+    peores = []
+    print(f'\n{"":26}{"base s":>10}{"ahora s":>10}{"Δ tiempo":>10}{"Δ MiB":>9}{"base SQL":>10}{"SQL":>8}')
+    for nombre, r in resultados.items():
+        b = base['resultados'].get(nombre)
+        if b is None:
+            print(f'{nombre:26}{"(sin línea base)":>20}')
+            continue
+        cambio = r['segundos'] / b['segundos'] - 1 if b['segundos'] else 0
+        empeoro = cambio > tolerancia or r['sentencias_sql'] > b['sentencias_sql']
+        if empeoro:
+            peores.append(nombre)
+        print(f'{nombre:26}{b["segundos"]:10.3f}{r["segundos"]:10.3f}{cambio:+10.1%}'
+              f'{r["pico_mib"] - b["pico_mib"]:+9.1f}{b["sentencias_sql"]:10d}{r["sentencias_sql"]:8d}'
+              f'{"  <- peor" if empeoro else ""}')
+    return peores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default=os.getenv('BENCH_DATABASE_URL'),
+                        help='URL SQLAlchemy de la base sembrada (por defecto BENCH_DATABASE_URL)')
+    parser.add_argument('--desde', type=date.fromisoformat, help='Inicio del reporte (por defecto, --dias antes '
+                                                                 'de la última marcación)')
+    parser.add_argument('--hasta', type=date.fromisoformat, help='Fin del reporte (por defecto, la última marcación)')
+    parser.add_argument('--dias', type=int, default=30)
+    parser.add_argument('--departamento', type=int, help='id del departamento del reporte (por defecto, todos)')
+    parser.add_argument('--filas-carga', type=int, default=1000, help='Filas de cada archivo de carga')
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--escenarios', help='Nombres separados por comas (por defecto, todos)')
+    parser.add_argument('--guardar', metavar='NOMBRE', help='Guardar los resultados como línea base')
+    parser.add_argument('--comparar', metavar='NOMBRE', help='Comparar contra una línea base guardada')
+    parser.add_argument('--tolerancia', type=float, default=0.10, help='Aumento de tiempo aceptado al comparar')
+    args = parser.parse_args()
+    if not args.db:
+        parser.error('Indique la base con --db o BENCH_DATABASE_URL.')
+
+    app = create_app(config_benchmark(args.db))
+    cliente = app.test_client()
+    with app.app_context():
+        ultima = db.session.scalar(select(func.max(IClockTransaction.punch_time)))
+        contador = ContadorSQL(db.engine)
+        dialecto = db.engine.dialect.name
+    if ultima is None:
+        parser.error('La base no tiene marcaciones: siémbrela antes con benchmarks.sembrar.')
+    hasta = args.hasta or ultima.date()
+    desde = args.desde or hasta - timedelta(days=args.dias)
+
+    escenarios = []
+    if dialecto == 'postgresql':
+        escenarios += escenarios_reporte(app, desde, hasta, args.departamento)
+    else:
+        print(f'Base {dialecto}: se omiten build_report y crear_excel_reporte (SQL de PostgreSQL).')
+    escenarios += [escenario_listado(cliente, 'listado_justificaciones', '/justificaciones/'),
+                   escenario_listado(cliente, 'listado_permisos', '/permisos/')]
+    escenarios += escenarios_cargas(app, cliente, args.filas_carga, ultima.date() + timedelta(days=60))
+    if args.escenarios:
+        elegidos = set(args.escenarios.split(','))
+        escenarios = [e for e in escenarios if e.nombre in elegidos]
+
+    filas = volumen(app)
+    print(', '.join(f'{t}={n}' for t, n in filas.items()))
+    print(f'Reporte del {desde} al {hasta}, {args.repeticiones} repeticiones\n')
+    print(f'{"":26}{"mediana s":>10}{"mín s":>10}{"pico MiB":>10}{"SQL":>8}')
+    resultados = {}
+    for escenario in escenarios:
+        r = resultados[escenario.nombre] = medir(escenario, contador, args.repeticiones)
+        print(f'{escenario.nombre:26}{r["segundos"]:10.3f}{r["segundos_min"]:10.3f}{r["pico_mib"]:10.1f}'
+              f'{r["sentencias_sql"]:8d}')
+        for aviso in r['avisos']:
+            print(f'    aviso: {aviso}')
+
+    datos = {'creado': datetime.now().isoformat(timespec='seconds'), 'dialecto': dialecto,
+             'python': platform.python_version(), 'volumen': filas,
+             'parametros': {'desde': desde, 'hasta': hasta, 'departamento': args.departamento,
+                            'filas_carga': args.filas_carga, 'repeticiones': args.repeticiones},
+             'resultados': resultados}
+    if args.guardar:
+        guardar_base(args.guardar, datos)
+        print(f'\nLínea base guardada en {_ruta_base(args.guardar)}')
+    if args.comparar:
+        with open(_ruta_base(args.comparar), encoding='utf-8') as f:
+            base = json.load(f)
+        if base['volumen'] != filas:
+            print('\nAtención: el volumen de datos no coincide con el de la línea base.')
+        if comparar(base, resultados, args.tolerancia):
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -15,4 +15,59 @@ class Config:
         f"postgresql+psycopg2://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@"
         f"{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
     )
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Motor de cálculo del reporte de asistencia: 'python' (original) o 'pandas' (vectorizado)
+    REPORT_ENGINE = os.getenv('REPORT_ENGINE', 'python')
+
+    # Cálculo en paralelo (pool de procesos); 0 o 1 lo desactiva. Por debajo del umbral se calcula en serie.
+    REPORT_PARALLEL_WORKERS = int(os.getenv('REPORT_PARALLEL_WORKERS', 0))
+    REPORT_PARALLEL_MIN_EMPLEADOS = int(os.getenv('REPORT_PARALLEL_MIN_EMPLEADOS', 100))
+
+    # Empleados por lote en build_report e iter_report (las marcaciones se cargan lote por lote);
+    # con el cálculo en paralelo, al menos REPORT_PARALLEL_WORKERS * REPORT_PARALLEL_MIN_EMPLEADOS
+    REPORT_LOTE_EMPLEADOS = int(os.getenv('REPORT_LOTE_EMPLEADOS', 50))
+
+    # Carga de marcaciones: empleados por consulta y máximo de filas por reporte (0 = sin límite)
+    REPORT_MARCACIONES_LOTE_IDS = int(os.getenv('REPORT_MARCACIONES_LOTE_IDS', 200))
+    REPORT_MARCACIONES_MAX_FILAS = int(os.getenv('REPORT_MARCACIONES_MAX_FILAS', 0))
+
+    # Hechos precalculados de asistencia (tabla asistencia_diaria)
+    REPORT_USE_FACTS = os.getenv('REPORT_USE_FACTS', 'true').lower() == 'true'
+    ASISTENCIA_HECHOS_DESDE = os.getenv('ASISTENCIA_HECHOS_DESDE', '2025-01-01')
+    ASISTENCIA_LOTE_EMPLEADOS = int(os.getenv('ASISTENCIA_LOTE_EMPLEADOS', 200))
+
+    # Caché de reportes calculados: 'memoria' (por proceso), 'archivo' (compartida entre workers) o 'ninguno'
+    REPORT_CACHE_BACKEND = os.getenv('REPORT_CACHE_BACKEND', 'memoria')
+    REPORT_CACHE_MAX_ENTRADAS = int(os.getenv('REPORT_CACHE_MAX_ENTRADAS', 32))
+    REPORT_CACHE_MAX_REGISTROS = int(os.getenv('REPORT_CACHE_MAX_REGISTROS', 500000))
+    REPORT_CACHE_DIR = os.getenv('REPORT_CACHE_DIR')
+    # Procesos que atienden la app (workers de gunicorn, WEB_CONCURRENCY); con más de uno, la caché 'memoria'
+    # de cada proceso se vacía cuando otro invalida (archivo de generación en REPORT_CACHE_DIR)
+    REPORT_CACHE_PROCESOS = int(os.getenv('REPORT_CACHE_PROCESOS', os.getenv('WEB_CONCURRENCY', 1)))
+    REPORT_CACHE_MAX_MB = int(os.getenv('REPORT_CACHE_MAX_MB', 512))
+
+    # Estilos del Excel del reporte: 'tabla' (estilo de tabla + formato condicional) o 'celdas' (celda por celda)
+    REPORT_EXCEL_ESTILOS = os.getenv('REPORT_EXCEL_ESTILOS', 'tabla')
+    # Hojas del Excel, separadas por coma: resumen, trabajo, asistencia, detalles (faltas, atrasos y extras)
+    REPORT_EXCEL_HOJAS = os.getenv('REPORT_EXCEL_HOJAS', 'resumen,trabajo,asistencia,detalles')
+
+    # Instrumentación por petición (encabezado Server-Timing y /metrics); ventana = peticiones por endpoint
+    METRICAS_HABILITADAS = os.getenv('METRICAS_HABILITADAS', 'true').lower() == 'true'
+    METRICAS_VENTANA = int(os.getenv('METRICAS_VENTANA', 1000))
+
+    # Detector de N+1 (desarrollo/pruebas): máximo de repeticiones de una misma consulta por petición
+    # (0 = apagado); con SQL_REPETIDAS_ERROR=true la petición falla en lugar de solo advertir
+    SQL_REPETIDAS_MAX = int(os.getenv('SQL_REPETIDAS_MAX', 0))
+    SQL_REPETIDAS_ERROR = os.getenv('SQL_REPETIDAS_ERROR', 'false').lower() == 'true'
+
+    # Trabajos en segundo plano (exportación del Excel y cargas masivas): hilos por worker, directorio de resultados
+    # (compartido entre workers; por defecto <tmp>/exportaciones) y minutos que se conservan
+    EXPORT_WORKERS = int(os.getenv('EXPORT_WORKERS', 2))
+    EXPORT_SPOOL_DIR = os.getenv('EXPORT_SPOOL_DIR')
+    EXPORT_TTL_MINUTOS = int(os.getenv('EXPORT_TTL_MINUTOS', 60))
+
+    # Cargas masivas: tamaño máximo de la subida (MB; Flask lo aplica a toda petición) y
+    # filas por lote (cada lote se confirma con su propio commit)
+    MAX_CONTENT_LENGTH = int(os.getenv('CARGA_MAX_MB', 100)) * 1024 * 1024
+    CARGA_FILAS_POR_LOTE = int(os.getenv('CARGA_FILAS_POR_LOTE', 5000))
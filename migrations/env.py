@@ -21,7 +21,8 @@ target_metadata = db.metadata
 MY_APP_TABLES = {
     'carteras', 'grupos', 'grupo_empleados', 'justificaciones',
     'grupo_horarios_especiales', 'department_horarios_especiales',
-    'allowed_ips','permisos', 'alembic_version'
+    'allowed_ips','permisos', 'asistencia_diaria', 'asistencia_refresco',
+    'alembic_version'
 }
 
 def include_object(object, name, type_, reflected, compare_to):
@@ -0,0 +1,37 @@
+"""Índices para marcaciones y justificaciones
+
+Revision ID: 129cdd8e316c
+Revises: 8b1f2c6d9a47
+Create Date: 2026-10-18 11:02:17.204611
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '129cdd8e316c'
+down_revision = '8b1f2c6d9a47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # iclock_transaction es la tabla del reloj biométrico (externa y grande): el índice se crea
+    # CONCURRENTLY para no bloquear las escrituras del reloj, fuera de la transacción de Alembic.
+    with op.get_context().autocommit_block():
+        op.create_index('ix_iclock_transaction_emp_id_punch_time', 'iclock_transaction',
+                        ['emp_id', 'punch_time'], unique=False,
+                        postgresql_concurrently=True, if_not_exists=True)
+
+    # Búsqueda de cruces y carga del reporte: pasaporte + rango de fechas, solo justificaciones vigentes.
+    op.create_index('ix_justificaciones_vigentes', 'justificaciones',
+                    ['employee_passport', 'date_start', 'date_end'], unique=False,
+                    postgresql_where=sa.text('NOT anulada'))
+
+
+def downgrade():
+    op.drop_index('ix_justificaciones_vigentes', table_name='justificaciones')
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_iclock_transaction_emp_id_punch_time', table_name='iclock_transaction',
+                      postgresql_concurrently=True, if_exists=True)
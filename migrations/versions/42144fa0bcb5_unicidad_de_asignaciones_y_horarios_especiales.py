@@ -0,0 +1,39 @@
+"""Unicidad de asignaciones y horarios especiales de grupo
+
+Revision ID: 42144fa0bcb5
+Revises: 129cdd8e316c
+Create Date: 2026-10-18 14:20:05.118734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '42144fa0bcb5'
+down_revision = '129cdd8e316c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # La carga masiva escribe con INSERT ... ON CONFLICT, que necesita una restricción única.
+    # Antes se quitan los duplicados que pudo dejar la carga fila por fila (se conserva el id más bajo,
+    # que es el que devolvía el .first() de la versión anterior).
+    op.execute("""
+        DELETE FROM grupo_empleados a USING grupo_empleados b
+        WHERE a.grupo_id = b.grupo_id AND a.employee_passport = b.employee_passport AND a.id > b.id
+    """)
+    op.execute("""
+        DELETE FROM grupo_horarios_especiales a USING grupo_horarios_especiales b
+        WHERE a.grupo_id = b.grupo_id AND a.fecha = b.fecha AND a.id > b.id
+    """)
+    op.create_unique_constraint('uq_grupo_empleados_grupo_pasaporte', 'grupo_empleados',
+                                ['grupo_id', 'employee_passport'])
+    op.create_unique_constraint('uq_grupo_horarios_especiales_grupo_fecha', 'grupo_horarios_especiales',
+                                ['grupo_id', 'fecha'])
+
+
+def downgrade():
+    op.drop_constraint('uq_grupo_horarios_especiales_grupo_fecha', 'grupo_horarios_especiales', type_='unique')
+    op.drop_constraint('uq_grupo_empleados_grupo_pasaporte', 'grupo_empleados', type_='unique')
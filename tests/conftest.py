@@ -0,0 +1,101 @@
+"""
+Fixtures de las pruebas.
+
+Por defecto la app usa una base SQLite en un archivo temporal (compartida por
+los hilos de los trabajos en segundo plano). Las pruebas marcadas con
+`postgresql` necesitan una base PostgreSQL vacía en TEST_DATABASE_URL (se
+crean y borran sus tablas) y se saltan si no está definida.
+"""
+import os
+from datetime import date, time
+
+import pytest
+
+from app import create_app, db
+from app.models import PersonnelDepartment, PersonnelEmployee, AsistenciaDiaria
+from app.services import cambios
+from config import Config
+
+URL_POSTGRESQL = os.getenv('TEST_DATABASE_URL')
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'postgresql: necesita una base PostgreSQL en TEST_DATABASE_URL')
+
+
+def pytest_collection_modifyitems(config, items):
+    if URL_POSTGRESQL:
+        return
+    saltar = pytest.mark.skip(reason='sin TEST_DATABASE_URL (PostgreSQL)')
+    for item in items:
+        if 'postgresql' in item.keywords:
+            item.add_marker(saltar)
+
+
+def _crear_app(url, tmp_path):
+    class ConfigPruebas(Config):
+        TESTING = True
+        SECRET_KEY = 'pruebas'
+        SQLALCHEMY_DATABASE_URI = url
+        REPORT_USE_FACTS = False
+        REPORT_CACHE_BACKEND = 'memoria'
+        REPORT_CACHE_DIR = str(tmp_path / 'report_cache')
+        EXPORT_SPOOL_DIR = str(tmp_path / 'spool')
+        CARGA_FILAS_POR_LOTE = 2
+    return create_app(ConfigPruebas)
+
+
+@pytest.fixture
+def app(request, tmp_path):
+    url = URL_POSTGRESQL if 'postgresql' in request.keywords else f"sqlite:///{tmp_path / 'pruebas.db'}"
+    app = _crear_app(url, tmp_path)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def empleados(app):
+    """Tres empleados (E1, E2, E3) de un departamento; devuelve sus pasaportes."""
+    departamento = PersonnelDepartment(dept_code='D1', dept_name='Callcenter')
+    db.session.add(departamento)
+    db.session.flush()
+    pasaportes = ['E1', 'E2', 'E3']
+    db.session.add_all(PersonnelEmployee(passport=p, first_name=p, last_name='Prueba',
+                                         department_id=departamento.id) for p in pasaportes)
+    db.session.commit()
+    return pasaportes
+
+
+@pytest.fixture
+def marzo():
+    return date(2025, 3, 1), date(2025, 3, 31)
+
+
+@pytest.fixture
+def crear_hecho(app):
+    """Función que guarda una fila de asistencia_diaria para (pasaporte, fecha) y devuelve su id."""
+    def crear(passport, fecha):
+        empleado = PersonnelEmployee.query.filter_by(passport=passport).one()
+        hecho = AsistenciaDiaria(employee_id=empleado.id, employee_passport=passport, fecha=fecha, estado='Presente',
+                                 tipo_dia_laborable='Normal', horario_entrada=time(8, 0), horario_salida=time(18, 0))
+        db.session.add(hecho)
+        db.session.commit()
+        return hecho.id
+    return crear
+
+
+@pytest.fixture
+def confirmados():
+    """Lista con los cambios que recibe un suscriptor de al_confirmar_cambios durante la prueba (uno por commit)."""
+    recibidos = []
+    suscriptor = cambios.al_confirmar_cambios(recibidos.append)
+    yield recibidos
+    cambios._suscriptores_commit.remove(suscriptor)
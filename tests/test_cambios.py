@@ -0,0 +1,29 @@
+from datetime import date
+
+from app import db
+from app.models import Justificaciones, GrupoEmpleados
+from app.services.cambios import Cambio, publicar_cambios
+
+
+def test_publicar_combina_y_notifica_al_confirmar(app, confirmados):
+    publicar_cambios(db.session, Justificaciones, [
+        {'employee_passport': 'E1', 'date_start': date(2025, 3, 10), 'date_end': date(2025, 3, 12)},
+        {'employee_passport': 'E1', 'date_start': date(2025, 3, 1), 'date_end': date(2025, 3, 2)},
+        {'employee_passport': 'E2', 'date_start': date(2025, 4, 1), 'date_end': date(2025, 4, 1)},
+    ])
+    publicar_cambios(db.session, GrupoEmpleados, [{'employee_passport': 'E3'}])
+    assert confirmados == []
+
+    db.session.commit()
+
+    assert confirmados == [{Cambio('empleado', 'E1', date(2025, 3, 1), date(2025, 3, 12)),
+                            Cambio('empleado', 'E2', date(2025, 4, 1), date(2025, 4, 1)),
+                            Cambio('empleado', 'E3', None, None)}]
+
+
+def test_publicar_no_notifica_si_hay_rollback(app, confirmados):
+    publicar_cambios(db.session, GrupoEmpleados, [{'employee_passport': 'E1'}])
+    db.session.rollback()
+    db.session.commit()
+
+    assert confirmados == []
@@ -0,0 +1,43 @@
+"""Carga masiva de asignaciones: usa INSERT ... ON CONFLICT de PostgreSQL (ver conftest)."""
+from datetime import date, time
+
+import pytest
+
+from app import db
+from app.models import GrupoEmpleados, GrupoHorariosEspeciales
+from app.services.carga_asignaciones import procesar_asignaciones
+from app.services.report_cache import guardar_reporte, reporte_en_cache
+
+pytestmark = pytest.mark.postgresql
+
+FILAS = [
+    (2, ('E1', 'Cartera A', 'Grupo A', date(2025, 3, 3), '09:00', None, None)),
+    (3, ('E2', 'Cartera A', 'Grupo A', None, None, None, None)),
+    (4, ('NOEXISTE', 'Cartera A', 'Grupo A', None, None, None, None)),
+    (5, ('E3', 'Cartera A', None, None, None, None, None)),
+    (6, ('E1', 'Cartera A', 'Grupo A', date(2025, 3, 3), None, '17:00', '2')),
+]
+
+
+def test_carga_idempotente_con_errores_por_fila(empleados):
+    stats, errores = procesar_asignaciones(FILAS, 2)
+
+    assert stats['asignaciones_creadas'] == 2
+    assert [(e.fila, e.motivo) for e in errores] == [(4, "Pasaporte 'NOEXISTE' no encontrado."),
+                                                     (5, 'Datos básicos incompletos.')]
+    horario = GrupoHorariosEspeciales.query.one()
+    assert (horario.hora_entrada_especial, horario.hora_salida_especial, horario.horas_extras) == (
+        time(9, 0), time(17, 0), 2)
+
+    stats, _ = procesar_asignaciones(FILAS, 2)
+    assert stats['asignaciones_creadas'] == 0
+    assert GrupoEmpleados.query.count() == 2
+
+
+def test_carga_invalida_reportes_en_cache(empleados, marzo):
+    guardar_reporte(*marzo, None, 0, [])
+    assert reporte_en_cache(*marzo) == []
+
+    procesar_asignaciones(FILAS[:2], 2)
+
+    assert reporte_en_cache(*marzo) is None
@@ -0,0 +1,102 @@
+from datetime import date
+
+import openpyxl
+import pytest
+
+from app import db
+from app.models import AsistenciaDiaria, Justificaciones
+from app.services.carga_comun import crear_informe_errores
+from app.services.carga_justificaciones import cargar_justificaciones, COLUMNAS
+from app.services.report_builder import build_report
+from app.services.report_cache import guardar_reporte, reporte_en_cache
+
+
+def _filas(*filas):
+    return [(n, valores) for n, valores in enumerate(filas, 2)]
+
+
+def test_cruces_entre_lotes_y_dentro_del_lote(empleados):
+    # Lotes de 2 filas (CARGA_FILAS_POR_LOTE de las pruebas).
+    filas = _filas(('E1', 'vacaciones', '2025-03-01', '2025-03-05', ''),
+                   ('E2', 'vacaciones', '2025-03-01', '2025-03-01', ''),
+                   ('E1', 'vacaciones', '2025-03-04', '2025-03-04', 'lote 2, cruza con la fila 2'),
+                   ('E1', 'vacaciones', '2025-03-10', '2025-03-12', ''),
+                   ('E1', 'vacaciones', '2025-03-11', '2025-03-11', 'lote 3'),
+                   ('E2', 'vacaciones', '2025-03-10', '2025-03-10', ''),
+                   ('E1', 'vacaciones', '2025-03-20', '2025-03-22', ''),
+                   ('E1', 'vacaciones', '2025-03-22', '2025-03-25', 'mismo lote que la fila 8'))
+
+    creadas, errores = cargar_justificaciones(filas, 2)
+
+    assert creadas == 5
+    assert [(e.fila, e.motivo) for e in errores] == [
+        (4, 'Se cruza con una justificación existente (del 01-03-2025 al 05-03-2025).'),
+        (6, 'Se cruza con una justificación existente (del 10-03-2025 al 12-03-2025).'),
+        (9, 'Se cruza con la fila 8 del archivo.'),
+    ]
+    assert Justificaciones.query.count() == 5
+
+
+def test_dentro_del_lote_gana_la_primera_fila_del_archivo(empleados):
+    filas = _filas(('E1', 'vacaciones', '2025-03-10', '2025-03-12', ''),
+                   ('E1', 'vacaciones', '2025-03-01', '2025-03-03', ''),
+                   ('E1', 'vacaciones', '2025-03-05', '2025-03-10', 'empieza antes, pero va después de la fila 2'),
+                   ('E1', 'vacaciones', '2025-03-04', '2025-03-04', ''),
+                   ('E1', 'vacaciones', '2025-03-03', '2025-03-20', 'cruza con las filas 2, 3 y 5'))
+
+    creadas, errores = cargar_justificaciones(filas, 10)
+
+    assert creadas == 3
+    assert [(e.fila, e.motivo) for e in errores] == [(4, 'Se cruza con la fila 2 del archivo.'),
+                                                     (6, 'Se cruza con la fila 2 del archivo.')]
+    assert sorted((j.date_start.day, j.date_end.day) for j in Justificaciones.query) == [(1, 3), (4, 4), (10, 12)]
+
+
+def test_informe_de_errores(empleados):
+    filas = _filas(('E1', 'vacaciones', '2025-03-01', '2025-03-01', ''),
+                   ('NOEXISTE', 'vacaciones', '2025-03-01', '2025-03-01', 'x'),
+                   ('E1', None, '2025-03-02', '2025-03-02', ''),
+                   ('E2', 'vacaciones', '01/03/2025', '2025-03-02', ''),
+                   ('E2', 'vacaciones', '2025-03-05', '2025-03-02', ''))
+
+    _, errores = cargar_justificaciones(filas, 2)
+    hoja = openpyxl.load_workbook(crear_informe_errores(errores, COLUMNAS)).active
+    filas_informe = list(hoja.iter_rows(values_only=True))
+
+    assert filas_informe[0] == ('Fila', *COLUMNAS, 'Error')
+    assert [(f[0], f[1], f[-1]) for f in filas_informe[1:]] == [
+        (3, 'NOEXISTE', "Pasaporte 'NOEXISTE' no encontrado."),
+        (4, 'E1', 'Datos incompletos: pasaporte, tipo y fechas son obligatorios.'),
+        (5, 'E2', "Formato de fecha inválido - time data '01/03/2025' does not match format '%Y-%m-%d'"),
+        (6, 'E2', 'La fecha de fin es anterior a la de inicio.'),
+    ]
+
+
+def test_carga_invalida_cache_y_hechos(empleados, marzo, crear_hecho):
+    guardar_reporte(*marzo, None, 0, [])
+    afectado = crear_hecho('E1', date(2025, 3, 4))
+    otro_dia = crear_hecho('E1', date(2025, 3, 20))
+    otro_empleado = crear_hecho('E2', date(2025, 3, 4))
+    assert reporte_en_cache(*marzo) == []
+
+    cargar_justificaciones(_filas(('E1', 'vacaciones', '2025-03-03', '2025-03-05', ''),
+                                  ('E1', 'vacaciones', '2025-03-07', '2025-03-07', '')), 5000)
+
+    assert reporte_en_cache(*marzo) is None
+    quedan = set(db.session.scalars(db.select(AsistenciaDiaria.id)))
+    assert afectado not in quedan
+    assert {otro_dia, otro_empleado} <= quedan
+
+
+@pytest.mark.postgresql
+def test_reporte_previo_no_se_sirve_de_cache(empleados, marzo):
+    # Sin marcaciones, todos los días hábiles son faltas injustificadas hasta que llega la justificación.
+    antes = {item['empleado'].passport: item['resumen'] for item in build_report(*marzo)}
+    assert antes['E1']['total_faltas_justificadas'] == 0
+
+    cargar_justificaciones(_filas(('E1', 'vacaciones', '2025-03-03', '2025-03-05', '')), 5000)
+
+    assert reporte_en_cache(*marzo) is None
+    despues = {item['empleado'].passport: item['resumen'] for item in build_report(*marzo)}
+    assert despues['E1']['total_faltas_justificadas'] == 3
+    assert despues['E2'] == antes['E2']
@@ -0,0 +1,59 @@
+from datetime import date, time
+
+import pytest
+
+from app import db
+from app.models import AsistenciaDiaria, Permisos
+from app.services.carga_permisos import cargar_permisos, LARGO_MOTIVO
+from app.services.report_cache import guardar_reporte, reporte_en_cache
+
+FILAS = [
+    (2, ('E1', '2025-03-04', '14:00:00', '16:00:00', 'Médico', None)),
+    (3, ('E2', '2025-03-05 00:00:00', '09:00:00', '10:00:00', 'Trámite', 'con cita')),
+    (4, ('NOEXISTE', '2025-03-05', '09:00:00', '10:00:00', 'Trámite', None)),
+    (5, ('E1', '05/03/2025', '09:00:00', '10:00:00', 'Trámite', None)),
+    (6, ('E1', '2025-03-06', '9h', '10:00:00', 'Trámite', None)),
+    (7, ('E1', '2025-03-07', '09:00:00', '10:00:00', 'm' * (LARGO_MOTIVO + 1), None)),
+    (8, ('E1', None, '09:00:00', '10:00:00', 'Trámite', None)),
+]
+
+
+def test_carga_por_lotes_con_errores_por_fila(empleados):
+    creados, errores = cargar_permisos(FILAS, 2)
+
+    assert creados == 2
+    assert [(e.fila, e.motivo) for e in errores] == [
+        (4, "Pasaporte 'NOEXISTE' no encontrado."),
+        (5, 'Formato de fecha inválido (se espera AAAA-MM-DD).'),
+        (6, 'Formato de hora inválido (se espera HH:MM:SS).'),
+        (7, f'El motivo supera los {LARGO_MOTIVO} caracteres.'),
+        (8, 'Datos incompletos: pasaporte, fecha, horas y motivo son obligatorios.'),
+    ]
+    permisos = {p.employee_passport: p for p in Permisos.query}
+    assert (permisos['E2'].fecha, permisos['E2'].hora_desde, permisos['E2'].observacion) == (
+        date(2025, 3, 5), time(9, 0), 'con cita')
+    assert permisos['E1'].observacion == ''
+
+
+def test_carga_invalida_cache_y_hechos(empleados, marzo, crear_hecho):
+    guardar_reporte(*marzo, None, 0, [])
+    afectado = crear_hecho('E1', date(2025, 3, 4))
+    otro_dia = crear_hecho('E1', date(2025, 3, 20))
+    assert reporte_en_cache(*marzo) == []
+
+    cargar_permisos(FILAS[:1], 5000)
+
+    assert reporte_en_cache(*marzo) is None
+    quedan = set(db.session.scalars(db.select(AsistenciaDiaria.id)))
+    assert afectado not in quedan
+    assert otro_dia in quedan
+
+
+@pytest.mark.postgresql
+def test_copy_en_postgresql(empleados, marzo):
+    guardar_reporte(*marzo, None, 0, [])
+
+    creados, _ = cargar_permisos(FILAS, 2)
+
+    assert creados == Permisos.query.count() == 2
+    assert reporte_en_cache(*marzo) is None
@@ -0,0 +1,38 @@
+from collections import namedtuple
+from datetime import date, time
+
+import openpyxl
+import pytest
+
+from app.services.excel_builder import crear_excel_reporte, HEADERS_EMPLEADO
+from app.services.report_builder import calcular_reporte_python, dias_del_periodo
+
+Departamento = namedtuple('Departamento', 'id dept_name')
+Empleado = namedtuple('Empleado', 'id passport first_name last_name department')
+Marcacion = namedtuple('Marcacion', 'passport fecha_local hora_local')
+
+PARAMS = {'costo_hora_normal': 3.5, 'costo_hora_sabfer': 5, 'multa_atraso_normal': 1, 'multa_atraso_sabfer': 2,
+          'multa_falta_normal': 10, 'multa_falta_sabfer': 15}
+
+
+def _reporte(desde, hasta):
+    empleado = Empleado(1, 'P00001', 'Ana', 'Prueba', Departamento(1, 'Callcenter'))
+    dias = dias_del_periodo(desde, hasta)
+    marcaciones = [Marcacion(empleado.passport, dia, hora) for dia in dias for hora in (time(8, 0), time(18, 0))]
+    return calcular_reporte_python({
+        'empleados': [empleado], 'dias': dias, 'marcaciones': marcaciones, 'justificaciones': [], 'permisos': [],
+        'grupo_horarios': [], 'depto_horarios': [], 'empleado_grupo_map': {}})
+
+
+@pytest.mark.parametrize('desde, hasta', [(date(2025, 2, 1), date(2025, 3, 31)),
+                                          (date(2024, 12, 1), date(2025, 12, 31))])
+def test_matriz_asistencia_con_columnas_unicas(desde, hasta):
+    archivo = crear_excel_reporte(_reporte(desde, hasta), dict(PARAMS, fecha_desde=desde, fecha_hasta=hasta),
+                                  'tabla', ['asistencia'])
+    hoja = openpyxl.load_workbook(archivo).active
+
+    (tabla,) = hoja.tables.values()
+    nombres = [columna.name for columna in tabla.tableColumns]
+    assert len(nombres) == len(set(nombres))
+    assert len(nombres) == len(HEADERS_EMPLEADO) + len(dias_del_periodo(desde, hasta))
+    assert f"03/02{'' if desde.year == hasta.year else '/2025'} Lun" in nombres
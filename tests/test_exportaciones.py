@@ -0,0 +1,87 @@
+import io
+import threading
+import time
+from datetime import timedelta
+
+import pytest
+
+from app.services import exportaciones
+from app.services.exportaciones import PENDIENTE, EN_CURSO, LISTO, ERROR
+
+FORMULARIO = {'fecha_desde': '2025-03-01', 'fecha_hasta': '2025-03-31'}
+
+
+@pytest.fixture
+def hojas_lentas(monkeypatch):
+    """La escritura de las hojas tarda el triple de ABANDONO (acortado) y no informa progreso."""
+    monkeypatch.setattr(exportaciones, 'ABANDONO', timedelta(seconds=0.3))
+    monkeypatch.setattr(exportaciones, 'INTERVALO_LATIDO', 0.05)
+
+    def crear_excel_reporte(reporte, params):
+        list(reporte)
+        time.sleep(0.9)
+        return io.BytesIO(b'xlsx')
+    monkeypatch.setattr(exportaciones, 'crear_excel_reporte', crear_excel_reporte)
+
+
+def test_latido_mantiene_en_curso_la_escritura_de_hojas(client, hojas_lentas):
+    id_trabajo = client.post('/reportes/exportaciones', data=FORMULARIO).get_json()['id']
+    url = f'/reportes/exportaciones/{id_trabajo}'
+
+    vistos = []
+    fin = time.monotonic() + 10
+    while time.monotonic() < fin and (not vistos or vistos[-1] not in (LISTO, ERROR)):
+        vistos.append(client.get(url).get_json()['estado'])
+        if vistos[-1] == EN_CURSO:
+            # Una solicitud repetida se suma al trabajo en curso en lugar de empezar otro.
+            assert client.post('/reportes/exportaciones', data=FORMULARIO).get_json()['id'] == id_trabajo
+        time.sleep(0.05)
+
+    assert vistos.count(EN_CURSO) > 10
+    assert vistos[-1] == LISTO
+
+
+@pytest.fixture
+def pool_ocupado(app, monkeypatch):
+    """Ocupa todos los hilos del pool hasta llamar a la función devuelta (también al terminar la prueba)."""
+    monkeypatch.setattr(exportaciones, 'ABANDONO', timedelta(seconds=0.3))
+    monkeypatch.setattr(exportaciones, 'INTERVALO_LATIDO', 0.05)
+    app.config['EXPORT_TTL_MINUTOS'] = 0.005  # 0,3 segundos
+    liberar = threading.Event()
+    for _ in range(app.config['EXPORT_WORKERS']):
+        exportaciones._obtener_pool().submit(liberar.wait, 10)
+    yield liberar.set
+    liberar.set()
+
+
+def test_importacion_en_cola_conserva_estado_y_archivo(client, empleados, pool_ocupado):
+    respuesta = client.post('/justificaciones/cargar-excel', headers={'Accept': 'application/json'}, data={
+        'archivo_excel': (io.BytesIO(b'Pasaporte,Tipo_Justificacion,Fecha_Inicio,Fecha_Fin,Razon\r\n'
+                                     b'E1,vacaciones,2025-03-03,2025-03-05,\r\n'), 'j.csv')})
+    url = respuesta.get_json()['estado_url']
+
+    # Espera en cola más que ABANDONO y que EXPORT_TTL_MINUTOS; cada consulta barre el spool.
+    for _ in range(12):
+        time.sleep(0.1)
+        assert client.get(url).get_json()['estado'] == PENDIENTE
+
+    pool_ocupado()
+    fin = time.monotonic() + 10
+    while (estado := client.get(url).get_json())['estado'] not in (LISTO, ERROR) and time.monotonic() < fin:
+        time.sleep(0.05)
+    assert estado['estado'] == LISTO, estado.get('mensaje')
+    assert estado['resumen'].startswith('Carga masiva completada: 1 justificaciones creadas')
+
+
+def test_el_latido_se_detiene_al_terminar_el_trabajo(app, monkeypatch):
+    monkeypatch.setattr(exportaciones, 'INTERVALO_LATIDO', 0.02)
+    id_trabajo = exportaciones.crear_trabajo()
+    terminado = threading.Event()
+
+    exportaciones.encolar(lambda id_trabajo: time.sleep(0.1) or terminado.set(), id_trabajo)
+    assert terminado.wait(5)
+    time.sleep(0.05)
+    actualizado = exportaciones.estado_trabajo(id_trabajo)['actualizado']
+    time.sleep(0.1)
+
+    assert exportaciones.estado_trabajo(id_trabajo)['actualizado'] == actualizado
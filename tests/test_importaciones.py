@@ -0,0 +1,107 @@
+import io
+import time
+
+import openpyxl
+import pytest
+
+from app.models import Justificaciones
+from app.services import importaciones
+from app.services.cambios import Cambio
+from app.services.exportaciones import PENDIENTE, EN_CURSO, LISTO, ERROR
+
+CSV_JUSTIFICACIONES = (b'Pasaporte,Tipo_Justificacion,Fecha_Inicio,Fecha_Fin,Razon\r\n'
+                       b'E1,vacaciones,2025-03-03,2025-03-05,\r\n'
+                       b'E2,vacaciones,2025-03-03,2025-03-03,\r\n'
+                       b'E1,vacaciones,2025-03-04,2025-03-04,se cruza\r\n'
+                       b'NOEXISTE,vacaciones,2025-03-03,2025-03-03,\r\n'
+                       b'E3,vacaciones,2025-03-10,2025-03-10,\r\n')
+
+
+def _subir(client, contenido, nombre='j.csv', url='/justificaciones/cargar-excel'):
+    return client.post(url, data={'archivo_excel': (io.BytesIO(contenido), nombre)},
+                       headers={'Accept': 'application/json'})
+
+
+def _esperar(client, url, limite=10):
+    fin = time.monotonic() + limite
+    while time.monotonic() < fin:
+        estado = client.get(url).get_json()
+        if estado['estado'] in (LISTO, ERROR):
+            return estado
+        time.sleep(0.05)
+    raise AssertionError(f'{url} no terminó')
+
+
+@pytest.fixture
+def estados(monkeypatch):
+    """Valores de 'estado' que el trabajo escribe, en orden; el trabajo se corre a mano (encolar no lo lanza)."""
+    escritos, encolados = [], []
+    original = importaciones.actualizar_trabajo
+
+    def actualizar(id_trabajo, **cambios):
+        if 'estado' in cambios:
+            escritos.append(cambios['estado'])
+        return original(id_trabajo, **cambios)
+
+    monkeypatch.setattr(importaciones, 'actualizar_trabajo', actualizar)
+    monkeypatch.setattr(importaciones, 'encolar', lambda funcion, *args: encolados.append((funcion, args)))
+    return escritos, encolados
+
+
+def test_estados_hasta_listo(client, empleados, estados):
+    escritos, encolados = estados
+    respuesta = _subir(client, CSV_JUSTIFICACIONES)
+    assert respuesta.status_code == 202
+    url = respuesta.get_json()['estado_url']
+    assert client.get(url).get_json()['estado'] == PENDIENTE
+
+    funcion, args = encolados.pop()
+    funcion(*args)
+
+    assert escritos == [EN_CURSO, LISTO]
+    estado = client.get(url).get_json()
+    assert (estado['estado'], estado['procesados'], estado['total'], estado['total_errores']) == (LISTO, 5, 5, 2)
+    assert estado['resumen'] == 'Carga masiva completada: 3 justificaciones creadas, 2 filas con errores.'
+
+
+def test_estados_hasta_error(client, empleados, estados):
+    escritos, encolados = estados
+    url = _subir(client, b'no es un xlsx', 'j.xlsx').get_json()['estado_url']
+
+    funcion, args = encolados.pop()
+    funcion(*args)
+
+    assert escritos == [EN_CURSO, ERROR]
+    estado = client.get(url).get_json()
+    assert estado['estado'] == ERROR
+    assert estado['mensaje'].startswith('Ocurrió un error al procesar el archivo:')
+
+
+def test_carga_en_segundo_plano_con_informe_y_cambios_por_lote(client, empleados, confirmados):
+    respuesta = _subir(client, CSV_JUSTIFICACIONES)
+    estado = _esperar(client, respuesta.get_json()['estado_url'])
+
+    assert estado['errores'] == ["Fila 4: Se cruza con una justificación existente (del 03-03-2025 al 05-03-2025).",
+                                 "Fila 5: Pasaporte 'NOEXISTE' no encontrado."]
+    assert Justificaciones.query.count() == 3
+
+    # Un commit por lote de 2 filas; cada uno avisa a los suscriptores de al_confirmar_cambios.
+    assert [{c.valor for c in lote} for lote in confirmados] == [{'E1', 'E2'}, {'E3'}]
+    assert all(isinstance(c, Cambio) and c.ambito == 'empleado' for lote in confirmados for c in lote)
+
+    informe = client.get(estado['informe_url'])
+    assert informe.status_code == 200
+    filas = list(openpyxl.load_workbook(io.BytesIO(informe.data)).active.iter_rows(values_only=True))
+    assert [(f[0], f[1]) for f in filas[1:]] == [(4, 'E1'), (5, 'NOEXISTE')]
+
+
+@pytest.mark.parametrize('nombre, mensaje', [('j.txt', 'Formato de archivo no válido'),
+                                             ('', 'No se seleccionó')])
+def test_archivo_no_valido_responde_400(client, nombre, mensaje):
+    respuesta = _subir(client, b'x', nombre)
+    assert respuesta.status_code == 400
+    assert mensaje in respuesta.get_json()['error']
+
+
+def test_trabajo_inexistente(client):
+    assert client.get('/importaciones/' + '0' * 32).status_code == 404
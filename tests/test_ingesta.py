@@ -0,0 +1,108 @@
+import io
+from datetime import date, datetime, time
+
+import openpyxl
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from app.models import Justificaciones, Permisos
+from app.services.carga_justificaciones import cargar_justificaciones, COLUMNAS as COLUMNAS_JUSTIFICACIONES
+from app.services.carga_permisos import cargar_permisos, COLUMNAS as COLUMNAS_PERMISOS
+from app.services.ingesta import ArchivoNoValido, recibir_archivo
+
+JUSTIFICACIONES = [
+    ('E1', 'vacaciones', date(2025, 3, 3), date(2025, 3, 5), 'Año nuevo'),
+    ('E2', 'vacaciones', date(2025, 3, 3), date(2025, 3, 3), None),
+    ('E1', 'vacaciones', date(2025, 3, 4), date(2025, 3, 4), 'se cruza'),
+    ('NOEXISTE', 'vacaciones', date(2025, 3, 3), date(2025, 3, 3), None),
+]
+PERMISOS = [
+    ('E1', datetime(2025, 3, 4), time(14, 0), time(16, 0), 'Médico', None),
+    ('E2', datetime(2025, 3, 5), time(9, 0), time(10, 30), 'Trámite', 'con cita'),
+    ('E3', None, time(9, 0), time(10, 0), 'Trámite', None),
+]
+
+
+def _xlsx(columnas, filas, hoja_activa=0):
+    workbook = openpyxl.Workbook()
+    if hoja_activa:
+        workbook.active.append(['Instrucciones: los datos van en la hoja siguiente'])
+        workbook.active = workbook.create_sheet('Datos')
+    workbook.active.append(columnas)
+    for fila in filas:
+        workbook.active.append(fila)
+    archivo = io.BytesIO()
+    workbook.save(archivo)
+    return archivo.getvalue()
+
+
+def _csv(columnas, filas, separador=',', codificacion='utf-8'):
+    def texto(v):
+        if v is None:
+            return ''
+        if isinstance(v, datetime):
+            return v.strftime('%Y-%m-%d %H:%M:%S')
+        return v.isoformat() if isinstance(v, (date, time)) else str(v)
+    lineas = [separador.join(columnas)] + [separador.join(texto(v) for v in fila) for fila in filas]
+    return '\r\n'.join(lineas).encode(codificacion)
+
+
+def _recibir(contenido, nombre):
+    return recibir_archivo(FileStorage(io.BytesIO(contenido), filename=nombre))
+
+
+@pytest.mark.parametrize('nombre, contenido', [
+    ('j.xlsx', _xlsx(COLUMNAS_JUSTIFICACIONES, JUSTIFICACIONES)),
+    ('j.csv', _csv(COLUMNAS_JUSTIFICACIONES, JUSTIFICACIONES)),
+    ('j.csv', _csv(COLUMNAS_JUSTIFICACIONES, JUSTIFICACIONES, ';', 'cp1252')),
+])
+def test_justificaciones_iguales_desde_xlsx_y_csv(empleados, nombre, contenido):
+    with _recibir(contenido, nombre) as carga:
+        assert carga.total_filas() == len(JUSTIFICACIONES)
+        creadas, errores = cargar_justificaciones(carga.filas(len(COLUMNAS_JUSTIFICACIONES)), 2)
+
+    assert creadas == 2
+    assert [(e.fila, e.motivo.split(' (')[0]) for e in errores] == [
+        (4, 'Se cruza con una justificación existente'), (5, "Pasaporte 'NOEXISTE' no encontrado.")]
+    assert sorted((j.employee_passport, j.date_start, j.date_end, j.reason) for j in Justificaciones.query) == [
+        ('E1', date(2025, 3, 3), date(2025, 3, 5), 'Año nuevo'), ('E2', date(2025, 3, 3), date(2025, 3, 3), '')]
+
+
+@pytest.mark.parametrize('nombre, contenido', [
+    ('p.xlsx', _xlsx(COLUMNAS_PERMISOS, PERMISOS)),
+    ('p.xlsx', _xlsx(COLUMNAS_PERMISOS, PERMISOS, hoja_activa=1)),
+    ('p.csv', _csv(COLUMNAS_PERMISOS, PERMISOS, '\t')),
+])
+def test_permisos_iguales_desde_xlsx_y_csv(empleados, nombre, contenido):
+    with _recibir(contenido, nombre) as carga:
+        assert carga.total_filas() == len(PERMISOS)
+        creados, errores = cargar_permisos(carga.filas(len(COLUMNAS_PERMISOS)), 2)
+
+    assert creados == 2
+    assert [e.fila for e in errores] == [4]
+    assert sorted((p.employee_passport, p.fecha, p.hora_desde, p.hora_hasta, p.observacion)
+                  for p in Permisos.query) == [('E1', date(2025, 3, 4), time(14, 0), time(16, 0), ''),
+                                               ('E2', date(2025, 3, 5), time(9, 0), time(10, 30), 'con cita')]
+
+
+@pytest.mark.parametrize('final', [b'', b'\r\n'])
+def test_filas_vacias_y_columnas_faltantes(app, final):
+    contenido = b'a,b,c\r\n1,2\r\n,,\r\n\r\n3,4,5,6' + final
+    with _recibir(contenido, 'x.csv') as carga:
+        assert carga.total_filas() == 4
+        assert list(carga.filas(3)) == [(2, ('1', '2', None)), (5, ('3', '4', '5'))]
+
+
+@pytest.mark.parametrize('nombre, mensaje', [('', 'No se seleccionó'), ('x.xls', 'Formato de archivo no válido')])
+def test_rechaza_archivos_no_validos(app, nombre, mensaje):
+    with pytest.raises(ArchivoNoValido, match=mensaje):
+        _recibir(b'x', nombre)
+
+
+def test_rechaza_archivos_grandes_sin_dejar_temporales(app, tmp_path):
+    app.config['MAX_CONTENT_LENGTH'] = 10
+    directorio = tmp_path / 'subidas'
+    directorio.mkdir()
+    with pytest.raises(ArchivoNoValido, match='tamaño máximo'):
+        recibir_archivo(FileStorage(io.BytesIO(b'x' * 100), filename='x.csv'), str(directorio))
+    assert list(directorio.iterdir()) == []
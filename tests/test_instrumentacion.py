@@ -0,0 +1,101 @@
+import re
+
+import pytest
+from flask import Response, request
+from sqlalchemy import select
+
+from app import db
+from app.models import Justificaciones, PersonnelEmployee
+from app.services import instrumentacion
+
+
+def _metricas(client):
+    respuesta = client.get('/metrics')
+    assert respuesta.status_code == 200
+    assert respuesta.content_type.startswith('text/plain; version=0.0.4')
+    return respuesta.get_data(as_text=True)
+
+
+def test_server_timing_por_peticion(client, empleados):
+    respuesta = client.get('/justificaciones/')
+
+    assert respuesta.status_code == 200
+    tiempos = dict(re.findall(r'(\w+);dur=([\d.]+)', respuesta.headers['Server-Timing']))
+    assert set(tiempos) == {'db', 'render', 'app', 'total'}
+    assert float(tiempos['render']) > 0
+    assert float(tiempos['total']) >= float(tiempos['db']) + float(tiempos['render'])
+    sentencias = int(re.search(r'db;dur=[\d.]+;desc="(\d+) SQL"', respuesta.headers['Server-Timing']).group(1))
+    assert sentencias >= 2
+
+
+def test_metrics_resume_por_endpoint(client, empleados):
+    for _ in range(3):
+        client.get('/justificaciones/')
+
+    texto = _metricas(client)
+
+    assert '# TYPE asistencia_request_duration_seconds summary' in texto
+    assert 'asistencia_request_duration_seconds_count{endpoint="justificaciones.index"} 3' in texto
+    for q in ('0.5', '0.95', '0.99'):
+        assert f'asistencia_request_sql_statements{{endpoint="justificaciones.index",quantile="{q}"}}' in texto
+    # /metrics no se mide a sí mismo.
+    assert 'metricas.metrics' not in texto
+
+
+def test_marcaciones_en_lotes_en_server_timing_y_metrics(app):
+    # Lo que informa iter_marcaciones por cada lote leído por cursor.
+    with app.test_request_context('/reportes/'):
+        instrumentacion._iniciar_peticion()
+        instrumentacion.registrar_marcaciones(40, 0.25)
+        instrumentacion.registrar_marcaciones(2, 0.25)
+        respuesta = instrumentacion._terminar_peticion(Response())
+
+    assert 'marcaciones;dur=500.0;desc="42 filas"' in respuesta.headers['Server-Timing']
+    assert 'asistencia_request_punch_rows_sum{endpoint="reportes.index"} 42' in app.extensions['metricas'].texto_prometheus()
+
+
+def test_csv_en_streaming_se_mide_al_generarse(client, empleados):
+    db.session.add(Justificaciones(employee_passport='E1', justification_type='vacaciones',
+                                   date_start=db.func.current_date(), date_end=db.func.current_date()))
+    db.session.commit()
+
+    respuesta = client.get('/justificaciones/descargar-reporte?format=csv')
+    assert 'E1' in respuesta.get_data(as_text=True)
+
+    texto = _metricas(client)
+    assert 'asistencia_request_duration_seconds_count{endpoint="justificaciones.descargar_reporte"} 1' in texto
+    flujo = re.search(r'asistencia_request_sql_statements_sum\{endpoint="justificaciones.descargar_reporte:flujo"\} '
+                      r'(\d+)', texto)
+    assert flujo and int(flujo.group(1)) >= 1
+
+
+# --- DETECTOR DE N+1 ---
+
+@pytest.fixture
+def repetidas(app):
+    """Ruta de prueba que repite `n` veces la misma consulta, con listas IN de distinto largo."""
+    def por_empleado():
+        for n in range(1, int(request.args['n']) + 1):
+            db.session.execute(select(PersonnelEmployee).where(PersonnelEmployee.id.in_(range(n)))).all()
+        return 'ok'
+    app.add_url_rule('/prueba/repetidas', 'repetidas', por_empleado)
+    app.config.update(SQL_REPETIDAS_MAX=2, SQL_REPETIDAS_ERROR=True)
+    return app.test_client()
+
+
+def test_repetidas_falla_la_peticion(repetidas, caplog):
+    # Los IN con distinta cantidad de valores son la misma forma de consulta.
+    with pytest.raises(instrumentacion.ConsultasRepetidas, match='3x SELECT'):
+        repetidas.get('/prueba/repetidas?n=3')
+    assert 'N+1' in caplog.text
+
+
+def test_repetidas_bajo_el_umbral(repetidas):
+    assert repetidas.get('/prueba/repetidas?n=2').status_code == 200
+
+
+def test_repetidas_solo_advierte_sin_sql_repetidas_error(app, repetidas, caplog):
+    app.config['SQL_REPETIDAS_ERROR'] = False
+
+    assert repetidas.get('/prueba/repetidas?n=3').status_code == 200
+    assert 'consultas repetidas más de 2 veces' in caplog.text
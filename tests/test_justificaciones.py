@@ -0,0 +1,44 @@
+from datetime import date
+
+import pytest
+
+from app import db
+from app.models import Justificaciones
+
+
+@pytest.fixture
+def vacaciones(empleados):
+    db.session.add_all([
+        Justificaciones(employee_passport='E1', justification_type='vacaciones', date_start=date(2025, 3, 10),
+                        date_end=date(2025, 3, 14)),
+        Justificaciones(employee_passport='E1', justification_type='vacaciones', date_start=date(2025, 3, 1),
+                        date_end=date(2025, 3, 20), anulada=True),
+    ])
+    db.session.commit()
+
+
+def _crear(client, desde, hasta, passport='E1'):
+    client.post('/justificaciones/crear', data={'employee_passport': passport, 'justification_type': 'vacaciones',
+                                                'date_start': desde, 'date_end': hasta})
+    with client.session_transaction() as sesion:
+        return sesion['_flashes'][-1]
+
+
+@pytest.mark.parametrize('desde, hasta', [('2025-03-08', '2025-03-10'), ('2025-03-12', '2025-03-12'),
+                                          ('2025-03-14', '2025-03-20'), ('2025-03-01', '2025-03-31')])
+def test_crear_rechaza_cruces_con_las_vigentes(client, vacaciones, desde, hasta):
+    categoria, mensaje = _crear(client, desde, hasta)
+
+    assert categoria == 'danger'
+    assert 'del 10-03-2025 al 14-03-2025' in mensaje
+    assert Justificaciones.query.count() == 2
+
+
+@pytest.mark.parametrize('desde, hasta, passport', [('2025-03-05', '2025-03-09', 'E1'),
+                                                    ('2025-03-15', '2025-03-15', 'E1'),
+                                                    ('2025-03-10', '2025-03-14', 'E2')])
+def test_crear_acepta_rangos_libres_y_anuladas(client, vacaciones, desde, hasta, passport):
+    categoria, _ = _crear(client, desde, hasta, passport)
+
+    assert categoria == 'success'
+    assert Justificaciones.query.count() == 3
@@ -0,0 +1,63 @@
+"""
+Planes de las consultas críticas sobre PostgreSQL con datos sintéticos
+(necesita TEST_DATABASE_URL; ver conftest).
+"""
+from datetime import date, datetime, time, timedelta
+
+import pytest
+from sqlalchemy import insert, text
+
+from app import db
+from app.models import PersonnelDepartment, PersonnelEmployee, IClockTransaction, Justificaciones
+from app.services.planes_consultas import verificar_planes
+
+pytestmark = pytest.mark.postgresql
+
+EMPLEADOS = 300
+DIAS = 60
+
+
+@pytest.fixture
+def datos_sinteticos(app):
+    db.session.execute(insert(PersonnelDepartment), [{'id': 1, 'dept_code': 'D1', 'dept_name': 'Callcenter'}])
+    db.session.execute(insert(PersonnelEmployee), [
+        {'id': i, 'passport': f'P{i:05d}', 'first_name': 'Empleado', 'last_name': str(i), 'department_id': 1}
+        for i in range(1, EMPLEADOS + 1)])
+    hoy = date.today()
+    dias = [hoy - timedelta(days=d) for d in range(DIAS)]
+    db.session.execute(insert(IClockTransaction), [
+        {'emp_id': i, 'punch_time': datetime.combine(dia, hora)}
+        for i in range(1, EMPLEADOS + 1) for dia in dias for hora in (time(8, 0), time(18, 0))])
+    db.session.execute(insert(Justificaciones), [
+        {'employee_passport': f'P{i:05d}', 'justification_type': 'vacaciones', 'date_start': dia,
+         'date_end': dia + timedelta(days=1), 'anulada': n % 5 == 0}
+        for i in range(1, EMPLEADOS + 1) for n, dia in enumerate(dias[::7])])
+    db.session.commit()
+    with db.engine.connect() as conexion:
+        conexion.execution_options(isolation_level='AUTOCOMMIT').exec_driver_sql('ANALYZE')
+
+
+def _por_nombre(resultados):
+    return {r['nombre']: r for r in resultados}
+
+
+def test_consultas_usan_sus_indices(datos_sinteticos):
+    for resultado in verificar_planes():
+        assert not resultado['falta_indice'], (resultado['nombre'], resultado['nodos'])
+        assert not resultado['secuenciales'], (resultado['nombre'], resultado['nodos'])
+
+
+@pytest.mark.parametrize('indice, consultas', [
+    ('ix_iclock_transaction_emp_id_punch_time', {'Marcaciones del reporte'}),
+    ('ix_justificaciones_vigentes', {'Justificaciones: cruce al crear', 'Justificaciones del reporte'}),
+])
+def test_detecta_el_indice_compuesto_faltante(datos_sinteticos, indice, consultas):
+    db.session.execute(text(f'DROP INDEX {indice}'))
+    db.session.commit()
+
+    resultados = _por_nombre(verificar_planes())
+
+    for nombre, resultado in resultados.items():
+        assert resultado['falta_indice'] == (nombre in consultas), (nombre, resultado['nodos'])
+        # Los índices de una sola columna siguen evitando el Seq Scan: por eso se exige el nombre del índice.
+        assert not resultado['secuenciales'], (nombre, resultado['nodos'])
@@ -0,0 +1,30 @@
+from datetime import date, datetime, time
+
+import pytest
+
+from app import db
+from app.models import PersonnelEmployee, IClockTransaction
+from app.services.report_builder import build_report, LimiteMarcacionesExcedido
+
+pytestmark = pytest.mark.postgresql
+
+
+@pytest.fixture
+def cuatro_marcaciones(empleados):
+    """Cuatro marcaciones por empleado (12 en total) en el primer día hábil de marzo."""
+    for empleado in PersonnelEmployee.query.all():
+        db.session.add_all(IClockTransaction(emp_id=empleado.id, punch_time=datetime.combine(date(2025, 3, 3), hora))
+                           for hora in (time(8), time(13), time(14), time(18)))
+    db.session.commit()
+
+
+@pytest.mark.parametrize('maximo, excede', [(11, True), (12, False)])
+def test_limite_de_marcaciones_cuenta_todo_el_reporte(app, cuatro_marcaciones, marzo, maximo, excede):
+    # Un empleado por lote: cada lote por sí solo queda muy por debajo del límite.
+    app.config.update(REPORT_LOTE_EMPLEADOS=1, REPORT_MARCACIONES_MAX_FILAS=maximo)
+
+    if excede:
+        with pytest.raises(LimiteMarcacionesExcedido):
+            build_report(*marzo, engine='python')
+    else:
+        assert len(build_report(*marzo, engine='python')) == 3
@@ -0,0 +1,68 @@
+from datetime import date
+
+import pytest
+
+from app import db
+from app.models import Justificaciones
+from app.services import report_builder
+from app.services.report_cache import CacheMemoria, CacheArchivo, reporte_en_cache
+
+ENERO = (date(2025, 1, 1), date(2025, 1, 31), '')
+MARZO = (date(2025, 3, 1), date(2025, 3, 31), '')
+ENTRADA = {'registros': 1}
+
+
+def test_memoria_invalida_solo_el_rango_cruzado():
+    cache = CacheMemoria()
+    cache.guardar(ENERO, ENTRADA)
+    cache.guardar(MARZO, ENTRADA)
+
+    assert cache.invalidar(date(2025, 1, 5), date(2025, 1, 5)) == 1
+    assert cache.obtener(ENERO) is None
+    assert cache.obtener(MARZO) == ENTRADA
+
+
+def test_memoria_entre_procesos_usa_la_generacion_compartida(tmp_path):
+    # Dos instancias con el mismo archivo de generación hacen de dos workers.
+    ruta = str(tmp_path / 'generacion')
+    propio, otro = CacheMemoria(ruta_generacion=ruta), CacheMemoria(ruta_generacion=ruta)
+    for cache in (propio, otro):
+        cache.guardar(ENERO, ENTRADA)
+        cache.guardar(MARZO, ENTRADA)
+
+    propio.invalidar(date(2025, 1, 5), date(2025, 1, 5))
+
+    # El proceso que invalidó conserva lo que no se cruza; el otro descarta todo.
+    assert propio.obtener(ENERO) is None
+    assert propio.obtener(MARZO) == ENTRADA
+    assert otro.obtener(ENERO) is None
+    assert otro.obtener(MARZO) is None
+
+    otro.guardar(MARZO, ENTRADA)
+    assert otro.obtener(MARZO) == ENTRADA
+
+
+@pytest.mark.parametrize('backend', ['memoria', 'archivo'])
+def test_no_guarda_si_hubo_invalidaciones_durante_el_calculo(backend, tmp_path):
+    cache = CacheMemoria() if backend == 'memoria' else CacheArchivo(str(tmp_path))
+    generacion = cache.generacion()
+    cache.invalidar(date(2025, 6, 1), date(2025, 6, 1))  # aunque no se cruce con el rango
+
+    assert cache.guardar(MARZO, ENTRADA, generacion) is False
+    assert cache.obtener(MARZO) is None
+    assert cache.guardar(MARZO, ENTRADA, cache.generacion()) is True
+    assert cache.obtener(MARZO) == ENTRADA
+
+
+def test_build_report_no_guarda_lo_calculado_antes_de_un_cambio(app, empleados, marzo, monkeypatch):
+    def calcular_y_justificar(*args):
+        # Otra petición confirma una justificación mientras se calcula el reporte.
+        db.session.add(Justificaciones(employee_passport='E1', date_start=date(2025, 3, 3),
+                                       date_end=date(2025, 3, 3), justification_type='Médica'))
+        db.session.commit()
+        return iter([])
+    monkeypatch.setattr(report_builder, '_calcular_por_lotes', calcular_y_justificar)
+
+    report_builder.build_report(*marzo)
+
+    assert reporte_en_cache(*marzo) is None
@@ -0,0 +1,131 @@
+import random
+from collections import namedtuple
+from datetime import date, time, timedelta
+
+import pytest
+
+from app.services.report_builder import calcular_reporte_python, dias_del_periodo
+from app.services.report_engine_pandas import calcular_reporte_pandas
+from app.services.report_paralelo import Marcacion, Justificacion, Permiso, HorarioGrupo, HorarioDepto
+
+Departamento = namedtuple('Departamento', 'id dept_name')
+Empleado = namedtuple('Empleado', 'id passport first_name last_name department')
+
+DESDE, HASTA = date(2025, 3, 1), date(2025, 3, 31)
+CALLCENTER, GUAYAQUIL = Departamento(1, 'Callcenter'), Departamento(2, 'Guayaquil')
+
+
+def _datos(empleados, marcaciones=(), justificaciones=(), permisos=(), grupo_horarios=(), depto_horarios=(),
+           empleado_grupo_map=None):
+    return {'empleados': list(empleados), 'dias': dias_del_periodo(DESDE, HASTA), 'marcaciones': list(marcaciones),
+            'justificaciones': list(justificaciones), 'permisos': list(permisos),
+            'grupo_horarios': list(grupo_horarios), 'depto_horarios': list(depto_horarios),
+            'empleado_grupo_map': empleado_grupo_map or {}}
+
+
+def _casos():
+    """Un empleado por situación, todas en marzo de 2025 (sábado 1, domingo 2, lunes 3...)."""
+    ana, beto, carla, dario = (Empleado(i, f'P{i:05d}', nombre, f'Apellido{i}', CALLCENTER)
+                               for i, nombre in enumerate(('Ana', 'Beto', 'Carla', 'Dario'), 1))
+    elena = Empleado(5, 'P00005', 'Elena', 'Apellido5', GUAYAQUIL)
+
+    def dia(numero, passport, *horas):
+        return [Marcacion(passport, date(2025, 3, numero), time(*hora)) for hora in horas]
+
+    marcaciones = (
+        # Atrasos: dentro y fuera de la tolerancia de 5 minutos, y en sábado.
+        dia(3, ana.passport, (8, 5), (18, 0)) + dia(4, ana.passport, (8, 5, 1), (18, 30))
+        + dia(5, ana.passport, (9, 47, 12), (17, 0)) + dia(1, ana.passport, (8, 20), (13, 0))
+        # Almuerzo: cuatro marcaciones (desordenadas), tres, y una sola.
+        + dia(3, beto.passport, (13, 2), (8, 0), (18, 45), (12, 1)) + dia(4, beto.passport, (8, 0), (12, 0), (18, 0))
+        + dia(5, beto.passport, (7, 55))
+        # Justificación que tapa marcaciones y días sin marcar.
+        + dia(11, carla.passport, (8, 30), (18, 0))
+        # Horarios especiales por grupo y por departamento, feriados con y sin horas extras.
+        + dia(3, dario.passport, (9, 10), (20, 30)) + dia(4, dario.passport, (7, 0), (16, 0))
+        + dia(8, dario.passport, (8, 0), (14, 0)) + dia(3, elena.passport, (8, 0), (21, 0))
+        + dia(6, elena.passport, (8, 0), (18, 0)) + dia(7, elena.passport, (10, 0), (18, 0))
+        # Domingo y día fuera del período: se ignoran.
+        + dia(2, dario.passport, (8, 0), (18, 0)) + [Marcacion(elena.passport, date(2025, 4, 1), time(8))]
+    )
+    justificaciones = [Justificacion(carla.passport, date(2025, 2, 25), date(2025, 3, 2)),
+                       Justificacion(carla.passport, date(2025, 3, 10), date(2025, 3, 14)),
+                       Justificacion(carla.passport, date(2025, 3, 12), date(2025, 3, 12))]
+    permisos = [Permiso(ana.passport, date(2025, 3, 5), time(7, 0), time(10, 0)),
+                Permiso(beto.passport, date(2025, 3, 4), time(16, 0), time(19, 0)),
+                Permiso(beto.passport, date(2025, 3, 6), time(8, 0), time(12, 0))]
+    grupo_horarios = [HorarioGrupo(7, date(2025, 3, 3), time(9, 0), time(20, 0), 2, False),
+                      HorarioGrupo(7, date(2025, 3, 4), None, time(16, 0), 0, False),
+                      HorarioGrupo(7, date(2025, 3, 8), time(8, 0), None, 4, True),
+                      HorarioGrupo(7, date(2025, 3, 10), None, None, 0, True)]
+    depto_horarios = [HorarioDepto('Guayaquil', date(2025, 3, 3), None, None, 3, False),
+                      HorarioDepto('Guayaquil', date(2025, 3, 6), None, None, 2, True),
+                      HorarioDepto('Guayaquil', date(2025, 3, 7), time(9, 30), None, 0, False),
+                      HorarioDepto('Guayaquil', date(2025, 3, 7), time(9, 55), None, 0, False),
+                      HorarioDepto('Callcenter', date(2025, 3, 10), None, None, 0, True)]
+    return _datos([ana, beto, carla, dario, elena], marcaciones, justificaciones, permisos, grupo_horarios,
+                  depto_horarios, {dario.passport: 7})
+
+
+def _aleatorio(semilla, cantidad=25):
+    rnd = random.Random(semilla)
+    empleados = [Empleado(i, f'P{i:05d}', f'N{i}', f'A{i:03d}', rnd.choice((CALLCENTER, GUAYAQUIL)))
+                 for i in range(cantidad)]
+    dias = [DESDE + timedelta(days=i) for i in range((HASTA - DESDE).days + 1)]
+    marcaciones = [Marcacion(e.passport, d, time(rnd.randint(6, 20), rnd.randint(0, 59), rnd.randint(0, 59),
+                                                 rnd.choice((0, rnd.randint(0, 999999)))))
+                   for e in empleados for d in dias if rnd.random() > 0.15
+                   for _ in range(rnd.choice((1, 2, 2, 3, 4, 4, 4, 5)))]
+    rnd.shuffle(marcaciones)
+    justificaciones = []
+    for _ in range(cantidad):
+        inicio = DESDE + timedelta(days=rnd.randint(-10, 35))
+        justificaciones.append(Justificacion(rnd.choice(empleados).passport, inicio,
+                                             inicio + timedelta(days=rnd.randint(0, 12))))
+    permisos = [Permiso(rnd.choice(empleados).passport, rnd.choice(dias), time(rnd.randint(6, 12), rnd.choice((0, 30))),
+                        time(rnd.randint(13, 19), rnd.choice((0, 30)))) for _ in range(cantidad * 3)]
+
+    def regla():
+        return (rnd.choice(dias), rnd.choice((None, time(9), time(7, 30), time(23, 58))),
+                rnd.choice((None, time(16), time(20))), rnd.choice((0, 0, 2, 4)), rnd.choice((False, True, None)))
+
+    grupo_horarios = [HorarioGrupo(rnd.choice((1, 2, 3)), *regla()) for _ in range(30)]
+    depto_horarios = [HorarioDepto(rnd.choice(('Callcenter', 'Guayaquil', 'Otro')), *regla()) for _ in range(30)]
+    grupos = {e.passport: rnd.choice((1, 2, 3)) for e in empleados if rnd.random() < 0.7}
+    return _datos(empleados, marcaciones, justificaciones, permisos, grupo_horarios, depto_horarios, grupos)
+
+
+def _comparar(datos):
+    esperado = calcular_reporte_python(datos)
+    obtenido = calcular_reporte_pandas(datos)
+    # Con `feriado` NULL el motor original deja None en es_feriado_laborable y el vectorizado False.
+    for registro in (r for fila in esperado for r in fila['registros']):
+        registro.es_feriado_laborable = bool(registro.es_feriado_laborable)
+
+    assert [r['empleado'] for r in obtenido] == [r['empleado'] for r in esperado]
+    for a, b in zip(esperado, obtenido):
+        assert b['resumen'] == a['resumen'], a['empleado'].passport
+        assert b['registros'] == a['registros'], a['empleado'].passport
+    return esperado
+
+
+def test_motores_coinciden_en_casos_conocidos():
+    reporte = {r['empleado'].first_name: r for r in _comparar(_casos())}
+
+    # Sanidad del fixture: cada situación realmente aparece en el reporte.
+    assert reporte['Ana']['resumen']['total_atrasos_normal'] == 1
+    assert reporte['Ana']['resumen']['total_atrasos_sabfer'] == 1
+    assert any(r.segundos_almuerzo for r in reporte['Beto']['registros'])
+    assert reporte['Carla']['resumen']['total_faltas_justificadas'] > 0
+    assert reporte['Dario']['resumen']['total_horas_extras_sabfer'] > timedelta()
+    assert reporte['Elena']['resumen']['total_horas_extras_normal'] > timedelta()
+    assert {r.estado for r in reporte['Dario']['registros']} >= {'Feriado', 'Atraso', 'Presente'}
+
+
+@pytest.mark.parametrize('semilla', range(8))
+def test_motores_coinciden_con_datos_aleatorios(semilla):
+    _comparar(_aleatorio(semilla))
+
+
+def test_motores_coinciden_sin_datos():
+    _comparar(_datos([Empleado(1, 'P00001', 'Ana', 'Prueba', CALLCENTER)]))
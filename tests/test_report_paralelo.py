@@ -0,0 +1,110 @@
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+from app import db
+from app.models import (PersonnelDepartment, PersonnelEmployee, IClockTransaction, Justificaciones, Permisos,
+                        Grupos, GrupoEmpleados, GrupoHorariosEspeciales)
+from app.services import report_builder, report_paralelo
+from app.services.report_paralelo import Marcacion
+
+EMPLEADOS = 12
+
+
+@pytest.fixture
+def paralelo(app):
+    """Activa el pool de 2 procesos con fragmentos desde 2 empleados; lo cierra al terminar."""
+    app.config.update(REPORT_PARALLEL_WORKERS=2, REPORT_PARALLEL_MIN_EMPLEADOS=2)
+    yield app.config
+    if report_paralelo._pool is not None:
+        report_paralelo._pool.shutdown()
+        report_paralelo._pool = None
+
+
+@pytest.fixture
+def datos_marzo(app, marzo):
+    """Empleados de dos departamentos (apellidos en orden inverso a los ids) con un mes de datos."""
+    callcenter = PersonnelDepartment(dept_code='D1', dept_name='Callcenter')
+    guayaquil = PersonnelDepartment(dept_code='D2', dept_name='Guayaquil')
+    grupo = Grupos(code='G1', name='Tarde', hora_entrada=time(10), hora_salida=time(19))
+    db.session.add_all([callcenter, guayaquil, grupo])
+    db.session.flush()
+    empleados = [PersonnelEmployee(passport=f'P{i:02d}', first_name='Empleado', last_name=f'Apellido{EMPLEADOS - i:02d}',
+                                   department_id=(callcenter if i % 3 else guayaquil).id) for i in range(EMPLEADOS)]
+    db.session.add_all(empleados)
+    db.session.flush()
+
+    dias = [marzo[0] + timedelta(days=d) for d in range((marzo[1] - marzo[0]).days + 1)]
+    for n, empleado in enumerate(empleados):
+        for d, dia in enumerate(dias):
+            if (n + d) % 7 == 0:
+                continue  # falta
+            horas = [time(8, (n * d) % 20), time(18, 30)]
+            if (n + d) % 3 == 0:
+                horas[1:1] = [time(13), time(13, 45)]
+            db.session.add_all(IClockTransaction(emp_id=empleado.id, punch_time=datetime.combine(dia, hora))
+                               for hora in horas)
+    db.session.add_all([
+        Justificaciones(employee_passport='P01', justification_type='Médica', date_start=date(2025, 3, 10),
+                        date_end=date(2025, 3, 14)),
+        Justificaciones(employee_passport='P07', justification_type='Médica', date_start=date(2025, 2, 20),
+                        date_end=date(2025, 3, 4)),
+        Permisos(employee_passport='P02', fecha=date(2025, 3, 5), hora_desde=time(7), hora_hasta=time(10),
+                 motivo='Trámite'),
+        GrupoEmpleados(grupo_id=grupo.id, employee_passport='P04'),
+        GrupoHorariosEspeciales(grupo_id=grupo.id, fecha=date(2025, 3, 8), hora_entrada_especial=time(9),
+                                horas_extras=4, feriado=True),
+    ])
+    db.session.commit()
+
+
+def _datos_desde_sqlite(marzo):
+    """Los datos crudos del reporte; las marcaciones se leen por ORM porque SQL_MARCACIONES es de PostgreSQL."""
+    empleados = report_builder.consultar_empleados()
+    pasaportes = {e.id: e.passport for e in empleados}
+    marcaciones = [Marcacion(pasaportes[t.emp_id], t.punch_time.date(), t.punch_time.time())
+                   for t in IClockTransaction.query.order_by(IClockTransaction.id)]
+    return dict(report_builder.cargar_datos_comunes(*marzo), empleados=empleados, marcaciones=marcaciones,
+                justificaciones=Justificaciones.query.all(), permisos=Permisos.query.all())
+
+
+@pytest.mark.parametrize('engine', ['python', 'pandas'])
+def test_paralelo_da_lo_mismo_que_en_serie(app, datos_marzo, marzo, paralelo, engine):
+    datos = _datos_desde_sqlite(marzo)
+    app.config['REPORT_PARALLEL_WORKERS'] = 0
+    en_serie = report_builder.calcular_reporte(datos, engine)
+    app.config['REPORT_PARALLEL_WORKERS'] = 2
+    en_paralelo = report_builder.calcular_reporte(datos, engine)
+
+    assert report_paralelo._pool is not None
+    assert en_paralelo == en_serie
+    apellidos = [item['empleado'].last_name for item in en_paralelo]
+    assert len(apellidos) == EMPLEADOS and apellidos == sorted(apellidos)
+
+
+@pytest.mark.postgresql
+def test_build_report_paralelo_da_lo_mismo_que_en_serie(app, datos_marzo, marzo, paralelo):
+    app.config['REPORT_PARALLEL_WORKERS'] = 0
+    en_serie = report_builder.build_report(*marzo, engine='python')
+    app.config['REPORT_PARALLEL_WORKERS'] = 2
+    en_paralelo = report_builder.build_report(*marzo, engine='python')
+
+    assert en_paralelo == en_serie
+    assert [item['empleado'].last_name for item in en_paralelo] == sorted(f'Apellido{EMPLEADOS - i:02d}'
+                                                                          for i in range(EMPLEADOS))
+
+
+def test_lotes_de_un_fragmento_por_worker(app, datos_marzo, marzo, paralelo, monkeypatch):
+    lotes = []
+    monkeypatch.setattr(report_builder, 'calcular_empleados',
+                        lambda desde, hasta, empleados, *args: lotes.append(len(empleados)) or [])
+    app.config.update(REPORT_LOTE_EMPLEADOS=1, REPORT_PARALLEL_MIN_EMPLEADOS=5)
+
+    report_builder.build_report(*marzo, engine='python')
+    list(report_builder.iter_report(*marzo, engine='python', lote=1))
+    assert lotes == [10, 2, 10, 2]
+
+    lotes.clear()
+    app.config['REPORT_PARALLEL_WORKERS'] = 0
+    list(report_builder.iter_report(*marzo, engine='python', lote=5))
+    assert lotes == [5, 5, 2]
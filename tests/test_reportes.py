@@ -0,0 +1,33 @@
+import io
+
+import pytest
+
+from app.routes import reportes
+from app.services import exportaciones
+
+
+@pytest.mark.parametrize('disponible', [True, False])
+def test_parquet_solo_se_ofrece_con_pyarrow(client, monkeypatch, disponible):
+    monkeypatch.setattr(reportes, 'parquet_disponible', lambda: disponible)
+
+    pagina = client.get('/reportes/').get_data(as_text=True)
+
+    assert 'value="csv"' in pagina
+    assert ('value="parquet"' in pagina) == disponible
+
+
+@pytest.mark.parametrize('nombre, mimetype', [
+    ('Reporte.xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    ('Reporte.parquet', 'application/vnd.apache.parquet'),
+    ('Reporte.csv', 'text/csv'),
+])
+def test_descarga_de_exportacion_con_el_mimetype_del_archivo(client, nombre, mimetype):
+    id_trabajo = exportaciones.crear_trabajo(nombre_archivo=nombre)
+    exportaciones.guardar_archivo(id_trabajo, io.BytesIO(b'contenido'))
+    exportaciones.actualizar_trabajo(id_trabajo, estado=exportaciones.LISTO)
+
+    respuesta = client.get(f'/reportes/exportaciones/{id_trabajo}/archivo')
+
+    assert respuesta.status_code == 200
+    assert respuesta.mimetype == mimetype
+    assert nombre in respuesta.headers['Content-Disposition']